@@ -1,12 +1,23 @@
 from flask import Flask
-from sstq.config import Config
+from sstq.config import Config, load_instance_secret_key
 from sstq.extensions import db, login_manager
+from sstq.sqlite_tuning import install_sqlite_tuning
+from sstq.sql_instrumentation import install_sql_instrumentation
+
+def create_app(config_overrides=None, register_blueprints=True):
+    # imported here rather than at the top so 'import sstq' stays cheap for scripts and worker processes
+    from sstq.image_variants import install_image_variants
+    from sstq.metrics import install_metrics
+    from sstq.upload_streams import UploadRequest
 
-def create_app(config_overrides=None):
     app = Flask(__name__)
+    # lets '@streamed_upload' views write file parts straight to their upload folder
+    app.request_class = UploadRequest
     app.config.from_object(Config)
     if config_overrides:
         app.config.update(config_overrides)
+    if not app.config.get("SECRET_KEY"):
+        app.config["SECRET_KEY"] = load_instance_secret_key(app.instance_path)
 
     # init extension
     db.init_app(app)
@@ -16,7 +27,25 @@ def create_app(config_overrides=None):
     # import models 
     from sstq import models
 
-    # register blueprints
+    # apply the SQLite PRAGMA profile before anything opens a connection; main.py reports what is in effect
+    with app.app_context():
+        install_sqlite_tuning(app, db.engine)
+        # opt-in per-request query counting, N+1 warnings and Server-Timing header
+        install_sql_instrumentation(app, db.engine)
+
+    # request counters and latency histograms for '/metrics'
+    install_metrics(app)
+    # 'image_srcset()' for templates that show product images
+    install_image_variants(app)
+
+    # scripts only need the models and the database, so they skip importing the routes
+    if register_blueprints:
+        _register_blueprints(app)
+
+    return app
+
+
+def _register_blueprints(app):
     from sstq.routes.admin import admin_bp
     from sstq.routes.auth import auth_bp
     from sstq.routes.helper import helper_bp
@@ -29,6 +58,7 @@ def create_app(config_overrides=None):
     from sstq.routes.timeline import timeline_bp
     from sstq.routes.tracequest import tracequest_bp
     from sstq.routes.misson import misson_bp
+    from sstq.routes.metrics import metrics_bp
 
     app.register_blueprint(admin_bp)
     app.register_blueprint(auth_bp)
@@ -42,8 +72,4 @@ def create_app(config_overrides=None):
     app.register_blueprint(timeline_bp)
     app.register_blueprint(tracequest_bp)
     app.register_blueprint(misson_bp)
-
-    with app.app_context():
-        db.create_all()
-
-    return app
+    app.register_blueprint(metrics_bp)
@@ -0,0 +1,409 @@
+# streaming database backups: every table is exported by its own worker into compressed JSONL segments,
+# next to a 'manifest.json' with per-segment row counts and sha256 checksums
+# segment lines keep the original backup format ({"table": ..., "row": {...}}), so old single-file
+# backups and new backup folders are read through the same iter_backup_records()
+# incremental backups (export_changes) hold only the rows changed since a previous backup, plus
+# {"table": ..., "deleted": "<primary key>"} tombstones; see 'change_tracking.py'
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sstq.change_tracking import CHANGE_TABLE, TRACKED_TABLES, current_change_version, has_change_tracking
+
+try:
+    import zstandard
+except ImportError:  # optional, install with 'pip install -e ".[backup]"'
+    zstandard = None
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_NAME = "sstq-backup"
+FORMAT_VERSION = 1
+SEGMENT_SUFFIXES = {"none": ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+DEFAULT_LEVELS = {"none": None, "gzip": 6, "zstd": 3}
+DEFAULT_CHUNK_ROWS = 5000
+DEFAULT_SEGMENT_ROWS = 1_000_000
+
+
+class BackupError(Exception):
+    pass
+
+
+def _require_compression(compression):
+    if compression not in SEGMENT_SUFFIXES:
+        raise BackupError(f"Unknown compression '{compression}'. Use one of: {', '.join(SEGMENT_SUFFIXES)}.")
+    if compression == "zstd" and zstandard is None:
+        raise BackupError("zstd compression needs the 'zstandard' package (pip install zstandard).")
+
+
+class _HashingFile:
+    """File wrapper that hashes and counts the bytes that actually reach the disk."""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.handle.write(data)
+
+    def read(self, size=-1):
+        data = self.handle.read(size)
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return data
+
+    def flush(self):
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+class _SegmentWriter:
+    def __init__(self, path, compression, level):
+        self.path = path
+        self.rows = 0
+        self.raw = _HashingFile(open(path, "wb"))
+        if compression == "gzip":
+            # mtime=0 keeps the output byte-identical for identical data
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=level, mtime=0)
+        elif compression == "zstd":
+            self.stream = zstandard.ZstdCompressor(level=level).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+
+    def write_lines(self, text, rows):
+        self.stream.write(text.encode("utf-8"))
+        self.rows += rows
+
+    def close(self):
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.flush()
+        os.fsync(self.raw.handle.fileno())
+        self.raw.close()
+        return {
+            "file": self.path.name,
+            "rows": self.rows,
+            "bytes": self.raw.bytes,
+            "sha256": self.raw.sha256.hexdigest(),
+        }
+
+
+def _open_segment_reader(raw, compression):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if compression == "zstd":
+        _require_compression("zstd")
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+    return raw
+
+
+def list_tables(connection):
+    return [
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    ]
+
+
+def _write_segments(output_dir, table, compression, level, segment_rows, chunks):
+    """Write the line chunks of one table into numbered segments and return their manifest entries."""
+    suffix = SEGMENT_SUFFIXES[compression]
+    segments = []
+    writer = None
+    for lines in chunks:
+        start = 0
+        while start < len(lines):
+            if writer is None:
+                writer = _SegmentWriter(output_dir / f"{table}-{len(segments) + 1:04d}{suffix}", compression, level)
+            take = min(len(lines) - start, segment_rows - writer.rows)
+            writer.write_lines("".join(lines[start:start + take]), take)
+            start += take
+            if writer.rows >= segment_rows:
+                segments.append(writer.close())
+                writer = None
+    if writer is not None:
+        segments.append(writer.close())
+    return segments
+
+
+def _row_lines(table, cursor, chunk_rows):
+    columns = [description[0] for description in cursor.description]
+    # the line prefix is the same for every row, so it is encoded once
+    prefix = '{"table": ' + json.dumps(table) + ', "row": '
+    while True:
+        chunk = cursor.fetchmany(chunk_rows)
+        if not chunk:
+            return
+        yield [prefix + json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "}\n" for row in chunk]
+
+
+def export_table(db_path, table, output_dir, compression="gzip", level=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 segment_rows=DEFAULT_SEGMENT_ROWS):
+    """Export one table into numbered segments. Runs in a worker process, so it only takes plain values."""
+    level = DEFAULT_LEVELS[compression] if level is None else level
+
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = connection.execute(f'SELECT * FROM "{table}"')
+        columns = [description[0] for description in cursor.description]
+        segments = _write_segments(
+            Path(output_dir), table, compression, level, segment_rows, _row_lines(table, cursor, chunk_rows)
+        )
+    finally:
+        connection.close()
+
+    return table, {"rows": sum(segment["rows"] for segment in segments), "columns": columns, "segments": segments}
+
+
+def _write_json_atomic(path, payload):
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+def export_database(db_path, output_dir, compression="gzip", level=None, workers=None, tables=None,
+                    chunk_rows=DEFAULT_CHUNK_ROWS, segment_rows=DEFAULT_SEGMENT_ROWS, extra_manifest=None):
+    """Export every table (or `tables`) of the SQLite file at `db_path` into `output_dir`.
+
+    Tables are exported in parallel by up to `workers` processes, each reading through its own
+    connection, so tables are not read at one single point in time. The change version is read
+    before any table, so a later incremental backup re-exports anything written during the export.
+    The manifest is written last; a folder without one is an unfinished backup.
+    """
+    _require_compression(compression)
+    db_path = Path(db_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as connection:
+        change_version = current_change_version(connection) if has_change_tracking(connection) else None
+        table_names = tables or [table for table in list_tables(connection) if table != CHANGE_TABLE]
+
+    options = dict(compression=compression, level=level, chunk_rows=chunk_rows, segment_rows=segment_rows)
+    workers = min(workers or os.cpu_count() or 1, len(table_names)) or 1
+    if workers == 1:
+        results = [export_table(str(db_path), table, str(output_dir), **options) for table in table_names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(export_table, str(db_path), table, str(output_dir), **options) for table in table_names]
+            results = [future.result() for future in futures]
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": db_path.name,
+        "compression": compression,
+        "kind": "full",
+        "change_version": change_version,
+        "tables": dict(sorted(results)),
+    }
+    manifest.update(extra_manifest or {})
+    _write_json_atomic(output_dir / MANIFEST_NAME, manifest)
+    return manifest
+
+
+def export_changes(db_path, output_dir, since, compression="gzip", level=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                   segment_rows=DEFAULT_SEGMENT_ROWS, extra_manifest=None):
+    """Export the rows changed (and tombstones for rows deleted) since the backup at `since`.
+
+    Unlike a full export this reads every table in one transaction, so the result is a consistent
+    picture of the database at the recorded change version.
+    """
+    _require_compression(compression)
+    _, base = read_manifest(since)
+    base_version = base.get("change_version")
+    if base_version is None:
+        raise BackupError(f"{since} has no change version; take a full backup after upgrading the schema first.")
+
+    level = DEFAULT_LEVELS[compression] if level is None else level
+    db_path = Path(db_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as connection:
+        if not has_change_tracking(connection):
+            raise BackupError(f"{db_path} does not track row changes; run the schema migrations first.")
+        connection.execute("BEGIN")
+        change_version = current_change_version(connection)
+        window = (base_version, change_version)
+
+        for table, key in TRACKED_TABLES.items():
+            cursor = connection.execute(
+                f'SELECT "{table}".* FROM {CHANGE_TABLE} JOIN "{table}" ON "{table}".{key} = {CHANGE_TABLE}.row_key '
+                f"WHERE {CHANGE_TABLE}.version > ? AND {CHANGE_TABLE}.version <= ? "
+                f"AND {CHANGE_TABLE}.table_name = ? AND {CHANGE_TABLE}.deleted = 0 "
+                f"ORDER BY {CHANGE_TABLE}.version",
+                (*window, table),
+            )
+            columns = [description[0] for description in cursor.description]
+            counts = {"rows": 0, "deleted": 0}
+
+            def changed_lines(table=table, cursor=cursor, counts=counts):
+                for lines in _row_lines(table, cursor, chunk_rows):
+                    counts["rows"] += len(lines)
+                    yield lines
+                tombstones = connection.execute(
+                    f"SELECT row_key FROM {CHANGE_TABLE} WHERE version > ? AND version <= ? "
+                    "AND table_name = ? AND deleted = 1 ORDER BY version",
+                    (*window, table),
+                )
+                prefix = '{"table": ' + json.dumps(table) + ', "deleted": '
+                while chunk := tombstones.fetchmany(chunk_rows):
+                    counts["deleted"] += len(chunk)
+                    yield [prefix + json.dumps(row[0]) + "}\n" for row in chunk]
+
+            segments = _write_segments(output_dir, table, compression, level, segment_rows, changed_lines())
+            if segments:
+                results[table] = {**counts, "columns": columns, "segments": segments}
+        connection.rollback()
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": db_path.name,
+        "compression": compression,
+        "kind": "incremental",
+        "base_version": base_version,
+        "change_version": change_version,
+        "tables": results,
+    }
+    manifest.update(extra_manifest or {})
+    _write_json_atomic(output_dir / MANIFEST_NAME, manifest)
+    return manifest
+
+
+def is_backup_folder(path):
+    path = Path(path)
+    return (path.is_dir() and (path / MANIFEST_NAME).exists()) or path.name == MANIFEST_NAME
+
+
+def read_manifest(path):
+    path = Path(path)
+    manifest_path = path if path.name == MANIFEST_NAME else path / MANIFEST_NAME
+    with manifest_path.open("r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    if manifest.get("format") != FORMAT_NAME:
+        raise BackupError(f"{manifest_path} is not a {FORMAT_NAME} manifest.")
+    if manifest.get("version", 0) > FORMAT_VERSION:
+        raise BackupError(f"{manifest_path} uses format version {manifest['version']}, newer than this code supports.")
+    return manifest_path.parent, manifest
+
+
+def _iter_segment_lines(path, compression, expected):
+    with path.open("rb") as handle:
+        raw = _HashingFile(handle)
+        stream = _open_segment_reader(raw, compression)
+        pending = b""
+        while True:
+            block = stream.read(1024 * 1024)
+            if not block:
+                break
+            pending += block
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield line
+        if pending.strip():
+            yield pending
+        # drain anything the decompressor did not need so the checksum covers the whole file
+        while raw.read(1024 * 1024):
+            pass
+
+    if expected and (raw.sha256.hexdigest() != expected["sha256"] or raw.bytes != expected["bytes"]):
+        raise BackupError(f"Checksum mismatch for {path.name}; the backup segment is damaged.")
+
+
+def iter_backup_items(path, tables=None):
+    """Yield the raw line dicts of a backup folder (checksums verified) or a legacy JSONL file."""
+    path = Path(path)
+    if not is_backup_folder(path):
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    item = json.loads(line)
+                    if tables is None or item["table"] in tables:
+                        yield item
+        return
+
+    folder, manifest = read_manifest(path)
+    for table, info in manifest["tables"].items():
+        if tables is not None and table not in tables:
+            continue
+        for segment in info["segments"]:
+            for line in _iter_segment_lines(folder / segment["file"], manifest["compression"], segment):
+                yield json.loads(line)
+
+
+def iter_backup_records(path, tables=None):
+    """Yield (table, row) pairs; tombstones of incremental backups are skipped."""
+    for item in iter_backup_items(path, tables):
+        if "row" in item:
+            yield item["table"], item["row"]
+
+
+def iter_backup_deletes(path, tables=None):
+    """Yield (table, primary key) for every tombstone of an incremental backup."""
+    for item in iter_backup_items(path, tables):
+        if "deleted" in item:
+            yield item["table"], item["deleted"]
+
+
+def check_backup_chain(paths):
+    """Check that `paths` are one full backup followed by incrementals that each continue the previous one.
+
+    Returns the manifests in order; raises BackupError on a gap or a wrong order.
+    """
+    manifests = []
+    for index, path in enumerate(paths):
+        _, manifest = read_manifest(path)
+        kind = manifest.get("kind", "full")
+        if index == 0:
+            if kind != "full":
+                raise BackupError(f"{path} is an incremental backup; a chain must start with a full backup.")
+        elif kind != "incremental":
+            raise BackupError(f"{path} is a full backup; only incremental backups can follow the first one.")
+        elif manifest["base_version"] != manifests[-1].get("change_version"):
+            raise BackupError(
+                f"{path} continues from change version {manifest['base_version']}, "
+                f"but the previous backup ends at {manifests[-1].get('change_version')}."
+            )
+        manifests.append(manifest)
+    return manifests
+
+
+def verify_backup(path):
+    """Re-read every segment and compare checksums and row counts. Returns a list of problems."""
+    folder, manifest = read_manifest(path)
+    problems = []
+    for table, info in manifest["tables"].items():
+        for segment in info["segments"]:
+            segment_path = folder / segment["file"]
+            if not segment_path.exists():
+                problems.append(f"{segment['file']}: missing")
+                continue
+            try:
+                rows = sum(1 for _ in _iter_segment_lines(segment_path, manifest["compression"], segment))
+            except (BackupError, OSError, EOFError) as exc:
+                problems.append(f"{segment['file']}: {exc}")
+                continue
+            if rows != segment["rows"]:
+                problems.append(f"{segment['file']}: {rows} rows, manifest says {segment['rows']}")
+    return problems
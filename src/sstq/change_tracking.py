@@ -0,0 +1,85 @@
+# row change tracking for incremental backups
+# triggers on every tracked table write (table, primary key) into 'row_changes' with a new, ever-increasing
+# version; a delete writes a tombstone (deleted = 1) instead. Only the latest change per row is kept, so the
+# table grows with the number of rows ever touched, not with the number of writes.
+# An incremental backup is "every row_changes entry with a version above the previous backup's version".
+CHANGE_TABLE = "row_changes"
+
+# table -> primary key column; the jobs queue and schema_migrations are runtime state and are not tracked
+TRACKED_TABLES = {
+    "users": "user_id",
+    "players": "player_id",
+    "products": "barcode",
+    "stages": "stage_id",
+    "breakdowns": "breakdown_id",
+    "claims": "claim_id",
+    "evidence": "evidence_id",
+    "issues": "issue_id",
+    "missions": "mission_id",
+    "badges": "badge_id",
+    "changelogs": "log_id",
+    "stored_blobs": "url",
+}
+
+
+def _record(table, key_expression, deleted):
+    # delete + insert rather than INSERT OR REPLACE: a trigger inherits the conflict handling of the
+    # statement that fired it, so OR REPLACE would turn into an abort inside an upsert
+    return (
+        f"DELETE FROM {CHANGE_TABLE} WHERE table_name = '{table}' AND row_key = CAST({key_expression} AS TEXT); "
+        f"INSERT INTO {CHANGE_TABLE} (table_name, row_key, deleted) "
+        f"VALUES ('{table}', CAST({key_expression} AS TEXT), {deleted});"
+    )
+
+
+def install_statements(tables=None):
+    """DDL for the change table and the insert/update/delete triggers of the tracked tables (default: all)."""
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} ("
+        # AUTOINCREMENT so a version is never reused after the newest entry is replaced
+        "version INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "table_name VARCHAR(64) NOT NULL, "
+        "row_key VARCHAR(64) NOT NULL, "
+        "deleted BOOLEAN NOT NULL DEFAULT 0, "
+        "changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        "UNIQUE (table_name, row_key))",
+    ]
+    for table in tables or TRACKED_TABLES:
+        key = TRACKED_TABLES[table]
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_track_insert AFTER INSERT ON {table} "
+            f"BEGIN {_record(table, f'NEW.{key}', 0)} END",
+            # a changed primary key (e.g. an edited barcode) leaves a tombstone for the old key
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_track_update AFTER UPDATE ON {table} BEGIN "
+            f"DELETE FROM {CHANGE_TABLE} WHERE table_name = '{table}' AND row_key = CAST(OLD.{key} AS TEXT) "
+            f"AND OLD.{key} IS NOT NEW.{key}; "
+            f"INSERT INTO {CHANGE_TABLE} (table_name, row_key, deleted) "
+            f"SELECT '{table}', CAST(OLD.{key} AS TEXT), 1 WHERE OLD.{key} IS NOT NEW.{key}; "
+            f"{_record(table, f'NEW.{key}', 0)} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_track_delete AFTER DELETE ON {table} "
+            f"BEGIN {_record(table, f'OLD.{key}', 1)} END",
+        ]
+    return statements
+
+
+def drop_trigger_statements(tables=None):
+    """Remove the triggers (bulk restores do this while loading, then run install_statements() again)."""
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_track_{operation}"
+        for table in tables or TRACKED_TABLES
+        for operation in ("insert", "update", "delete")
+    ]
+
+
+def has_change_tracking(connection):
+    """`connection` is a sqlite3 connection."""
+    row = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (CHANGE_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def current_change_version(connection):
+    """Highest change version in the database (0 before the first tracked write)."""
+    row = connection.execute(f"SELECT MAX(version) FROM {CHANGE_TABLE}").fetchone()
+    return row[0] or 0
@@ -0,0 +1,204 @@
+# retention for the 'changelogs' table: old rows are moved into gzip-compressed JSONL segment files
+# segments are append-only (every archive run appends a new gzip member) and roll over to a new file
+# once they reach CHANGELOG_SEGMENT_MAX_BYTES, so audit history is kept while the hot table stays small
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from flask import current_app
+
+from sstq.extensions import db
+from sstq.models import ChangeLog, User
+
+SEGMENT_PREFIX = "changelog-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+INDEX_FILENAME = "segments.json"
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_dir():
+    configured = current_app.config.get("CHANGELOG_ARCHIVE_DIR")
+    if configured:
+        return Path(configured)
+    return Path(current_app.instance_path) / "changelog_archive"
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _segment_number(path):
+    try:
+        return int(path.name.removeprefix(SEGMENT_PREFIX).removesuffix(SEGMENT_SUFFIX))
+    except ValueError:
+        return None
+
+
+def segment_paths(directory=None):
+    directory = Path(directory) if directory else archive_dir()
+    if not directory.exists():
+        return []
+
+    numbered = []
+    for path in directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+        number = _segment_number(path)
+        if number is not None:
+            numbered.append((number, path))
+    return [path for _, path in sorted(numbered)]
+
+
+def _load_index(directory):
+    index_path = directory / INDEX_FILENAME
+    if not index_path.exists():
+        return {}
+    try:
+        return json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(directory, index):
+    index_path = directory / INDEX_FILENAME
+    tmp_path = index_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(index, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, index_path)
+
+
+def _writable_segment(directory, max_bytes):
+    existing = segment_paths(directory)
+    if existing and existing[-1].stat().st_size < max_bytes:
+        return existing[-1]
+
+    next_number = (_segment_number(existing[-1]) + 1) if existing else 1
+    return directory / f"{SEGMENT_PREFIX}{next_number:06d}{SEGMENT_SUFFIX}"
+
+
+def _archive_record(log, user, archived_at):
+    return {
+        "log_id": log.log_id,
+        "timestamp": log.timestamp.isoformat(sep=" ") if log.timestamp else None,
+        "user_id": log.user_id,
+        "username": user.username if user else None,
+        "role": user.role if user else None,
+        "change_summary": log.change_summary,
+        "archived_at": archived_at.isoformat(sep=" "),
+    }
+
+
+def _append_segment(directory, records, max_bytes):
+    segment_path = _writable_segment(directory, max_bytes)
+    payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    # opening a gzip file in append mode writes a new member; readers see all members as one stream
+    with gzip.open(segment_path, "ab") as handle:
+        handle.write(payload.encode("utf-8"))
+        handle.flush()
+        os.fsync(handle.fileobj.fileno())
+
+    timestamps = [record["timestamp"] for record in records if record["timestamp"]]
+    index = _load_index(directory)
+    entry = index.setdefault(segment_path.name, {"rows": 0, "min_timestamp": None, "max_timestamp": None})
+    entry["rows"] += len(records)
+    if timestamps:
+        entry["min_timestamp"] = min(filter(None, [entry["min_timestamp"], *timestamps]))
+        entry["max_timestamp"] = max(filter(None, [entry["max_timestamp"], *timestamps]))
+    _save_index(directory, index)
+    return segment_path
+
+
+def archive_change_logs(retention_days=None, now=None, criteria=None, progress=None):
+    """Move change log rows older than the retention window into archive segments.
+
+    Rows are written to the segment before they are deleted from the table, so an interrupted
+    run can leave a row in both places but never loses one. `criteria` replaces the age cutoff
+    with another filter (all rows of one user, say) and `progress` is called with the size of
+    each archived batch. Returns the number of rows moved.
+    """
+    if retention_days is None:
+        retention_days = current_app.config.get("CHANGELOG_RETENTION_DAYS", 90)
+    now = now or _utcnow()
+    if criteria is None:
+        criteria = ChangeLog.timestamp <= now - timedelta(days=max(0, retention_days))
+    max_bytes = current_app.config.get("CHANGELOG_SEGMENT_MAX_BYTES", 4 * 1024 * 1024)
+
+    directory = archive_dir()
+
+    moved = 0
+    while True:
+        rows = (
+            db.session.query(ChangeLog, User)
+            .outerjoin(User, ChangeLog.user_id == User.user_id)
+            .filter(criteria)
+            .order_by(ChangeLog.timestamp.asc(), ChangeLog.log_id.asc())
+            .limit(ARCHIVE_BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+
+        directory.mkdir(parents=True, exist_ok=True)
+        _append_segment(directory, [_archive_record(log, user, now) for log, user in rows], max_bytes)
+        log_ids = [log.log_id for log, _ in rows]
+        ChangeLog.query.filter(ChangeLog.log_id.in_(log_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        moved += len(rows)
+        if progress:
+            progress(len(rows))
+
+    return moved
+
+
+def _segment_overlaps(entry, since, until):
+    if not entry or not entry.get("max_timestamp"):
+        return True
+    if since and entry["max_timestamp"] < since:
+        return False
+    if until and entry["min_timestamp"] and entry["min_timestamp"] >= until:
+        return False
+    return True
+
+
+def iter_archived_logs(since=None, until=None, newest_first=False, directory=None):
+    """Yield archived change log records, optionally limited to a timestamp range.
+
+    `since` is inclusive and `until` exclusive; both are compared against the stored ISO
+    timestamps, so plain dates such as '2026-01-01' work as well. Segments whose index range
+    falls outside the window are skipped without being decompressed.
+    """
+    directory = Path(directory) if directory else archive_dir()
+    index = _load_index(directory)
+    since_key = since.isoformat(sep=" ") if isinstance(since, datetime) else since
+    until_key = until.isoformat(sep=" ") if isinstance(until, datetime) else until
+
+    paths = segment_paths(directory)
+    if newest_first:
+        paths = list(reversed(paths))
+
+    for path in paths:
+        if not _segment_overlaps(index.get(path.name), since_key, until_key):
+            continue
+
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            records = (json.loads(line) for line in handle if line.strip())
+            if newest_first:
+                records = reversed(list(records))
+            for record in records:
+                timestamp = record.get("timestamp") or ""
+                if since_key and timestamp < since_key:
+                    continue
+                if until_key and timestamp >= until_key:
+                    continue
+                yield record
+
+
+def archive_summary(directory=None):
+    directory = Path(directory) if directory else archive_dir()
+    index = _load_index(directory)
+    paths = segment_paths(directory)
+    return {
+        "segments": len(paths),
+        "rows": sum(index.get(path.name, {}).get("rows", 0) for path in paths),
+        "bytes": sum(path.stat().st_size for path in paths),
+    }
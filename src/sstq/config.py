@@ -1,10 +1,124 @@
 import os
+import secrets
+import tempfile
+import time
+
+SECRET_KEY_FILENAME = "secret_key"
+
+
+def _parse_pragma_overrides(raw_value):
+    # "busy_timeout=10000,mmap_size=0" -> {"busy_timeout": "10000", "mmap_size": "0"}
+    overrides = {}
+    for part in (raw_value or "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            overrides[name.strip().lower()] = value.strip()
+    return overrides
+
+
+def _parse_widths(raw_value):
+    # "320,640,1280" -> (320, 640, 1280)
+    return tuple(sorted({int(part) for part in (raw_value or "").split(",") if part.strip()}))
+
+
+def load_instance_secret_key(instance_path):
+    # every worker process has to sign sessions with the same key, so when SECRET_KEY is not set the key is
+    # generated once and kept in the instance folder. The file is written under a temporary name and then
+    # hard-linked into place, which fails if another worker got there first; that worker's key is used instead.
+    os.makedirs(instance_path, exist_ok=True)
+    key_path = os.path.join(instance_path, SECRET_KEY_FILENAME)
+
+    if not os.path.exists(key_path):
+        fd, temp_path = tempfile.mkstemp(dir=instance_path, prefix=".secret_key-")
+        try:
+            with os.fdopen(fd, "w") as handle:
+                handle.write(secrets.token_hex(32))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.chmod(temp_path, 0o600)
+            os.link(temp_path, key_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+
+    # the linked file is always complete, but an external tool may still be writing one by hand
+    for _ in range(50):
+        with open(key_path) as handle:
+            key = handle.read().strip()
+        if key:
+            return key
+        time.sleep(0.1)
+    raise RuntimeError(f"Secret key file {key_path} is empty. Delete it or set SECRET_KEY.")
 
 
 class Config:
-    SECRET_KEY = os.environ.get("SECRET_KEY") or os.urandom(32).hex()
+    # unset means a key shared by all workers is loaded from '<instance folder>/secret_key', see create_app()
+    SECRET_KEY = os.environ.get("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///trace_quest.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     ALLOW_VERIFIER_SELF_REGISTER = (
         os.environ.get("ALLOW_VERIFIER_SELF_REGISTER", "").strip().lower() == "true"
     )
+
+    # change log rows older than this many days are moved out of the 'changelogs' table into archive segments
+    CHANGELOG_RETENTION_DAYS = int(os.environ.get("CHANGELOG_RETENTION_DAYS", "90"))
+    # empty means '<instance folder>/changelog_archive'
+    CHANGELOG_ARCHIVE_DIR = os.environ.get("CHANGELOG_ARCHIVE_DIR", "")
+    # a new segment file is started once the current one reaches this size
+    CHANGELOG_SEGMENT_MAX_BYTES = int(os.environ.get("CHANGELOG_SEGMENT_MAX_BYTES", str(4 * 1024 * 1024)))
+
+    # background job runner: worker threads per process, rows per delete batch and retry behaviour
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+    JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", "500"))
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_DELAY_SECONDS = float(os.environ.get("JOB_RETRY_DELAY_SECONDS", "5"))
+    # a running job whose heartbeat (claim or last progress report) is older than this is put back in the queue
+    JOB_STALE_AFTER_SECONDS = int(os.environ.get("JOB_STALE_AFTER_SECONDS", "900"))
+
+    # PRAGMA profile applied to every SQLite connection ('production' or 'default'), see 'sstq/sqlite_tuning.py'
+    SQLITE_TUNING_PROFILE = os.environ.get("SQLITE_TUNING_PROFILE", "production")
+    SQLITE_PRAGMA_OVERRIDES = _parse_pragma_overrides(os.environ.get("SQLITE_PRAGMAS"))
+
+    # online snapshots (see 'sstq/snapshots.py'); empty SNAPSHOT_DIR means '<instance folder>/snapshots'
+    SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "")
+    # the newest SNAPSHOT_KEEP snapshots are always kept, older ones go once they pass the retention age
+    SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", "7"))
+    SNAPSHOT_RETENTION_DAYS = int(os.environ.get("SNAPSHOT_RETENTION_DAYS", "30"))
+    # pages copied per backup step and the pause between steps, so writers are only blocked briefly
+    # (WAL databases do not block writers and are copied in one step)
+    SNAPSHOT_PAGES_PER_STEP = int(os.environ.get("SNAPSHOT_PAGES_PER_STEP", "1024"))
+    SNAPSHOT_STEP_SLEEP = float(os.environ.get("SNAPSHOT_STEP_SLEEP", "0.05"))
+    # a write to the database makes a stepped copy start over; give up after this many restarts or seconds
+    SNAPSHOT_MAX_RESTARTS = int(os.environ.get("SNAPSHOT_MAX_RESTARTS", "10"))
+    SNAPSHOT_TIMEOUT_SECONDS = float(os.environ.get("SNAPSHOT_TIMEOUT_SECONDS", "600"))
+
+    # logged-in identities (id, username, role) are cached for this many seconds per process; 0 disables the cache
+    IDENTITY_CACHE_TTL = float(os.environ.get("IDENTITY_CACHE_TTL", "30"))
+    IDENTITY_CACHE_SIZE = int(os.environ.get("IDENTITY_CACHE_SIZE", "1024"))
+
+    # product images get WebP copies at these widths for 'srcset' (needs Pillow), see 'sstq/image_variants.py'
+    IMAGE_VARIANT_WIDTHS = _parse_widths(os.environ.get("IMAGE_VARIANT_WIDTHS", "320,640,1280"))
+    IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", "80"))
+
+    # requests with a bigger body are refused (413); the helper upload endpoints also cap each file by type
+    # and stream it straight to disk, see 'sstq/upload_streams.py'
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", str(32 * 1024 * 1024)))
+    UPLOAD_MAX_IMAGE_BYTES = int(os.environ.get("UPLOAD_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+    UPLOAD_MAX_PDF_BYTES = int(os.environ.get("UPLOAD_MAX_PDF_BYTES", str(20 * 1024 * 1024)))
+
+    # temp uploads in 'static/uploads/cache' not shown by an add/edit page for this long are deleted,
+    # see 'sstq/upload_cache.py'; the job runner sweeps every UPLOAD_CACHE_SWEEP_SECONDS (0 turns that off)
+    UPLOAD_CACHE_TTL_HOURS = float(os.environ.get("UPLOAD_CACHE_TTL_HOURS", "24"))
+    UPLOAD_CACHE_SWEEP_SECONDS = int(os.environ.get("UPLOAD_CACHE_SWEEP_SECONDS", "3600"))
+
+    # '/metrics' requires 'Authorization: Bearer <token>'; without a token it is only served in debug and testing
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+    # opt-in per-request SQL instrumentation, see 'sstq/sql_instrumentation.py'
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "").strip().lower() in ("1", "true")
+    # log a request once its SQL time or query count reaches these limits
+    SQL_SLOW_REQUEST_MS = float(os.environ.get("SQL_SLOW_REQUEST_MS", "200"))
+    SQL_QUERY_COUNT_THRESHOLD = int(os.environ.get("SQL_QUERY_COUNT_THRESHOLD", "30"))
+    # a SELECT with the same shape repeated this many times in one request is reported as a likely N+1
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "5"))
@@ -0,0 +1,29 @@
+# gunicorn settings for serving sstq.wsgi:app, sized from the environment:
+#   WEB_CONCURRENCY   worker processes (default: 2 x CPUs + 1, capped at 8)
+#   GUNICORN_THREADS  threads per worker (default: 4)
+#   HOST / PORT       bind address (default: 0.0.0.0:8000)
+#   GUNICORN_TIMEOUT  seconds before a silent worker is restarted (default: 60)
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+# the app (and the shared secret key) is loaded once in the master and inherited by every worker
+preload_app = True
+# "-" logs requests to stdout, an empty value turns the access log off
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+
+
+def post_fork(server, worker):
+    from sstq.extensions import db
+    from sstq.jobs import start_job_runner
+    from sstq.wsgi import app
+
+    with app.app_context():
+        # connections opened by the master during preload must not be shared with the children
+        db.engine.dispose(close=False)
+    # jobs are claimed with a conditional UPDATE, so every worker can safely run its own job threads
+    start_job_runner(app)
@@ -0,0 +1,100 @@
+# short-lived cache of who is logged in, used by the Flask-Login user_loader in 'routes/auth.py'
+# authenticated requests only need user_id, username and role, so those are kept in memory for
+# IDENTITY_CACHE_TTL seconds instead of loading the users row on every request.
+# The cache is per process: admin changes invalidate it here, other workers catch up when the TTL expires.
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import UserMixin
+
+EXTENSION_KEY = "sstq_identity_cache"
+
+
+class CachedIdentity(UserMixin):
+    """The fields of a User that request handling reads, detached from the database session."""
+
+    def __init__(self, user_id, username, role):
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.user_id, user.username, user.role)
+
+    def get_id(self):
+        return str(self.user_id)
+
+    @property
+    def is_consumer(self):
+        return self.role == "consumer"
+
+    @property
+    def is_verifier(self):
+        return self.role == "verifier"
+
+    @property
+    def is_admin(self):
+        return self.role == "admin"
+
+    def __repr__(self):
+        return f"User ID: {self.user_id} - Username: {self.username} - Role: {self.role} (cached)"
+
+
+class IdentityCache:
+    def __init__(self, ttl_seconds, max_size):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[identity.user_id] = (identity, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(identity.user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_identity_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get(EXTENSION_KEY)
+    if cache is None:
+        cache = IdentityCache(
+            app.config.get("IDENTITY_CACHE_TTL", 30),
+            app.config.get("IDENTITY_CACHE_SIZE", 1024),
+        )
+        app.extensions[EXTENSION_KEY] = cache
+    return cache
+
+
+def invalidate_identity(user_id):
+    get_identity_cache().invalidate(user_id)
@@ -0,0 +1,155 @@
+# resized WebP copies of product images for responsive '<img srcset>'
+# photos from the scan page are often several MB while the product list shows them a few hundred pixels
+# wide, so every stored product image gets fixed-width WebP variants in a 'variants' folder next to it.
+# Pillow is optional: without it no variants are written and the pages keep using the original file.
+import os
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlparse
+
+from flask import current_app
+
+from sstq.upload_store import resolve_upload_path
+
+VARIANT_DIR = "variants"
+VARIANT_SUFFIX = ".webp"
+EXIF_ORIENTATION = 0x0112
+# orientations that turn the image by 90 degrees, so the displayed width is the stored height
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+@lru_cache(maxsize=1)
+def _pillow():
+    # imported on first use rather than with the module, so create_app() does not load Pillow
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:  # optional, install with 'pip install -e ".[images]"'
+        return None, None
+    return Image, ImageOps
+
+
+def variants_available():
+    return _pillow()[0] is not None
+
+
+def variant_path(image_path, width):
+    image_path = Path(image_path)
+    return image_path.parent / VARIANT_DIR / f"{image_path.stem}-{width}w{VARIANT_SUFFIX}"
+
+
+def generate_variants(image_path, widths, quality=80, force=False):
+    """Write the WebP variants of one image and return the paths written.
+
+    Widths that are not smaller than the original are skipped; the original already serves those.
+    Existing variants are kept unless `force` is set.
+    """
+    Image, ImageOps = _pillow()
+    if Image is None:
+        return []
+
+    image_path = Path(image_path)
+    targets = [(width, variant_path(image_path, width)) for width in sorted(set(widths))]
+    if not force:
+        targets = [(width, path) for width, path in targets if not path.exists()]
+    if not targets:
+        return []
+
+    written = []
+    with Image.open(image_path) as source:
+        # phone cameras store the rotation in EXIF; apply it so the variants are upright
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+        for width, path in targets:
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(f".{path.name}.partial")
+            image.resize((width, height), Image.Resampling.LANCZOS).save(partial, "WEBP", quality=quality, method=4)
+            os.replace(partial, path)
+            written.append(path)
+    _srcset.cache_clear()
+    return written
+
+
+def generate_variants_for_upload(image_path):
+    """Best effort for the upload paths: a file Pillow cannot read is still a valid upload, just without variants."""
+    if not variants_available():
+        return []
+    try:
+        return generate_variants(
+            image_path,
+            current_app.config["IMAGE_VARIANT_WIDTHS"],
+            quality=current_app.config["IMAGE_VARIANT_QUALITY"],
+        )
+    except Exception:
+        current_app.logger.exception("Could not create image variants for %s", image_path)
+        return []
+
+
+def delete_variants(image_path):
+    image_path = Path(image_path)
+    directory = image_path.parent / VARIANT_DIR
+    if not directory.is_dir():
+        return
+    # glob rather than the configured widths, so variants of a since-removed width go as well
+    for path in directory.glob(f"{image_path.stem}-*w{VARIANT_SUFFIX}"):
+        path.unlink(missing_ok=True)
+    _srcset.cache_clear()
+
+
+def original_width(image_path):
+    """Displayed width of an image (EXIF rotation applied) from its header, or None without Pillow."""
+    Image = _pillow()[0]
+    if Image is None:
+        return None
+    try:
+        with Image.open(image_path) as image:
+            width, height = image.size
+            return height if image.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS else width
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _srcset(image_path, url_path, widths, variants_mtime_ns):
+    # 'variants_mtime_ns' is only part of the key: adding or removing a variant changes the folder's mtime, which
+    # also reaches other processes (the backfill script); this process clears the cache when it writes variants
+    image_path = Path(image_path)
+    url_folder = url_path.rsplit("/", 1)[0]
+    entries = []
+    for width in widths:
+        path = variant_path(image_path, width)
+        if path.exists():
+            entries.append(f"{url_folder}/{VARIANT_DIR}/{path.name} {width}w")
+    if not entries:
+        return ""
+    # the original is the candidate for screens wider than the largest variant
+    width = original_width(image_path)
+    if width:
+        entries.append(f"{url_path} {width}w")
+    return ", ".join(entries)
+
+
+def image_srcset(image_url):
+    """'srcset' value listing the WebP variants of an uploaded image and the original ('' without variants).
+
+    Pages render this for every product card, so the result is cached per image until its variants folder changes.
+    """
+    image_path = resolve_upload_path(image_url)
+    if image_path is None:
+        return ""
+    try:
+        variants_mtime_ns = (image_path.parent / VARIANT_DIR).stat().st_mtime_ns
+    except OSError:
+        return ""
+    return _srcset(
+        str(image_path),
+        urlparse(str(image_url)).path,
+        tuple(current_app.config["IMAGE_VARIANT_WIDTHS"]),
+        variants_mtime_ns,
+    )
+
+
+def install_image_variants(app):
+    app.jinja_env.globals["image_srcset"] = image_srcset
@@ -0,0 +1,243 @@
+# in-process background jobs: rows in the 'jobs' table are the queue, a thread pool executes them
+# handlers register with '@job_handler("name")' next to the routes that enqueue them
+# when no runner has been started (tests, scripts, JOB_WORKERS=0) enqueue_job() makes one inline attempt;
+# a job that fails it stays 'queued' for the admin retry button or the next runner start
+# '@job_handler("name", every="CONFIG_KEY")' also queues the job every CONFIG_KEY seconds while a runner is up
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from sstq.extensions import db
+from sstq.models import Job
+
+EXTENSION_KEY = "sstq_job_runner"
+ACTIVE_STATUSES = ("queued", "running")
+
+_handlers = {}
+# job type -> config key holding its interval in seconds (0 or less turns the schedule off)
+_schedules = {}
+
+
+def job_handler(job_type, every=None):
+    def decorator(func):
+        _handlers[job_type] = func
+        if every is not None:
+            _schedules[job_type] = every
+        return func
+    return decorator
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """Handed to every job handler so it can report progress between batches."""
+
+    def __init__(self, job_id, batch_size):
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.current = 0
+        self.total = None
+
+    def set_total(self, total, message=None):
+        self.total = total
+        self._save(message)
+
+    def advance(self, amount=1, message=None):
+        self.current += amount
+        self._save(message)
+
+    def _save(self, message):
+        # every progress report doubles as the heartbeat JobRunner.recover() checks
+        values = {"progress_current": self.current, "progress_total": self.total, "updated_at": _utcnow()}
+        if message is not None:
+            values["progress_message"] = message[:256]
+        db.session.execute(update(Job).where(Job.job_id == self.job_id).values(**values))
+        db.session.commit()
+
+
+def delete_in_batches(job, model, pk_column, *criteria):
+    """Delete matching rows a batch at a time, committing after each batch.
+
+    Committing per batch keeps every SQLite write transaction short, so requests are not
+    blocked behind one large delete. Returns the number of rows removed.
+    """
+    deleted = 0
+    while True:
+        ids = [row[0] for row in db.session.query(pk_column).filter(*criteria).limit(job.batch_size).all()]
+        if not ids:
+            return deleted
+        model.query.filter(pk_column.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        job.advance(len(ids))
+
+
+def run_job(job_id):
+    """Claim and execute one queued job. Returns True when the job should be retried."""
+    now = _utcnow()
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.job_id == job_id, Job.status == "queued")
+        .values(status="running", started_at=now, updated_at=now, attempts=Job.attempts + 1, error=None)
+    )
+    db.session.commit()
+    if claimed.rowcount != 1:
+        return False
+
+    job = db.session.get(Job, job_id)
+    handler = _handlers.get(job.job_type)
+    context = JobContext(job_id, current_app.config.get("JOB_BATCH_SIZE", 500))
+
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job type '{job.job_type}'.")
+        handler(context, **json.loads(job.payload or "{}"))
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.exception("Job %s (%s) failed", job_id, job.job_type)
+        job = db.session.get(Job, job_id)
+        retry = handler is not None and job.attempts < job.max_attempts
+        job.status = "queued" if retry else "failed"
+        job.error = f"{type(exc).__name__}: {exc}"[:512]
+        job.updated_at = _utcnow()
+        job.finished_at = None if retry else job.updated_at
+        db.session.commit()
+        return retry
+
+    job = db.session.get(Job, job_id)
+    job.status = "succeeded"
+    job.finished_at = job.updated_at = _utcnow()
+    if context.total is not None:
+        job.progress_current = context.total
+    db.session.commit()
+    return False
+
+
+class JobRunner:
+    def __init__(self, app, workers):
+        self.app = app
+        self.retry_delay = app.config.get("JOB_RETRY_DELAY_SECONDS", 5)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sstq-job")
+        self._timers = {}
+        self._stopped = False
+
+    def submit(self, job_id):
+        self.executor.submit(self._execute, job_id)
+
+    def _execute(self, job_id):
+        with self.app.app_context():
+            try:
+                retry = run_job(job_id)
+            finally:
+                db.session.remove()
+
+        if retry:
+            timer = threading.Timer(self.retry_delay, self.submit, args=(job_id,))
+            timer.daemon = True
+            timer.start()
+
+    def recover(self):
+        # jobs left 'running' by a process that died are put back in the queue once their heartbeat is stale;
+        # a long job that keeps reporting progress stays with the worker running it
+        stale_before = _utcnow() - timedelta(seconds=self.app.config.get("JOB_STALE_AFTER_SECONDS", 900))
+        with self.app.app_context():
+            db.session.execute(
+                update(Job)
+                .where(Job.status == "running", func.coalesce(Job.updated_at, Job.started_at) < stale_before)
+                .values(status="queued")
+            )
+            db.session.commit()
+            job_ids = [row[0] for row in db.session.query(Job.job_id).filter(Job.status == "queued").order_by(Job.job_id)]
+            db.session.remove()
+
+        for job_id in job_ids:
+            self.submit(job_id)
+
+    def schedule(self, job_type, interval):
+        """Queue `job_type` every `interval` seconds, skipped while one is still queued or running."""
+        if self._stopped:
+            return
+        timer = threading.Timer(interval, self._enqueue_scheduled, args=(job_type, interval))
+        timer.daemon = True
+        self._timers[job_type] = timer
+        timer.start()
+
+    def _enqueue_scheduled(self, job_type, interval):
+        # every worker process has its own timer; the active check keeps them from piling up duplicates
+        with self.app.app_context():
+            try:
+                if not job_is_active(job_type):
+                    enqueue_job(job_type)
+            except Exception:
+                self.app.logger.exception("Could not queue scheduled job %s", job_type)
+            finally:
+                db.session.remove()
+        self.schedule(job_type, interval)
+
+    def shutdown(self, wait=True):
+        self._stopped = True
+        for timer in self._timers.values():
+            timer.cancel()
+        self.executor.shutdown(wait=wait)
+
+
+def start_job_runner(app):
+    """Start the worker pool for a serving process and resume any queued jobs."""
+    workers = app.config.get("JOB_WORKERS", 2)
+    if workers <= 0 or app.testing:
+        return None
+
+    runner = app.extensions.get(EXTENSION_KEY)
+    if runner is None:
+        runner = JobRunner(app, workers)
+        app.extensions[EXTENSION_KEY] = runner
+        runner.recover()
+        for job_type, interval_key in _schedules.items():
+            interval = app.config.get(interval_key, 0)
+            if interval > 0:
+                runner.schedule(job_type, interval)
+    return runner
+
+
+def enqueue_job(job_type, payload=None, created_by=None, max_attempts=None):
+    if job_type not in _handlers:
+        raise LookupError(f"No handler registered for job type '{job_type}'.")
+
+    job = Job(
+        job_type=job_type,
+        payload=json.dumps(payload or {}),
+        created_by=created_by,
+        max_attempts=max_attempts or current_app.config.get("JOB_MAX_ATTEMPTS", 3),
+    )
+    db.session.add(job)
+    db.session.commit()
+    dispatch_job(job.job_id)
+    return job.job_id
+
+
+def dispatch_job(job_id):
+    """Hand a queued job to the runner, or make a single inline attempt when no runner is started.
+
+    The inline attempt never waits out JOB_RETRY_DELAY_SECONDS inside a request; a job it leaves
+    'queued' is picked up again by the admin retry button or the next runner start.
+    """
+    runner = current_app.extensions.get(EXTENSION_KEY)
+    if runner is not None:
+        runner.submit(job_id)
+    else:
+        run_job(job_id)
+
+
+def job_is_active(job_type, **payload_match):
+    """Check whether a queued/running job of this type already targets the same payload values."""
+    for job in Job.query.filter(Job.job_type == job_type, Job.status.in_(ACTIVE_STATUSES)).all():
+        payload = json.loads(job.payload or "{}")
+        if all(payload.get(key) == value for key, value in payload_match.items()):
+            return True
+    return False
@@ -2,16 +2,28 @@ import os
 
 from sstq import create_app
 from sstq.extensions import db
+from sstq.jobs import start_job_runner
+from sstq.migrations import ensure_schema
+from sstq.sqlite_tuning import pragma_report
 
 app = create_app()
 
-# when this file is ran, the DB is created and application is started
+# when this file is ran, the DB schema is brought up to date and application is started
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        ensure_schema(echo=print)
+        sqlite_report = pragma_report(app, db.engine)
+
+    debug = os.environ.get("FLASK_DEBUG", "").strip() == "1"
+    if sqlite_report:
+        settings = ", ".join(f"{name}={value}" for name, value in sqlite_report["pragmas"].items())
+        print(f"SQLite profile '{sqlite_report['profile']}': {settings}")
+    # with the debug reloader only the child process that actually serves requests runs jobs
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_job_runner(app)
 
     app.run(
-        debug=os.environ.get("FLASK_DEBUG", "").strip() == "1",
+        debug=debug,
         host=os.environ.get("HOST", "0.0.0.0"),
         port=int(os.environ.get("PORT", "8000")),
     )
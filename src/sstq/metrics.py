@@ -0,0 +1,222 @@
+# small in-process metrics registry rendered in the Prometheus text format at '/metrics'
+# updates are a dict lookup plus an add under a per-metric lock, so recording on hot paths stays cheap.
+# Values live in the process: with several gunicorn workers each worker reports its own series.
+import bisect
+import threading
+from time import perf_counter
+
+from flask import g, request
+
+from sstq.extensions import db
+
+# any other method a client sends is folded into "other", so it cannot add label values
+KNOWN_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(value) for value in labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        # only the matching bucket is incremented here; render() accumulates them
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._values.items())
+        lines = self.header()
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# http
+REQUESTS = registry.counter(
+    "sstq_http_requests_total", "HTTP requests handled.", ("blueprint", "endpoint", "method", "status")
+)
+REQUEST_LATENCY = registry.histogram(
+    "sstq_http_request_duration_seconds", "Time spent handling HTTP requests.", ("blueprint", "endpoint")
+)
+IN_FLIGHT = registry.gauge("sstq_http_requests_in_flight", "HTTP requests currently being handled.", ("blueprint",))
+
+# domain
+SCANS = registry.counter("sstq_product_scans_total", "Barcode lookups submitted through search_product.")
+MISSIONS_STARTED = registry.counter("sstq_missions_started_total", "Trace Quest missions started.", ("tier",))
+MISSIONS_SUBMITTED = registry.counter("sstq_missions_submitted_total", "Trace Quest missions submitted.", ("tier",))
+ISSUES_REPORTED = registry.counter("sstq_issues_reported_total", "Claim issues reported by users.")
+UPLOAD_BYTES = registry.counter("sstq_upload_bytes_total", "Bytes written for uploaded files.", ("kind",))
+UPLOADS = registry.counter("sstq_uploads_total", "Uploaded files stored.", ("kind",))
+
+# database pool, refreshed on every scrape
+DB_POOL = registry.gauge("sstq_db_pool_connections", "SQLAlchemy pool connections by state.", ("state",))
+
+
+def _labels():
+    # 404s have no endpoint; folding them together keeps the label set bounded
+    return request.blueprint or "app", request.endpoint or "unmatched"
+
+
+def _start_request():
+    g._metrics_start = perf_counter()
+    IN_FLIGHT.inc(request.blueprint or "app")
+
+
+def _record_status(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return
+    blueprint, endpoint = _labels()
+    status = g.pop("_metrics_status", 500)
+    IN_FLIGHT.dec(blueprint)
+    method = request.method if request.method in KNOWN_METHODS else "other"
+    REQUESTS.inc(blueprint, endpoint, method, status)
+    REQUEST_LATENCY.observe(perf_counter() - start, blueprint, endpoint)
+
+
+def _update_pool_stats(engine):
+    pool = engine.pool
+    for state, reader in (
+        ("size", "size"),
+        ("checked_out", "checkedout"),
+        ("checked_in", "checkedin"),
+        ("overflow", "overflow"),
+    ):
+        method = getattr(pool, reader, None)
+        if callable(method):
+            DB_POOL.set(state, value=method())
+
+
+def render_metrics():
+    # pool numbers are read at scrape time instead of being tracked on every checkout
+    _update_pool_stats(db.engine)
+    return registry.render()
+
+
+def install_metrics(app):
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
@@ -0,0 +1,214 @@
+# versioned schema migrations for existing databases
+# 'db.create_all()' only creates missing tables, so anything that changes an existing table (indexes, new
+# columns) is added here as a numbered step. Applied versions are stored in the 'schema_migrations' table.
+# Steps must be idempotent: a fresh database gets its tables (and their declared indexes) from step 1,
+# so later steps should use 'IF NOT EXISTS' or check the live schema before changing it.
+# create_app() never touches the schema; entry points call ensure_schema() once after building the app.
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+
+from sstq.change_tracking import drop_trigger_statements, install_statements as change_tracking_statements
+from sstq.extensions import db
+from sstq.upload_store import reference_trigger_statements
+
+VERSION_TABLE = "schema_migrations"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable
+
+
+# the tables tracked when change tracking was added; later tables get their triggers in their own step
+_FIRST_TRACKED_TABLES = [
+    "users", "players", "products", "stages", "breakdowns", "claims",
+    "evidence", "issues", "missions", "badges", "changelogs",
+]
+
+
+def _create_base_schema(connection):
+    db.metadata.create_all(bind=connection)
+
+
+def _add_product_content_hashes(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(products)"))}
+    if "content_hash" not in columns:
+        connection.execute(text("ALTER TABLE products ADD COLUMN content_hash VARCHAR(64)"))
+    db.metadata.tables["import_checkpoints"].create(bind=connection, checkfirst=True)
+
+
+def _add_checkpoint_import_mode(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(import_checkpoints)"))}
+    if "update_existing" not in columns:
+        # checkpoints written so far may come from insert-only runs; the next update run reads those files again
+        connection.execute(text("ALTER TABLE import_checkpoints ADD COLUMN update_existing BOOLEAN NOT NULL DEFAULT 0"))
+
+
+def _add_job_heartbeat(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(jobs)"))}
+    if "updated_at" not in columns:
+        # jobs running during the upgrade have no heartbeat yet; recovery falls back to their start time
+        connection.execute(text("ALTER TABLE jobs ADD COLUMN updated_at DATETIME"))
+
+
+def _add_upload_store(connection):
+    db.metadata.tables["stored_blobs"].create(bind=connection, checkfirst=True)
+    for statement in [*reference_trigger_statements(), *change_tracking_statements(["stored_blobs"])]:
+        connection.execute(text(statement))
+
+
+def _add_pending_uploads(connection):
+    db.metadata.tables["pending_uploads"].create(bind=connection, checkfirst=True)
+
+
+def _keep_issues_of_removed_claims(connection):
+    columns = {row[1]: row for row in connection.execute(text("PRAGMA table_info(issues)"))}
+    if not columns["claim_id"][3]:
+        return
+    # SQLite cannot change a column's constraints in place, so the table is copied into the new definition
+    table = db.metadata.tables["issues"]
+    create = str(CreateTable(table).compile(dialect=connection.dialect))
+    connection.execute(text(create.replace("CREATE TABLE issues ", "CREATE TABLE issues_new ", 1)))
+    # columns added to the model later than the old table take their defaults
+    names = [column.name for column in table.columns if column.name in columns]
+    column_sql = ", ".join(names)
+    # older product edits left issues pointing at deleted claims (and users); they get the same null
+    parents = {"claim_id": "claims", "user_id": "users"}
+    select_sql = ", ".join(
+        f"CASE WHEN {name} IN (SELECT {name} FROM {parents[name]}) THEN {name} END" if name in parents else name
+        for name in names
+    )
+    connection.execute(text(f"INSERT INTO issues_new ({column_sql}) SELECT {select_sql} FROM issues"))
+    connection.execute(text("DROP TABLE issues"))
+    connection.execute(text("ALTER TABLE issues_new RENAME TO issues"))
+    # the change-tracking triggers went with the old table
+    for statement in change_tracking_statements(["issues"]):
+        connection.execute(text(statement))
+
+
+def _sql_steps(*statements):
+    def apply(connection):
+        for statement in statements:
+            connection.execute(text(statement))
+    return apply
+
+
+MIGRATIONS = [
+    Migration(1, "Create base schema", _create_base_schema),
+    Migration(
+        2,
+        "Index product passport lookups",
+        _sql_steps(
+            "CREATE INDEX IF NOT EXISTS ix_stages_product_barcode ON stages (product_barcode)",
+            "CREATE INDEX IF NOT EXISTS ix_breakdowns_product_barcode ON breakdowns (product_barcode)",
+            "CREATE INDEX IF NOT EXISTS ix_claims_product_barcode ON claims (product_barcode)",
+            "CREATE INDEX IF NOT EXISTS ix_evidence_claim_id ON evidence (claim_id)",
+        ),
+    ),
+    Migration(
+        3,
+        "Index mission history, badges and change log",
+        _sql_steps(
+            "CREATE INDEX IF NOT EXISTS ix_missions_player_group_question "
+            "ON missions (player_id, mission_group_id, question_number)",
+            "CREATE INDEX IF NOT EXISTS ix_missions_player_completed ON missions (player_id, completed_at)",
+            "CREATE INDEX IF NOT EXISTS ix_badges_player_id ON badges (player_id)",
+            "CREATE INDEX IF NOT EXISTS ix_changelogs_user_timestamp ON changelogs (user_id, timestamp)",
+        ),
+    ),
+    Migration(
+        4,
+        "Track row changes for incremental backups",
+        _sql_steps(*change_tracking_statements(_FIRST_TRACKED_TABLES)),
+    ),
+    Migration(
+        5,
+        "Rebuild change-tracking triggers so upserts can fire them",
+        _sql_steps(
+            *drop_trigger_statements(_FIRST_TRACKED_TABLES),
+            *change_tracking_statements(_FIRST_TRACKED_TABLES),
+        ),
+    ),
+    Migration(6, "Add product content hashes and import checkpoints", _add_product_content_hashes),
+    Migration(7, "Add the content-addressed upload store", _add_upload_store),
+    Migration(8, "Track temporary uploads for the cache sweeper", _add_pending_uploads),
+    Migration(9, "Keep issue reports when their claim is removed", _keep_issues_of_removed_claims),
+    Migration(10, "Record the import mode of each import checkpoint", _add_checkpoint_import_mode),
+    Migration(11, "Add a progress heartbeat to background jobs", _add_job_heartbeat),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _ensure_version_table(connection):
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR(256) NOT NULL, "
+            "applied_at DATETIME NOT NULL)"
+        )
+    )
+
+
+def applied_versions(connection=None):
+    if connection is None:
+        with db.engine.begin() as connection:
+            return applied_versions(connection)
+
+    _ensure_version_table(connection)
+    return {row[0] for row in connection.execute(text(f"SELECT version FROM {VERSION_TABLE}"))}
+
+
+def current_version(connection=None):
+    return max(applied_versions(connection), default=0)
+
+
+def pending_migrations(connection=None):
+    applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def upgrade(target=None, echo=None):
+    """Apply every pending migration up to `target` (default: latest). Returns the applied versions."""
+    target = LATEST_VERSION if target is None else target
+    applied_now = []
+
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+
+        # each step runs in its own transaction together with its version row
+        with db.engine.begin() as connection:
+            if migration.version in applied_versions(connection):
+                continue
+            if echo:
+                echo(f"Applying migration {migration.version:04d}: {migration.description}")
+            migration.apply(connection)
+            connection.execute(
+                text(
+                    f"INSERT INTO {VERSION_TABLE} (version, description, applied_at) "
+                    "VALUES (:version, :description, :applied_at)"
+                ),
+                {
+                    "version": migration.version,
+                    "description": migration.description,
+                    "applied_at": datetime.now(timezone.utc).replace(tzinfo=None),
+                },
+            )
+        applied_now.append(migration.version)
+
+    return applied_now
+
+
+def ensure_schema(echo=None):
+    """Bring the database to the latest version. A single version lookup when it already is."""
+    if current_version() >= LATEST_VERSION:
+        return []
+    return upgrade(echo=echo)
@@ -15,6 +15,7 @@ class Product(db.Model):
     brand = db.Column(db.String(128), nullable=False)
     description = db.Column(db.String(512), nullable=False)
     image = db.Column(db.String(256), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True) # hash of the source record 'create_products.py' last applied
     
     # '__repr__' methods can be used to easily check/test table records
     def __repr__(self):
@@ -25,7 +26,7 @@ class Stage(db.Model):
     __tablename__ = "stages"
     
     stage_id = db.Column(db.Integer, primary_key=True)
-    product_barcode = db.Column(db.String(32), db.ForeignKey("products.barcode"), nullable=False)
+    product_barcode = db.Column(db.String(32), db.ForeignKey("products.barcode"), nullable=False, index=True)
     stage_type = db.Column(db.String(64), nullable=False)
     country = db.Column(db.String(128), nullable=False)
     region = db.Column(db.String(128), nullable=True)
@@ -45,7 +46,7 @@ class Breakdown(db.Model):
     __tablename__ = "breakdowns"
 
     breakdown_id = db.Column(db.Integer, primary_key=True)
-    product_barcode = db.Column(db.String(32), db.ForeignKey("products.barcode"), nullable=False)
+    product_barcode = db.Column(db.String(32), db.ForeignKey("products.barcode"), nullable=False, index=True)
     breakdown_name = db.Column(db.String(128), nullable=False)
     country = db.Column(db.String(128), nullable=False)
     percentage = db.Column(db.Float, nullable=False)
@@ -60,7 +61,7 @@ class Claim(db.Model):
     __tablename__ = "claims"
 
     claim_id = db.Column(db.Integer, primary_key=True)
-    product_barcode = db.Column(db.String(32), db.ForeignKey("products.barcode"), nullable=False)
+    product_barcode = db.Column(db.String(32), db.ForeignKey("products.barcode"), nullable=False, index=True)
     claim_type = db.Column(db.String(64), nullable=False)
     claim_text = db.Column(db.String(512), nullable=False)
     confidence_label = db.Column(db.String(64), nullable=True) # verified, partially-verified or unverified
@@ -75,7 +76,7 @@ class Evidence(db.Model):
     __tablename__ = "evidence"
     
     evidence_id = db.Column(db.Integer, primary_key=True)
-    claim_id = db.Column(db.Integer, db.ForeignKey("claims.claim_id"), nullable=False)
+    claim_id = db.Column(db.Integer, db.ForeignKey("claims.claim_id"), nullable=False, index=True)
     evidence_type = db.Column(db.String(64), nullable=False)
     issuer = db.Column(db.String(128), nullable=True)
     date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -91,7 +92,8 @@ class Issue(db.Model):
     __tablename__ = "issues"
 
     issue_id = db.Column(db.Integer, primary_key=True)
-    claim_id = db.Column(db.Integer, db.ForeignKey("claims.claim_id"), nullable=False)
+    # null once the claim is removed from its product; the report itself is kept for the admins
+    claim_id = db.Column(db.Integer, db.ForeignKey("claims.claim_id", ondelete="SET NULL"), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=True) # 'anon' (null) or user id from 'User' in 'auth.py'
     issue_type = db.Column(db.String(64), nullable=False)
     description = db.Column(db.String(512), nullable=False)
@@ -118,6 +120,11 @@ class Player(db.Model):
     
 class Mission(db.Model):
     __tablename__ = "missions"
+    # index names match the ones created by 'sstq/migrations.py' for existing databases
+    __table_args__ = (
+        db.Index("ix_missions_player_group_question", "player_id", "mission_group_id", "question_number"),
+        db.Index("ix_missions_player_completed", "player_id", "completed_at"),
+    )
 
     # Stores generated mission runs and player answer history, not a static mission bank.
     mission_id = db.Column(db.Integer, primary_key=True)
@@ -149,7 +156,7 @@ class Badge(db.Model):
     __tablename__ = "badges"
     
     badge_id = db.Column(db.Integer, primary_key=True)
-    player_id = db.Column(db.Integer, db.ForeignKey("players.player_id"), nullable=False)
+    player_id = db.Column(db.Integer, db.ForeignKey("players.player_id"), nullable=False, index=True)
     name = db.Column(db.String(128), nullable=False)
     tier = db.Column(db.String(16), nullable=False)
     
@@ -161,6 +168,9 @@ class Badge(db.Model):
     
 class ChangeLog(db.Model):
     __tablename__ = "changelogs"
+    __table_args__ = (
+        db.Index("ix_changelogs_user_timestamp", "user_id", "timestamp"),
+    )
     
     log_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
@@ -203,3 +213,78 @@ class User(db.Model, UserMixin):
     
     def __repr__(self):
         return f"User ID: {self.user_id} - Username: {self.username} - Role: {self.role}"
+
+
+# background jobs for long admin/data operations; see 'sstq/jobs.py' for the runner that processes them
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="queued") # queued, running, succeeded or failed
+    payload = db.Column(db.Text, nullable=True) # JSON encoded keyword arguments for the handler
+    progress_current = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer, nullable=True)
+    progress_message = db.Column(db.String(256), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    error = db.Column(db.String(512), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True) # heartbeat: last claim or progress report of a running job
+
+    @property
+    def progress_percent(self):
+        if not self.progress_total:
+            return 100 if self.status == "succeeded" else 0
+        return min(100, round((self.progress_current / self.progress_total) * 100))
+
+    def __repr__(self):
+        return f"Job ID: {self.job_id} - Type: {self.job_type} - Status: {self.status}"
+
+
+# how far 'create_products.py' got through each source file, so unchanged files are skipped on the next run
+class ImportCheckpoint(db.Model):
+    __tablename__ = "import_checkpoints"
+
+    source_path = db.Column(db.String(512), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    mtime_ns = db.Column(db.Integer, nullable=False)
+    offset = db.Column(db.Integer, nullable=False) # bytes imported; everything before this is in the products table
+    lines = db.Column(db.Integer, nullable=False) # lines before 'offset', so appended records keep their line numbers
+    tail_hash = db.Column(db.String(64), nullable=False) # sha256 of the bytes just before 'offset'
+    # insert-only runs skip barcodes that already exist, so their checkpoints do not cover an update run
+    update_existing = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    def __repr__(self):
+        return f"Import checkpoint: {self.source_path} - Offset: {self.offset}/{self.size}"
+
+
+# one row per uploaded file in the content-addressed store ('sstq/upload_store.py'), named by its sha256
+class StoredBlob(db.Model):
+    __tablename__ = "stored_blobs"
+
+    url = db.Column(db.String(256), primary_key=True) # same value Product.image / Evidence.file_reference hold
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0) # kept up to date by triggers, see upload_store.py
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    def __repr__(self):
+        return f"Stored blob: {self.url} - References: {self.ref_count}"
+
+
+# a file in 'static/uploads/cache' that an add/edit page is still showing, see 'sstq/upload_cache.py'
+class PendingUpload(db.Model):
+    __tablename__ = "pending_uploads"
+
+    url = db.Column(db.String(256), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    last_seen_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"Pending upload: {self.url} - Last seen: {self.last_seen_at}"
@@ -1,12 +1,20 @@
 import csv
 import io
+import json
+from datetime import datetime, timedelta
 
-from flask import Blueprint, Response, flash, redirect, render_template, request, url_for
+from flask import Blueprint, Response, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy import func
 
 from sstq.auth_decorators import roles_required
+from sstq.changelog_archive import archive_change_logs, archive_dir, archive_summary, iter_archived_logs
 from sstq.extensions import db
-from sstq.models import Badge, ChangeLog, Claim, Evidence, Issue, Mission, Player, Product, Stage, User
+from sstq.identity_cache import invalidate_identity
+from sstq.jobs import delete_in_batches, dispatch_job, enqueue_job, job_handler, job_is_active
+from sstq.models import (
+    Badge, ChangeLog, Claim, Evidence, Issue, Job, Mission, PendingUpload, Player, Product, Stage, User,
+)
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -15,14 +23,6 @@ def _player_for_user(user_id):
     return Player.query.filter_by(user_id=user_id).first()
 
 
-def _delete_player_progress(player):
-    if not player:
-        return
-    Badge.query.filter_by(player_id=player.player_id).delete(synchronize_session=False)
-    Mission.query.filter_by(player_id=player.player_id).delete(synchronize_session=False)
-    db.session.delete(player)
-
-
 def _delete_mission_group(row):
     if not row:
         return 0
@@ -40,8 +40,9 @@ def _delete_mission_group(row):
 def admin():
     issue_rows = (
         db.session.query(Issue, Claim, Product, User)
-        .join(Claim, Issue.claim_id == Claim.claim_id)
-        .join(Product, Claim.product_barcode == Product.barcode)
+        # issues on removed claims have no claim or product any more, but stay listed
+        .outerjoin(Claim, Issue.claim_id == Claim.claim_id)
+        .outerjoin(Product, Claim.product_barcode == Product.barcode)
         .outerjoin(User, Issue.user_id == User.user_id)
         .order_by(Issue.issue_id.desc())
         .limit(80)
@@ -113,6 +114,8 @@ def admin():
         status_breakdown=status_breakdown,
         user_summaries=user_summaries,
         mission_rows=mission_rows,
+        log_archive=archive_summary(),
+        log_retention_days=current_app.config.get("CHANGELOG_RETENTION_DAYS"),
     )
 
 
@@ -147,6 +150,8 @@ def create_user():
             )
         )
         db.session.commit()
+        # SQLite can hand out the id of a deleted user again
+        invalidate_identity(user.user_id)
     except Exception:
         db.session.rollback()
         flash("Failed to create user.", "error")
@@ -156,6 +161,76 @@ def create_user():
     return redirect(url_for("admin.admin"))
 
 
+def _delete_player_progress_in_batches(job, player):
+    delete_in_batches(job, Badge, Badge.badge_id, Badge.player_id == player.player_id)
+    delete_in_batches(job, Mission, Mission.mission_id, Mission.player_id == player.player_id)
+
+
+def _player_row_count(player):
+    if not player:
+        return 0
+    return (
+        Mission.query.filter_by(player_id=player.player_id).count()
+        + Badge.query.filter_by(player_id=player.player_id).count()
+    )
+
+
+# runs on the job runner: mission history is removed in batches before the user row itself
+@job_handler("delete_user")
+def _delete_user_job(job, user_id, requested_by):
+    user = db.session.get(User, user_id)
+    if not user:
+        return
+
+    player = _player_for_user(user_id)
+    job.set_total(
+        _player_row_count(player) + ChangeLog.query.filter_by(user_id=user_id).count(),
+        message=f"Deleting user '{user.username}'",
+    )
+    if player:
+        _delete_player_progress_in_batches(job, player)
+    # the user's change history goes to the archive (with their username) rather than being dropped
+    archive_change_logs(criteria=ChangeLog.user_id == user_id, progress=job.advance)
+
+    username = user.username
+    if player:
+        db.session.delete(player)
+    Issue.query.filter_by(user_id=user_id).update({"user_id": None}, synchronize_session=False)
+    Job.query.filter_by(created_by=user_id).update({"created_by": None}, synchronize_session=False)
+    PendingUpload.query.filter_by(user_id=user_id).update({"user_id": None}, synchronize_session=False)
+    db.session.delete(user)
+    db.session.flush()
+    db.session.add(
+        ChangeLog(
+            user_id=requested_by,
+            change_summary=f"Deleted user '{username}'.",
+        )
+    )
+    db.session.commit()
+    invalidate_identity(user_id)
+
+
+@job_handler("clear_user_missions")
+def _clear_user_missions_job(job, user_id, requested_by):
+    user = db.session.get(User, user_id)
+    player = _player_for_user(user_id) if user else None
+    if not player:
+        return
+
+    mission_count = Mission.query.filter_by(player_id=player.player_id).count()
+    job.set_total(_player_row_count(player), message=f"Clearing missions for '{user.username}'")
+    _delete_player_progress_in_batches(job, player)
+
+    player.points = 0
+    db.session.add(
+        ChangeLog(
+            user_id=requested_by,
+            change_summary=f"Cleared {mission_count} mission rows for user '{user.username}'.",
+        )
+    )
+    db.session.commit()
+
+
 @admin_bp.route("/admin/users/<int:user_id>/delete", methods=["POST"])
 @roles_required("admin")
 def delete_user(user_id):
@@ -168,27 +243,22 @@ def delete_user(user_id):
         flash("You cannot delete your own account from admin.", "error")
         return redirect(url_for("admin.admin"))
 
+    if job_is_active("delete_user", user_id=user.user_id):
+        flash("This user is already being deleted.", "info")
+        return redirect(url_for("admin.jobs"))
+
     try:
-        player = _player_for_user(user.user_id)
-        _delete_player_progress(player)
-        Issue.query.filter_by(user_id=user.user_id).update({"user_id": None}, synchronize_session=False)
-        ChangeLog.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
-        username = user.username
-        db.session.delete(user)
-        db.session.flush()
-        db.session.add(
-            ChangeLog(
-                user_id=current_user.user_id,
-                change_summary=f"Deleted user '{username}'.",
-            )
+        enqueue_job(
+            "delete_user",
+            {"user_id": user.user_id, "requested_by": current_user.user_id},
+            created_by=current_user.user_id,
         )
-        db.session.commit()
     except Exception:
         db.session.rollback()
         flash("Failed to delete user.", "error")
         return redirect(url_for("admin.admin"))
 
-    flash("User deleted.", "success")
+    flash("User deletion started. Progress is shown on the jobs page.", "success")
     return redirect(url_for("admin.admin"))
 
 
@@ -205,24 +275,22 @@ def clear_user_missions(user_id):
         flash("This user has no player profile yet.", "error")
         return redirect(url_for("admin.admin"))
 
+    if job_is_active("clear_user_missions", user_id=user.user_id):
+        flash("Missions for this user are already being cleared.", "info")
+        return redirect(url_for("admin.jobs"))
+
     try:
-        mission_count = Mission.query.filter_by(player_id=player.player_id).count()
-        Badge.query.filter_by(player_id=player.player_id).delete(synchronize_session=False)
-        Mission.query.filter_by(player_id=player.player_id).delete(synchronize_session=False)
-        player.points = 0
-        db.session.add(
-            ChangeLog(
-                user_id=current_user.user_id,
-                change_summary=f"Cleared {mission_count} mission rows for user '{user.username}'.",
-            )
+        enqueue_job(
+            "clear_user_missions",
+            {"user_id": user.user_id, "requested_by": current_user.user_id},
+            created_by=current_user.user_id,
         )
-        db.session.commit()
     except Exception:
         db.session.rollback()
         flash("Failed to clear user missions.", "error")
         return redirect(url_for("admin.admin"))
 
-    flash("User missions cleared.", "success")
+    flash("Clearing user missions started. Progress is shown on the jobs page.", "success")
     return redirect(url_for("admin.admin"))
 
 
@@ -319,39 +387,159 @@ def delete_issue(issue_id):
     return redirect(url_for("admin.admin"))
 
 
+@admin_bp.route("/admin/jobs", methods=["GET"])
+@roles_required("admin")
+def jobs():
+    job_rows = (
+        db.session.query(Job, User)
+        .outerjoin(User, Job.created_by == User.user_id)
+        .order_by(Job.job_id.desc())
+        .limit(100)
+        .all()
+    )
+    has_active_jobs = any(job.status in {"queued", "running"} for job, _ in job_rows)
+    return render_template("admin_jobs.html", job_rows=job_rows, has_active_jobs=has_active_jobs)
+
+
+@admin_bp.route("/admin/jobs/<int:job_id>", methods=["GET"])
+@roles_required("admin")
+def job_status(job_id):
+    job = db.session.get(Job, job_id)
+    if not job:
+        return {"success": False, "message": "Job not found"}, 404
+
+    return {
+        "success": True,
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "progress_current": job.progress_current,
+        "progress_total": job.progress_total,
+        "progress_percent": job.progress_percent,
+        "progress_message": job.progress_message,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+    }
+
+
+@admin_bp.route("/admin/jobs/<int:job_id>/retry", methods=["POST"])
+@roles_required("admin")
+def retry_job(job_id):
+    job = db.session.get(Job, job_id)
+    if not job or job.status not in ("failed", "queued"):
+        flash("Only failed or queued jobs can be retried.", "error")
+        return redirect(url_for("admin.jobs"))
+
+    try:
+        if job.status == "queued":
+            # left queued by a failed inline attempt: run the same job again instead of adding another
+            dispatch_job(job.job_id)
+        else:
+            enqueue_job(job.job_type, json.loads(job.payload or "{}"), created_by=current_user.user_id)
+    except Exception:
+        db.session.rollback()
+        flash("Failed to retry job.", "error")
+        return redirect(url_for("admin.jobs"))
+
+    flash(f"Job #{job_id} queued again.", "success")
+    return redirect(url_for("admin.jobs"))
+
+
+@admin_bp.route("/admin/logs/archive", methods=["POST"])
+@roles_required("admin")
+def archive_logs():
+    try:
+        moved = archive_change_logs()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Failed to archive change logs")
+        flash("Failed to archive logs.", "error")
+        return redirect(url_for("admin.admin"))
+
+    flash(f"Archived {moved} change log row(s).", "success")
+    return redirect(url_for("admin.admin"))
+
+
+# clearing the log moves every row into the archive instead of dropping it, so audit history is kept
 @admin_bp.route("/admin/logs/clear", methods=["POST"])
 @roles_required("admin")
 def clear_logs():
     try:
-        ChangeLog.query.delete(synchronize_session=False)
-        db.session.commit()
+        # every row present now, whatever its timestamp; nothing is deleted that was not archived first
+        last_log_id = db.session.query(func.max(ChangeLog.log_id)).scalar()
+        if last_log_id is not None:
+            archive_change_logs(criteria=ChangeLog.log_id <= last_log_id)
     except Exception:
         db.session.rollback()
         flash("Failed to clear logs.", "error")
         return redirect(url_for("admin.admin"))
 
-    flash("Change log cleared.", "success")
+    flash("Change log cleared. Previous entries were moved to the archive.", "success")
     return redirect(url_for("admin.admin"))
 
 
+def _parse_export_date(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _csv_line(values):
+    output = io.StringIO()
+    csv.writer(output).writerow(values)
+    return output.getvalue()
+
+
+# exports the hot table and, unless '?source=hot', the archived segments; '?since=' and '?until=' take YYYY-MM-DD dates
 @admin_bp.route("/admin/logs/download", methods=["GET"])
 @roles_required("admin")
 def download_logs():
-    rows = (
+    source = (request.args.get("source") or "all").strip().lower()
+    since = _parse_export_date(request.args.get("since"))
+    until = _parse_export_date(request.args.get("until"))
+    if until:
+        until = until + timedelta(days=1)
+
+    query = (
         db.session.query(ChangeLog, User)
         .join(User, ChangeLog.user_id == User.user_id)
         .order_by(ChangeLog.timestamp.desc())
-        .all()
+    )
+    if since:
+        query = query.filter(ChangeLog.timestamp >= since)
+    if until:
+        query = query.filter(ChangeLog.timestamp < until)
+    rows = query.all() if source != "archive" else []
+    include_archive = source in {"all", "archive"}
+    archived = (
+        iter_archived_logs(since=since, until=until, newest_first=True, directory=archive_dir())
+        if include_archive
+        else iter(())
     )
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["log_id", "timestamp", "username", "role", "change_summary"])
-    for log, user in rows:
-        writer.writerow([log.log_id, log.timestamp, user.username, user.role, log.change_summary])
+    def generate():
+        yield _csv_line(["log_id", "timestamp", "username", "role", "change_summary", "source"])
+        for log, user in rows:
+            yield _csv_line([log.log_id, log.timestamp, user.username, user.role, log.change_summary, "table"])
+        for record in archived:
+            yield _csv_line(
+                [
+                    record.get("log_id"),
+                    record.get("timestamp"),
+                    record.get("username") or "",
+                    record.get("role") or "",
+                    record.get("change_summary"),
+                    "archive",
+                ]
+            )
 
     return Response(
-        output.getvalue(),
+        generate(),
         mimetype="text/csv",
         headers={"Content-Disposition": "attachment; filename=change_log_export.csv"},
     )
@@ -4,12 +4,23 @@ from flask_login import login_user, logout_user
 from sstq.extensions import login_manager, db
 from sstq.models import User
 from sstq.auth_decorators import login_required
+from sstq.identity_cache import CachedIdentity, get_identity_cache
 
 auth_bp = Blueprint("auth", __name__)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    # most requests are served from the identity cache; the users table is only read on a miss
+    user_id = int(user_id)
+    cache = get_identity_cache()
+    identity = cache.get(user_id)
+    if identity is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = CachedIdentity.from_user(user)
+        cache.put(identity)
+    return identity
 
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -1,11 +1,18 @@
-from flask import Blueprint, jsonify, url_for, current_app, request
+import os
+
+from flask import Blueprint, jsonify, url_for, request
+from flask_login import current_user
 from werkzeug.utils import secure_filename
-from pathlib import Path
 from uuid import uuid4
 
 from sstq.extensions import db
 from sstq.auth_decorators import roles_required
+from sstq.image_variants import generate_variants_for_upload
+from sstq.metrics import UPLOAD_BYTES, UPLOADS
 from sstq.models import Product
+from sstq.upload_cache import track_pending_upload
+from sstq.upload_store import resolve_upload_path, store_file
+from sstq.upload_streams import claim_upload, streamed_upload
 
 helper_bp = Blueprint("helper", __name__)
 
@@ -31,40 +38,45 @@ def _validate_pdf_file(uploaded_file):
     return None
 
 
-def _normalized_extension(image_file):
-    extension = image_file.mimetype.split("/")[-1].lower()
-    if extension == "jpeg":
-        extension = "jpg"
-    if extension not in {"jpg", "png", "webp"}:
-        extension = "jpg"
-    return extension
+def _count_upload(size, kind):
+    UPLOADS.inc(kind)
+    UPLOAD_BYTES.inc(kind, amount=size)
 
 
 def _save_image_file(image_file, *, barcode, subdir):
-    extension = _normalized_extension(image_file)
-    safe_barcode = secure_filename(barcode) if barcode else "product"
+    # the file was streamed into 'upload_dir' while the request was parsed, see 'sstq/upload_streams.py'
+    part_path, size, extension, digest = claim_upload(image_file)
+    _count_upload(size, "image")
+    # cache uploads are only previewed on the edit page; they enter the store when they are promoted
+    if subdir == "cache":
+        return _name_upload(part_path, barcode=barcode, subdir=subdir, extension=extension, fallback="product")
+
+    # the same photo uploaded again reuses the stored copy
+    image_url, created = store_file(part_path, folder=subdir, extension=extension, hashed=(digest, size))
+    db.session.commit()
+    file_path = resolve_upload_path(image_url)
+    if created:
+        generate_variants_for_upload(file_path)
+    return file_path, image_url
+
+
+def _save_uploaded_file(uploaded_file, *, barcode, subdir):
+    part_path, size, extension, _ = claim_upload(uploaded_file)
+    _count_upload(size, extension)
+    return _name_upload(part_path, barcode=barcode, subdir=subdir, extension=extension, fallback="file")
+
+
+def _name_upload(part_path, *, barcode, subdir, extension, fallback):
+    safe_barcode = secure_filename(barcode) if barcode else fallback
     filename = f"{safe_barcode}-{uuid4().hex[:12]}.{extension}"
-
-    upload_dir = Path(current_app.static_folder) / "uploads" / subdir
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    file_path = upload_dir / filename
-    image_file.save(file_path)
-    return file_path, url_for("static", filename=f"uploads/{subdir}/{filename}")
-
-
-def _save_uploaded_file(uploaded_file, *, barcode, subdir, extension):
-    safe_barcode = secure_filename(barcode) if barcode else "file"
-    filename = f"{safe_barcode}-{uuid4().hex[:12]}.{extension}"
-
-    upload_dir = Path(current_app.static_folder) / "uploads" / subdir
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    file_path = upload_dir / filename
-    uploaded_file.save(file_path)
+    file_path = part_path.with_name(filename)
+    os.replace(part_path, file_path)
     return file_path, url_for("static", filename=f"uploads/{subdir}/{filename}")
 
 
 @helper_bp.route("/upload_product_image", methods=["POST"])
 @roles_required("verifier", "admin")
+@streamed_upload("image", "products")
 def upload_product_image():
     image_file = request.files.get("image")
     barcode = (request.form.get("barcode") or "").strip()
@@ -79,6 +91,7 @@ def upload_product_image():
 
 @helper_bp.route("/upload_product_image_temp", methods=["POST"])
 @roles_required("verifier", "admin")
+@streamed_upload("image", "cache")
 def upload_product_image_temp():
     image_file = request.files.get("image")
     barcode = (request.form.get("barcode") or "").strip()
@@ -88,11 +101,14 @@ def upload_product_image_temp():
         return jsonify({"success": False, "message": error}), 400
 
     _, image_url = _save_image_file(image_file, barcode=barcode, subdir="cache")
+    track_pending_upload(image_url, current_user.user_id)
+    db.session.commit()
     return jsonify({"success": True, "image_url": image_url})
 
 
 @helper_bp.route("/upload_evidence_file_temp", methods=["POST"])
 @roles_required("verifier", "admin")
+@streamed_upload("pdf", "cache/evidence")
 def upload_evidence_file_temp():
     uploaded_file = request.files.get("file")
     barcode = (request.form.get("barcode") or "").strip()
@@ -101,12 +117,9 @@ def upload_evidence_file_temp():
     if error:
         return jsonify({"success": False, "message": error}), 400
 
-    _, file_url = _save_uploaded_file(
-        uploaded_file,
-        barcode=barcode,
-        subdir="cache/evidence",
-        extension="pdf",
-    )
+    _, file_url = _save_uploaded_file(uploaded_file, barcode=barcode, subdir="cache/evidence")
+    track_pending_upload(file_url, current_user.user_id)
+    db.session.commit()
     return jsonify({"success": True, "file_url": file_url})
 
 @helper_bp.route("/validate_barcode", methods=["POST"])
@@ -0,0 +1,22 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+
+from sstq.metrics import CONTENT_TYPE, render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    # scrapers authenticate with 'Authorization: Bearer <METRICS_TOKEN>'; without a token the endpoint is
+    # only served by debug and test apps, so a production deployment does not publish its metrics by accident
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token:
+        if not (current_app.debug or current_app.testing):
+            abort(403, description="Set METRICS_TOKEN to enable /metrics.")
+    else:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            abort(401)
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
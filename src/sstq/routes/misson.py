@@ -5,6 +5,7 @@ from flask import Blueprint, abort, flash, redirect, render_template, request, u
 
 from sstq.auth_decorators import login_required
 from sstq.extensions import db
+from sstq.metrics import MISSIONS_SUBMITTED
 from sstq.models import Badge, Mission, Product
 from sstq.routes.tracequest import (
     DIFFICULTY_CONFIG,
@@ -122,6 +123,7 @@ def misson_detail(misson_id):
         player.points += gained_points
         unlocked_badges = _award_badges(player, _mission_stats(player))
         db.session.commit()
+        MISSIONS_SUBMITTED.inc(_normalize(first_row.tier))
 
         if unlocked_badges:
             flash(f"New badge unlocked: {', '.join(unlocked_badges)}", "success")
@@ -1,16 +1,19 @@
 from datetime import datetime
 from pathlib import Path
-from uuid import uuid4
 from urllib.parse import urlparse
 
 from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
-from sqlalchemy import or_
-from werkzeug.utils import secure_filename
+from sqlalchemy import or_, text
 
 from sstq.auth_decorators import roles_required
 from sstq.extensions import db
+from sstq.image_variants import generate_variants_for_upload
+from sstq.jobs import enqueue_job, job_handler
+from sstq.metrics import ISSUES_REPORTED
 from sstq.models import Breakdown, ChangeLog, Claim, Evidence, Issue, Product, Stage
+from sstq.upload_cache import forget_pending_uploads, touch_pending_uploads
+from sstq.upload_store import release, resolve_upload_path, store_file
 
 product_bp = Blueprint("product", __name__)
 
@@ -191,6 +194,9 @@ def _build_edit_payload(product):
         for claim in claims
     ]
 
+    # posted back next to 'claim_rows' so edited claims keep their id (and their issue reports)
+    claim_ids = [str(claim.claim_id) for claim in claims]
+
     claim_index_map = {claim.claim_id: index for index, claim in enumerate(claims, start=1)}
     evidence_rows = []
     for claim in claims:
@@ -210,10 +216,11 @@ def _build_edit_payload(product):
         "stage_rows": _serialize_rows(stage_rows),
         "breakdown_rows": _serialize_rows(breakdown_rows),
         "claim_rows": _serialize_rows(claim_rows),
+        "claim_ids": ",".join(claim_ids),
         "evidence_rows": _serialize_rows(evidence_rows),
         "stage_items": stage_rows,
         "breakdown_items": breakdown_rows,
-        "claim_items": claim_rows,
+        "claim_items": [[*row, claim_id] for row, claim_id in zip(claim_rows, claim_ids)],
         "evidence_items": evidence_rows,
     }
 
@@ -259,11 +266,8 @@ def _resolve_product_image_path(image_value):
 
 
 def _delete_product_image_file(image_value):
-    image_path = _resolve_product_image_path(image_value)
-    if not image_path:
-        return
-
-    image_path.unlink(missing_ok=True)
+    # only goes once no product or evidence row uses the file, see 'sstq/upload_store.py'
+    release(image_value)
 
 
 def _is_temp_image(image_value):
@@ -271,20 +275,18 @@ def _is_temp_image(image_value):
     return "/static/uploads/cache/" in image_path or image_path.startswith("/static/uploads/cache/")
 
 
-def _promote_temp_image(image_value, barcode):
+def _promote_temp_image(image_value, promoted):
     image_path = _resolve_product_image_path(image_value)
     if not image_path or not image_path.exists():
         return image_value
 
-    uploads_dir = Path(current_app.static_folder) / "uploads" / "products"
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-
-    extension = image_path.suffix.lower() or ".jpg"
-    safe_barcode = secure_filename(barcode) if barcode else "product"
-    target_name = f"{safe_barcode}-{uuid4().hex[:12]}{extension}"
-    target_path = uploads_dir / target_name
-    image_path.replace(target_path)
-    return url_for("static", filename=f"uploads/products/{target_name}")
+    extension = image_path.suffix.lower().lstrip(".") or "jpg"
+    forget_pending_uploads([image_value])
+    image_url, created = store_file(image_path, folder="products", extension=extension)
+    if created:
+        promoted.append(image_url)
+        generate_variants_for_upload(resolve_upload_path(image_url))
+    return image_url
 
 
 def _is_temp_evidence(file_reference):
@@ -300,29 +302,64 @@ def _resolve_evidence_file_path(file_reference):
 
 
 def _delete_evidence_file(file_reference):
-    evidence_path = _resolve_evidence_file_path(file_reference)
-    if not evidence_path:
-        return
-    evidence_path.unlink(missing_ok=True)
+    if _resolve_evidence_file_path(file_reference):
+        release(file_reference)
 
 
-def _promote_temp_evidence(file_reference, barcode, claim_index, evidence_index):
+def _promote_temp_evidence(file_reference, promoted):
     evidence_path = _resolve_evidence_file_path(file_reference)
     if not evidence_path or not evidence_path.exists():
         return file_reference
 
-    uploads_dir = Path(current_app.static_folder) / "uploads" / "evidence"
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-
-    safe_barcode = secure_filename(barcode) if barcode else "product"
-    target_name = f"{safe_barcode}-claim-{claim_index}-evidence-{evidence_index}.pdf"
-    target_path = uploads_dir / target_name
-    target_path.unlink(missing_ok=True)
-    evidence_path.replace(target_path)
-    return url_for("static", filename=f"uploads/evidence/{target_name}")
+    forget_pending_uploads([file_reference])
+    file_url, created = store_file(evidence_path, folder="evidence", extension="pdf")
+    if created:
+        promoted.append(file_url)
+    return file_url
+
+
+def _release_promoted(urls):
+    # after a rollback the files moved into the store have neither a row nor a reference
+    for url in urls:
+        try:
+            release(url)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Failed to remove promoted upload %s", url)
+
+
+def _parse_claim_ids(raw_value, row_count):
+    """Claim id sent back for each claim row ('claim_ids', comma separated, blank for new rows).
+
+    Ids that do not line up with the rows (an older page, a hand-made request) are ignored.
+    """
+    values = [value.strip() for value in (raw_value or "").split(",")] if raw_value else []
+    if len(values) != row_count:
+        return [None] * row_count
+    return [int(value) if value.isdigit() else None for value in values]
+
+
+def _match_claims(old_claims, parsed_claims, claim_ids):
+    """Pair every submitted claim row with the existing claim it edits (None for a new claim).
+
+    A row keeps a claim when it sends that claim's id back, or when its type and text are unchanged.
+    Every other existing claim is removed, so issue reports never end up on a different claim's text.
+    Returns (claim per row, claims the edit removed).
+    """
+    remaining = {claim.claim_id: claim for claim in old_claims}
+    matched = [remaining.pop(claim_id, None) if claim_id is not None else None for claim_id in claim_ids]
+    for index, claim_data in enumerate(parsed_claims):
+        if matched[index] is not None:
+            continue
+        key = (claim_data["claim_type"], claim_data["claim_text"])
+        same = next((claim for claim in remaining.values() if (claim.claim_type, claim.claim_text) == key), None)
+        if same is not None:
+            matched[index] = remaining.pop(same.claim_id)
+    return matched, list(remaining.values())
 
 
 def _delete_product_related_records(product):
+    evidence_files = []
     claim_ids = [claim.claim_id for claim in Claim.query.filter_by(product_barcode=product.barcode).all()]
     if claim_ids:
         evidence_files = [
@@ -330,14 +367,47 @@ def _delete_product_related_records(product):
             for evidence in Evidence.query.filter(Evidence.claim_id.in_(claim_ids)).all()
             if evidence.file_reference
         ]
-        for file_reference in evidence_files:
-            _delete_evidence_file(file_reference)
         Evidence.query.filter(Evidence.claim_id.in_(claim_ids)).delete(synchronize_session=False)
         Issue.query.filter(Issue.claim_id.in_(claim_ids)).delete(synchronize_session=False)
 
     Claim.query.filter_by(product_barcode=product.barcode).delete(synchronize_session=False)
     Stage.query.filter_by(product_barcode=product.barcode).delete(synchronize_session=False)
     Breakdown.query.filter_by(product_barcode=product.barcode).delete(synchronize_session=False)
+    return evidence_files
+
+
+# removing many upload files can take a while, so it runs on the job runner after the DB commit
+@job_handler("delete_upload_files")
+def _delete_upload_files_job(job, barcode, images=(), evidence=()):
+    files = [(_delete_product_image_file, value) for value in images]
+    files.extend((_delete_evidence_file, value) for value in evidence)
+    job.set_total(len(files), message=f"Removing upload files for product {barcode}")
+
+    failed = 0
+    for start in range(0, len(files), job.batch_size):
+        batch = files[start:start + job.batch_size]
+        for delete_file, value in batch:
+            try:
+                delete_file(value)
+            except OSError:
+                current_app.logger.exception("Failed to delete upload file %s", value)
+                failed += 1
+        job.advance(len(batch))
+
+    if failed:
+        raise OSError(f"{failed} upload file(s) for product {barcode} could not be removed.")
+
+
+def _queue_file_cleanup(barcode, images=(), evidence=()):
+    images = [value for value in images if value]
+    evidence = [value for value in evidence if value]
+    if not images and not evidence:
+        return
+    enqueue_job(
+        "delete_upload_files",
+        {"barcode": barcode, "images": images, "evidence": evidence},
+        created_by=current_user.user_id if current_user.is_authenticated else None,
+    )
 
 
 # product list page that shows all products in the DB
@@ -466,6 +536,7 @@ def report_issue(claim_id):
         flash("Failed to submit issue report.", "error")
         return redirect(url_for("product.product_evidence", barcode=claim.product_barcode))
 
+    ISSUES_REPORTED.inc()
     flash("Issue report submitted.", "success")
     return redirect(url_for("product.product_evidence", barcode=claim.product_barcode))
 
@@ -479,7 +550,12 @@ def product_edit(barcode):
         return redirect(url_for("product.product"))
 
     edit_payload = _build_edit_payload(product)
-    image_value = (request.args.get("temp_image") or "").strip() or product.image
+    temp_image = (request.args.get("temp_image") or "").strip()
+    image_value = temp_image or product.image
+    if temp_image:
+        # the scan page hands its cache upload over to this page; it stays until the edit is saved
+        touch_pending_uploads([temp_image])
+        db.session.commit()
 
     return render_template(
         "product_edit.html",
@@ -492,6 +568,7 @@ def product_edit(barcode):
         stage_rows=edit_payload["stage_rows"],
         breakdown_rows=edit_payload["breakdown_rows"],
         claim_rows=edit_payload["claim_rows"],
+        claim_ids=edit_payload["claim_ids"],
         evidence_rows=edit_payload["evidence_rows"],
         stage_items=edit_payload["stage_items"],
         breakdown_items=edit_payload["breakdown_items"],
@@ -617,8 +694,9 @@ def product_update(barcode):
         flash(str(exc), "error")
         return redirect(url_for("product.product_edit", barcode=barcode))
 
+    promoted = []
     try:
-        old_claims = Claim.query.filter_by(product_barcode=barcode).all()
+        old_claims = Claim.query.filter_by(product_barcode=barcode).order_by(Claim.claim_id).all()
         old_evidence_files = [
             evidence.file_reference
             for claim in old_claims
@@ -629,17 +707,29 @@ def product_update(barcode):
         if old_claim_ids:
             Evidence.query.filter(Evidence.claim_id.in_(old_claim_ids)).delete(synchronize_session=False)
 
-        Claim.query.filter_by(product_barcode=barcode).delete(synchronize_session=False)
+        # claims are edited in place, so issue reports stay on the claim they were made about
+        claim_ids = _parse_claim_ids(request.form.get("claim_ids"), len(parsed_claims))
+        kept_claims, removed_claims = _match_claims(old_claims, parsed_claims, claim_ids)
+        removed_claim_ids = [claim.claim_id for claim in removed_claims]
+        if removed_claim_ids:
+            # what 'ON DELETE SET NULL' does, also for connections without foreign key enforcement
+            Issue.query.filter(Issue.claim_id.in_(removed_claim_ids)).update(
+                {"claim_id": None}, synchronize_session=False
+            )
+            Claim.query.filter(Claim.claim_id.in_(removed_claim_ids)).delete(synchronize_session=False)
+            # SQLite may hand a removed claim's id to a new claim in the same flush
+            for claim in removed_claims:
+                db.session.expunge(claim)
+        if new_barcode != barcode:
+            # kept claims move to the new barcode in the same flush as the product; check the keys at commit
+            db.session.execute(text("PRAGMA defer_foreign_keys = ON"))
+
         Stage.query.filter_by(product_barcode=barcode).delete(synchronize_session=False)
         Breakdown.query.filter_by(product_barcode=barcode).delete(synchronize_session=False)
 
-        finalized_image = image
-        if _is_temp_image(image):
-            finalized_image = _promote_temp_image(image, new_barcode)
-            if product.image and product.image != finalized_image:
-                _delete_product_image_file(product.image)
-        elif product.image and image != product.image:
-            _delete_product_image_file(product.image)
+        finalized_image = _promote_temp_image(image, promoted) if _is_temp_image(image) else image
+        # the old file is released after the commit, once the product no longer counts as a reference
+        old_image = product.image if product.image != finalized_image else None
 
         product.barcode = new_barcode
         product.name = name
@@ -653,28 +743,25 @@ def product_update(barcode):
         for breakdown in parsed_breakdowns:
             db.session.add(breakdown)
 
-        created_claims = []
-        for claim_data in parsed_claims:
-            claim = Claim(product_barcode=new_barcode, **claim_data)
-            db.session.add(claim)
-            created_claims.append(claim)
+        saved_claims = []
+        for claim, claim_data in zip(kept_claims, parsed_claims):
+            if claim is None:
+                claim = Claim(product_barcode=new_barcode, **claim_data)
+                db.session.add(claim)
+            else:
+                claim.product_barcode = new_barcode
+                for field, value in claim_data.items():
+                    setattr(claim, field, value)
+            saved_claims.append(claim)
 
         db.session.flush()
 
-        evidence_counts = {}
         finalized_evidence_files = []
         for evidence_data in parsed_evidence:
-            claim_ref = created_claims[evidence_data["claim_index"] - 1]
-            claim_index = evidence_data["claim_index"]
-            evidence_counts[claim_index] = evidence_counts.get(claim_index, 0) + 1
+            claim_ref = saved_claims[evidence_data["claim_index"] - 1]
             finalized_file_reference = evidence_data["file_reference"]
             if _is_temp_evidence(finalized_file_reference):
-                finalized_file_reference = _promote_temp_evidence(
-                    finalized_file_reference,
-                    new_barcode,
-                    claim_index,
-                    evidence_counts[claim_index],
-                )
+                finalized_file_reference = _promote_temp_evidence(finalized_file_reference, promoted)
             if finalized_file_reference:
                 finalized_evidence_files.append(finalized_file_reference)
             db.session.add(
@@ -692,14 +779,22 @@ def product_update(barcode):
             f"Updated product '{name}' ({new_barcode}) with timeline/breakdown/claim/evidence changes."
         )
         db.session.commit()
-        for file_reference in old_evidence_files:
-            if file_reference not in finalized_evidence_files:
-                _delete_evidence_file(file_reference)
     except Exception:
         db.session.rollback()
+        _release_promoted(promoted)
         flash("Failed to update product.", "error")
         return redirect(url_for("product.product_edit", barcode=barcode))
 
+    try:
+        _queue_file_cleanup(
+            new_barcode,
+            images=[old_image],
+            evidence=[ref for ref in old_evidence_files if ref not in finalized_evidence_files],
+        )
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Failed to queue file cleanup for product %s", new_barcode)
+
     flash("Product updated successfully.", "success")
     return redirect(url_for("product.product_detail", barcode=new_barcode))
 
@@ -710,10 +805,14 @@ def product_update(barcode):
 def product_add():
     if request.method == "GET":
         payload = _empty_editor_payload()
+        temp_image = (request.args.get("temp_image") or "").strip()
+        if temp_image:
+            touch_pending_uploads([temp_image])
+            db.session.commit()
         return render_template(
             "product_add.html",
             initial_barcode=(request.args.get("barcode") or "").strip(),
-            image=(request.args.get("temp_image") or "").strip(),
+            image=temp_image,
             stage_rows=payload["stage_rows"],
             breakdown_rows=payload["breakdown_rows"],
             claim_rows=payload["claim_rows"],
@@ -832,8 +931,9 @@ def product_add():
         flash(str(exc), "error")
         return redirect(url_for("product.product_add", barcode=barcode))
 
+    promoted = []
     try:
-        finalized_image = _promote_temp_image(image, barcode) if _is_temp_image(image) else image or None
+        finalized_image = _promote_temp_image(image, promoted) if _is_temp_image(image) else image or None
 
         product = Product(
             barcode=barcode,
@@ -858,19 +958,11 @@ def product_add():
 
         db.session.flush()
 
-        evidence_counts = {}
         for evidence_data in parsed_evidence:
             claim_ref = created_claims[evidence_data["claim_index"] - 1]
-            claim_index = evidence_data["claim_index"]
-            evidence_counts[claim_index] = evidence_counts.get(claim_index, 0) + 1
             finalized_file_reference = evidence_data["file_reference"]
             if _is_temp_evidence(finalized_file_reference):
-                finalized_file_reference = _promote_temp_evidence(
-                    finalized_file_reference,
-                    barcode,
-                    claim_index,
-                    evidence_counts[claim_index],
-                )
+                finalized_file_reference = _promote_temp_evidence(finalized_file_reference, promoted)
 
             db.session.add(
                 Evidence(
@@ -887,6 +979,7 @@ def product_add():
         db.session.commit()
     except Exception:
         db.session.rollback()
+        _release_promoted(promoted)
         flash("Failed to create product.", "error")
         return redirect(url_for("product.product_add", barcode=barcode))
 
@@ -906,7 +999,7 @@ def delete_product(barcode):
     image_value = product.image
     try:
         product_name = product.name
-        _delete_product_related_records(product)
+        evidence_files = _delete_product_related_records(product)
         db.session.delete(product)
         _log_change(f"Deleted product '{product_name}' ({barcode}).")
         db.session.commit()
@@ -916,10 +1009,11 @@ def delete_product(barcode):
         return redirect(url_for("product.product_edit", barcode=barcode))
 
     try:
-        _delete_product_image_file(image_value)
-    except OSError:
-        current_app.logger.exception("Failed to delete image file for product %s", barcode)
-        flash("Product deleted, but its image file could not be removed.", "warning")
+        _queue_file_cleanup(barcode, images=[image_value], evidence=evidence_files)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Failed to queue file cleanup for product %s", barcode)
+        flash("Product deleted, but its files could not be scheduled for removal.", "warning")
 
     flash("Product deleted successfully.", "success")
     return redirect(url_for("product.product"))
@@ -1,5 +1,6 @@
 from flask import Blueprint, redirect, url_for, request
 from sstq.auth_decorators import login_required
+from sstq.metrics import SCANS
 
 search_product_bp = Blueprint("search_product", __name__)
 
@@ -8,5 +9,6 @@ search_product_bp = Blueprint("search_product", __name__)
 def search_product():
     barcode = (request.values.get("barcode") or "").strip()
     if barcode:
+        SCANS.inc()
         return redirect(url_for("product.product", barcode=barcode))
     return redirect(url_for("product.product"))
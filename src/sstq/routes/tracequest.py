@@ -7,6 +7,7 @@ from flask_login import current_user
 
 from sstq.auth_decorators import login_required
 from sstq.extensions import db
+from sstq.metrics import MISSIONS_STARTED
 from sstq.models import Badge, Mission, Player, Product, User
 
 tracequest_bp = Blueprint("tracequest", __name__)
@@ -811,6 +812,7 @@ def tracequest():
                 rows.append(row)
 
             db.session.commit()
+            MISSIONS_STARTED.inc(pack["difficulty"])
             return redirect(url_for("misson.misson_detail", misson_id=rows[0].mission_id))
 
     stats = _mission_stats(player)
@@ -0,0 +1,39 @@
+"""Move old change log rows into compressed archive segments.
+
+Usage:
+  python ./src/sstq/scripts/archive_change_logs.py
+    - Archive rows older than CHANGELOG_RETENTION_DAYS (default 90).
+
+  python ./src/sstq/scripts/archive_change_logs.py --retention-days 30
+    - Archive rows older than 30 days.
+
+  python ./src/sstq/scripts/archive_change_logs.py --summary
+    - Only print the current archive size.
+"""
+
+import argparse
+
+from sstq import create_app
+from sstq.changelog_archive import archive_change_logs, archive_dir, archive_summary
+from sstq.migrations import ensure_schema
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move old change log rows into compressed archive segments.")
+    parser.add_argument("--retention-days", type=int, help="Override CHANGELOG_RETENTION_DAYS for this run.")
+    parser.add_argument("--summary", action="store_true", help="Print archive statistics without archiving.")
+    args = parser.parse_args()
+
+    app = create_app(register_blueprints=False)
+    with app.app_context():
+        ensure_schema()
+        moved = 0 if args.summary else archive_change_logs(retention_days=args.retention_days)
+        summary = archive_summary()
+        print(
+            f"Archived rows this run={moved}, segments={summary['segments']}, "
+            f"archived_total={summary['rows']}, bytes={summary['bytes']}, dir={archive_dir()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
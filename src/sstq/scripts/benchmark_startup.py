@@ -0,0 +1,114 @@
+"""Measure cold-start time of the application in fresh Python processes.
+
+Usage:
+  python ./src/sstq/scripts/benchmark_startup.py
+    - Start 10 interpreters per mode and report import + create_app() time.
+
+  python ./src/sstq/scripts/benchmark_startup.py --runs 20 --mode script
+    - Only measure the script mode (no blueprints), 20 times.
+
+  python ./src/sstq/scripts/benchmark_startup.py --max-ms 800
+    - Exit with status 1 if the median web start-up is slower than 800 ms.
+
+A throwaway SQLite database in a temporary folder is used unless DATABASE_URL is set.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[2]
+
+# each snippet runs in a new interpreter and prints the milliseconds spent inside it
+MODES = {
+    "web": "app = create_app()",
+    "script": "app = create_app(register_blueprints=False)",
+    "web+schema": (
+        "app = create_app()\n"
+        "from sstq.migrations import ensure_schema\n"
+        "with app.app_context():\n"
+        "    ensure_schema()"
+    ),
+}
+
+CHILD_TEMPLATE = """
+import time
+start = time.perf_counter()
+from sstq import create_app
+{body}
+print(round((time.perf_counter() - start) * 1000, 3))
+"""
+
+
+def run_once(mode: str, env: dict[str, str]) -> tuple[float, float]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_TEMPLATE.format(body=MODES[mode])],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    return float(result.stdout.strip().splitlines()[-1]), wall_ms
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "min": round(min(samples), 1),
+        "median": round(statistics.median(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure application cold-start time.")
+    parser.add_argument("--runs", type=int, default=10, help="Processes started per mode (default: 10).")
+    parser.add_argument("--mode", choices=sorted(MODES), action="append", help="Mode to measure (repeatable).")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median 'web' start-up exceeds this.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    modes = args.mode or list(MODES)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+        env.setdefault("DATABASE_URL", f"sqlite:///{Path(temp_dir) / 'startup.db'}")
+        env.setdefault("SECRET_KEY", "startup-benchmark")
+        env["JOB_WORKERS"] = "0"
+
+        # one untimed start so the schema exists and bytecode is compiled before measuring
+        for mode in modes:
+            run_once(mode, env)
+
+        results = {}
+        for mode in modes:
+            in_process, wall = zip(*(run_once(mode, env) for _ in range(args.runs)))
+            results[mode] = {"create_app_ms": summarize(in_process), "process_ms": summarize(wall)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'mode':<12} {'import+create_app median (min-max)':<38} process median")
+        for mode, result in results.items():
+            app_ms = result["create_app_ms"]
+            print(
+                f"{mode:<12} {app_ms['median']:>8.1f} ms ({app_ms['min']:.1f}-{app_ms['max']:.1f})"
+                f"{'':<14} {result['process_ms']['median']:>8.1f} ms"
+            )
+
+    if args.max_ms is not None and "web" in results:
+        median = results["web"]["create_app_ms"]["median"]
+        if median > args.max_ms:
+            print(f"Median web start-up {median:.1f} ms exceeds --max-ms {args.max_ms:.1f}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
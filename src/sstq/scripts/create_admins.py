@@ -6,6 +6,7 @@ Usage:
 
 from sstq import create_app
 from sstq.extensions import db
+from sstq.migrations import ensure_schema
 from sstq.models import User
 
 admins = [
@@ -18,9 +19,10 @@ admins = [
 ]
 
 def main() -> None:
-    app = create_app()
+    app = create_app(register_blueprints=False)
 
     with app.app_context():
+        ensure_schema()
         for username, password in admins:
             if User.query.filter_by(username=username).first():
                 print(f"{username} already exists")
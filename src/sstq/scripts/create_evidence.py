@@ -1,29 +1,49 @@
 """Generate evidence rows and matching PDF files for existing claims.
 
+The PDFs go into the upload store (sstq/upload_store.py) as static/uploads/evidence/<sha256>.pdf.
+--replace-existing removes the replaced files unless other evidence still uses them.
+
 Usage:
   python ./src/sstq/scripts/create_evidence.py
   python ./src/sstq/scripts/create_evidence.py --limit 20 --seed 42
   python ./src/sstq/scripts/create_evidence.py --barcode 0009542005979 --replace-existing
+  python ./src/sstq/scripts/create_evidence.py --workers 4 --batch-size 1000
+
+Options:
+  --workers N
+    - Write the PDF files with N worker processes (default: CPU count, 1 = in this process).
+      The random values are still drawn here in order, so the same --seed gives the same files
+      and rows for any number of workers.
+  --batch-size N
+    - Render N evidence files per round and insert their rows with one statement (default 500).
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import os
 import random
 import sys
 import textwrap
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, time, timedelta
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, NamedTuple
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 SRC_ROOT = PROJECT_ROOT / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+
 from sstq import create_app
 from sstq.extensions import db
+from sstq.migrations import ensure_schema
 from sstq.models import Claim, Evidence, Product
+from sstq.upload_store import blob_url, register_blobs, release
 
 EVIDENCE_TYPES = [
     "Certificate",
@@ -64,6 +84,35 @@ REVIEW_OUTCOMES = [
 
 STATIC_EVIDENCE_DIR = PROJECT_ROOT / "src" / "sstq" / "static" / "uploads" / "evidence"
 STATIC_EVIDENCE_URL_PREFIX = "/static/uploads/evidence"
+DEFAULT_BATCH_SIZE = 500
+
+
+class ProductInfo(NamedTuple):
+    barcode: str
+    name: str
+    brand: str
+    category: str
+
+
+class ClaimInfo(NamedTuple):
+    claim_id: int
+    claim_type: str
+    claim_text: str
+    confidence_label: str | None
+
+
+class EvidenceJob(NamedTuple):
+    # everything a worker process needs to write one PDF; plain values so it pickles cheaply
+    output_dir: Path
+    product: ProductInfo
+    claim: ClaimInfo
+    evidence_type: str
+    issuer: str
+    summary: str
+    evidence_date: datetime
+    checks: list[str]
+    review_outcome: str
+    reviewed_at: datetime
 
 
 def _clean_text(value: str) -> str:
@@ -88,24 +137,47 @@ def _pick_products(barcode: str | None, limit: int | None) -> list[Product]:
         product = db.session.get(Product, barcode)
         return [product] if product else []
 
-    query = Product.query.order_by(Product.name.asc())
+    # claims and their evidence are needed for every product, load them up front instead of per claim
+    query = Product.query.options(selectinload(Product.claims).selectinload(Claim.evidence)).order_by(Product.name.asc())
     if limit:
         query = query.limit(limit)
     return query.all()
 
 
-def _generated_file_paths(claim: Claim) -> list[Path]:
-    files = []
-    for evidence in claim.evidence:
-        if not evidence.file_reference:
-            continue
-        file_reference = str(evidence.file_reference)
-        if not file_reference.startswith(STATIC_EVIDENCE_URL_PREFIX):
-            continue
-        relative_name = file_reference.removeprefix(STATIC_EVIDENCE_URL_PREFIX).lstrip("/")
-        file_path = STATIC_EVIDENCE_DIR / relative_name
-        files.append(file_path)
-    return files
+def _generated_file_references(claim: Claim) -> list[str]:
+    return [
+        str(evidence.file_reference)
+        for evidence in claim.evidence
+        if evidence.file_reference and str(evidence.file_reference).startswith(STATIC_EVIDENCE_URL_PREFIX)
+    ]
+
+
+# catalog, page tree, page and font are the same in every file: encode them once and only build the
+# content stream, xref table and trailer per document
+_PDF_STATIC_OBJECTS = [
+    b"<< /Type /Catalog /Pages 2 0 R >>",
+    b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+    (
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>"
+    ),
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+]
+
+
+def _pdf_prefix() -> tuple[bytes, bytes]:
+    pdf = bytearray(b"%PDF-1.4\n")
+    xref_entries = bytearray(b"0000000000 65535 f \n")
+    for index, obj in enumerate(_PDF_STATIC_OBJECTS, start=1):
+        xref_entries.extend(f"{len(pdf):010d} 00000 n \n".encode("ascii"))
+        pdf.extend(f"{index} 0 obj\n".encode("ascii"))
+        pdf.extend(obj)
+        pdf.extend(b"\nendobj\n")
+    return bytes(pdf), bytes(xref_entries)
+
+
+_PDF_PREFIX, _PDF_PREFIX_XREF = _pdf_prefix()
+_PDF_OBJECT_COUNT = len(_PDF_STATIC_OBJECTS) + 1
 
 
 def _pdf_bytes(lines: list[str]) -> bytes:
@@ -116,38 +188,26 @@ def _pdf_bytes(lines: list[str]) -> bytes:
     text_lines.append("ET")
     stream = "\n".join(text_lines).encode("ascii", "ignore")
 
-    objects = [
-        b"<< /Type /Catalog /Pages 2 0 R >>",
-        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
-        (
-            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
-            b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>"
-        ),
-        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
-        f"<< /Length {len(stream)} >>\nstream\n".encode("ascii") + stream + b"\nendstream",
-    ]
-
-    pdf = bytearray(b"%PDF-1.4\n")
-    offsets = [0]
-    for index, obj in enumerate(objects, start=1):
-        offsets.append(len(pdf))
-        pdf.extend(f"{index} 0 obj\n".encode("ascii"))
-        pdf.extend(obj)
-        pdf.extend(b"\nendobj\n")
-
-    xref_offset = len(pdf)
-    pdf.extend(f"xref\n0 {len(objects) + 1}\n".encode("ascii"))
-    pdf.extend(b"0000000000 65535 f \n")
-    for offset in offsets[1:]:
-        pdf.extend(f"{offset:010d} 00000 n \n".encode("ascii"))
-
-    pdf.extend(
-        (
-            f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
-            f"startxref\n{xref_offset}\n%%EOF\n"
-        ).encode("ascii")
+    content_offset = len(_PDF_PREFIX)
+    content = (
+        f"{_PDF_OBJECT_COUNT} 0 obj\n<< /Length {len(stream)} >>\nstream\n".encode("ascii")
+        + stream
+        + b"\nendstream\nendobj\n"
+    )
+    xref_offset = content_offset + len(content)
+    return b"".join(
+        [
+            _PDF_PREFIX,
+            content,
+            f"xref\n0 {_PDF_OBJECT_COUNT + 1}\n".encode("ascii"),
+            _PDF_PREFIX_XREF,
+            f"{content_offset:010d} 00000 n \n".encode("ascii"),
+            (
+                f"trailer\n<< /Size {_PDF_OBJECT_COUNT + 1} /Root 1 0 R >>\n"
+                f"startxref\n{xref_offset}\n%%EOF\n"
+            ).encode("ascii"),
+        ]
     )
-    return bytes(pdf)
 
 
 def _wrap_line(value: str, width: int = 74) -> list[str]:
@@ -159,15 +219,17 @@ def _wrap_line(value: str, width: int = 74) -> list[str]:
 
 def _evidence_document_lines(
     *,
-    product: Product,
-    claim: Claim,
+    product: ProductInfo,
+    claim: ClaimInfo,
     evidence_type: str,
     issuer: str,
     summary: str,
     evidence_date: datetime,
     reference_code: str,
+    checks: list[str],
+    review_outcome: str,
+    reviewed_at: datetime,
 ) -> list[str]:
-    checks = random.sample(VERIFICATION_CHECKS, k=min(3, len(VERIFICATION_CHECKS)))
     lines = [
         "TRACEABILITY SUPPORTING EVIDENCE",
         "",
@@ -210,12 +272,12 @@ def _evidence_document_lines(
             f"- Linked claim id: {claim.claim_id}",
             f"- Linked product barcode: {product.barcode}",
             f"- Document issuer: {issuer}",
-            f"- Review timestamp: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}",
+            f"- Review timestamp: {reviewed_at.strftime('%Y-%m-%d %H:%M UTC')}",
             "",
             "REVIEW OUTCOME",
         ]
     )
-    lines.extend(_wrap_line(_random_choice(REVIEW_OUTCOMES)))
+    lines.extend(_wrap_line(review_outcome))
     lines.extend(
         [
             "",
@@ -227,79 +289,127 @@ def _evidence_document_lines(
     return lines[:48]
 
 
-def _write_pdf(file_path: Path, *, product: Product, claim: Claim, evidence_type: str, issuer: str, summary: str, evidence_date: datetime) -> None:
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    reference_code = f"EV-{product.barcode}-{claim.claim_id}-{evidence_date.strftime('%Y%m%d')}"
+def _write_pdf(job: EvidenceJob) -> tuple[str, int]:
+    """Write one PDF into the upload store and return its (sha256, size); identical content is written once."""
+    reference_code = f"EV-{job.product.barcode}-{job.claim.claim_id}-{job.evidence_date.strftime('%Y%m%d')}"
     lines = _evidence_document_lines(
-        product=product,
-        claim=claim,
-        evidence_type=evidence_type,
-        issuer=issuer,
-        summary=summary,
-        evidence_date=evidence_date,
+        product=job.product,
+        claim=job.claim,
+        evidence_type=job.evidence_type,
+        issuer=job.issuer,
+        summary=job.summary,
+        evidence_date=job.evidence_date,
         reference_code=reference_code,
+        checks=job.checks,
+        review_outcome=job.review_outcome,
+        reviewed_at=job.reviewed_at,
     )
-    file_path.write_bytes(_pdf_bytes(lines))
+    data = _pdf_bytes(lines)
+    digest = hashlib.sha256(data).hexdigest()
+    file_path = job.output_dir / f"{digest}.pdf"
+    if not file_path.exists():
+        partial = file_path.with_name(f".{file_path.name}.{os.getpid()}.partial")
+        partial.write_bytes(data)
+        os.replace(partial, file_path)
+    return digest, len(data)
 
 
-def _file_reference(product: Product, claim: Claim, index: int) -> tuple[Path, str]:
-    safe_barcode = _clean_text(product.barcode).replace(" ", "_")
-    filename = f"{safe_barcode}-claim-{claim.claim_id}-evidence-{index}.pdf"
-    return STATIC_EVIDENCE_DIR / filename, f"{STATIC_EVIDENCE_URL_PREFIX}/{filename}"
+def _write_pdfs(jobs: list[EvidenceJob], executor: ProcessPoolExecutor | None, workers: int) -> list[tuple[str, int]]:
+    if executor is None:
+        return [_write_pdf(job) for job in jobs]
+    chunksize = max(1, len(jobs) // (workers * 4))
+    return list(executor.map(_write_pdf, jobs, chunksize=chunksize))
 
 
 def create_evidence(
     products: Iterable[Product],
     evidence_per_claim: int = 2,
     replace_existing: bool = False,
-) -> int:
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> tuple[int, list[str]]:
+    """Returns the number of evidence rows created and the file references of the replaced evidence.
+
+    Release the replaced files with 'upload_store.release' once the session is committed.
+    """
     created = 0
+    replaced_files: list[str] = []
     now = datetime.utcnow()
-
-    for product in products:
-        claims = list(product.claims)
-        if not claims:
-            continue
-
-        for claim in claims:
-            if replace_existing:
-                for file_path in _generated_file_paths(claim):
-                    file_path.unlink(missing_ok=True)
-                Evidence.query.filter_by(claim_id=claim.claim_id).delete(synchronize_session=False)
-                db.session.flush()
-            elif claim.evidence:
+    jobs: list[EvidenceJob] = []
+    rows: list[dict] = []
+    STATIC_EVIDENCE_DIR.mkdir(parents=True, exist_ok=True)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def flush() -> None:
+        nonlocal created
+        blobs = []
+        for row, (digest, size) in zip(rows, _write_pdfs(jobs, executor, workers)):
+            row["file_reference"] = blob_url("evidence", digest, "pdf")
+            blobs.append({"url": row["file_reference"], "sha256": digest, "size": size})
+        # store rows first, so the reference triggers count the evidence rows
+        register_blobs(blobs)
+        if rows:
+            db.session.execute(insert(Evidence.__table__), rows)
+        created += len(rows)
+        jobs.clear()
+        rows.clear()
+
+    try:
+        for product in products:
+            claims = list(product.claims)
+            if not claims:
                 continue
-
-            for index in range(1, max(1, evidence_per_claim) + 1):
-                evidence_type = _random_choice(EVIDENCE_TYPES)
-                issuer = _random_choice(ISSUERS)
-                evidence_date = now - timedelta(days=random.randint(3, 365))
-                summary = _random_choice(SUMMARY_TEMPLATES)
-                file_path, file_reference = _file_reference(product, claim, index)
-
-                _write_pdf(
-                    file_path,
-                    product=product,
-                    claim=claim,
-                    evidence_type=evidence_type,
-                    issuer=issuer,
-                    summary=summary,
-                    evidence_date=evidence_date,
-                )
-
-                db.session.add(
-                    Evidence(
-                        claim_id=claim.claim_id,
-                        evidence_type=evidence_type,
-                        issuer=issuer,
-                        date=datetime.combine(evidence_date.date(), time.min),
-                        summary=summary,
-                        file_reference=file_reference,
+            product_info = ProductInfo(product.barcode, product.name, product.brand, product.category)
+
+            for claim in claims:
+                if replace_existing:
+                    replaced_files.extend(_generated_file_references(claim))
+                    Evidence.query.filter_by(claim_id=claim.claim_id).delete(synchronize_session=False)
+                    db.session.flush()
+                elif claim.evidence:
+                    continue
+                claim_info = ClaimInfo(claim.claim_id, claim.claim_type, claim.claim_text, claim.confidence_label)
+
+                for _ in range(max(1, evidence_per_claim)):
+                    # draw in the same order as the documents use the values so a seed stays reproducible
+                    evidence_type = _random_choice(EVIDENCE_TYPES)
+                    issuer = _random_choice(ISSUERS)
+                    evidence_date = now - timedelta(days=random.randint(3, 365))
+                    summary = _random_choice(SUMMARY_TEMPLATES)
+                    checks = random.sample(VERIFICATION_CHECKS, k=min(3, len(VERIFICATION_CHECKS)))
+                    review_outcome = _random_choice(REVIEW_OUTCOMES)
+
+                    jobs.append(
+                        EvidenceJob(
+                            output_dir=STATIC_EVIDENCE_DIR,
+                            product=product_info,
+                            claim=claim_info,
+                            evidence_type=evidence_type,
+                            issuer=issuer,
+                            summary=summary,
+                            evidence_date=evidence_date,
+                            checks=checks,
+                            review_outcome=review_outcome,
+                            reviewed_at=now,
+                        )
+                    )
+                    rows.append(
+                        {
+                            "claim_id": claim.claim_id,
+                            "evidence_type": evidence_type,
+                            "issuer": issuer,
+                            "date": datetime.combine(evidence_date.date(), time.min),
+                            "summary": summary,
+                        }
                     )
-                )
-                created += 1
+                    if len(jobs) >= batch_size:
+                        flush()
+        flush()
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-    return created
+    return created, replaced_files
 
 
 def parse_args() -> argparse.Namespace:
@@ -309,6 +419,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--seed", type=int, help="Random seed for deterministic output.")
     parser.add_argument("--replace-existing", action="store_true", help="Overwrite existing evidence for selected products.")
     parser.add_argument("--evidence-per-claim", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes that write the PDF files.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Evidence files per insert batch.")
     return parser.parse_args()
 
 
@@ -317,23 +429,29 @@ def main() -> None:
     if args.seed is not None:
         random.seed(args.seed)
 
-    app = create_app()
+    app = create_app(register_blueprints=False)
     with app.app_context():
+        ensure_schema()
         products = _pick_products(args.barcode, args.limit)
         if not products:
             print("No matching products found. Nothing generated.")
             return
 
-        created = create_evidence(
+        created, replaced_files = create_evidence(
             products,
             evidence_per_claim=args.evidence_per_claim,
             replace_existing=args.replace_existing,
+            workers=max(1, args.workers),
+            batch_size=max(1, args.batch_size),
         )
         db.session.commit()
+        # replaced files that no other evidence row shares are removed from the upload store
+        removed = sum(1 for file_reference in replaced_files if release(file_reference))
         print(
             "Generated:",
             f"evidence={created}",
             f"products={len(products)}",
+            f"removed_files={removed}",
             f"output_dir={STATIC_EVIDENCE_DIR}",
         )
 
@@ -0,0 +1,104 @@
+"""Create the resized WebP variants used by the product pages' srcset for already uploaded images.
+
+Usage:
+  python ./src/sstq/scripts/create_image_variants.py
+    - Write the missing variants (IMAGE_VARIANT_WIDTHS, default 320/640/1280 px wide) for every
+      image in static/uploads/products. Needs Pillow: pip install -e ".[images]"
+
+  python ./src/sstq/scripts/create_image_variants.py --force
+    - Rewrite all variants, e.g. after changing IMAGE_VARIANT_WIDTHS or IMAGE_VARIANT_QUALITY.
+
+  python ./src/sstq/scripts/create_image_variants.py --workers 4
+    - Resize with 4 threads (Pillow releases the GIL while decoding, resizing and encoding).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from sstq import create_app
+from sstq.image_variants import VARIANT_DIR, generate_variants, variant_path, variants_available
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def iter_images(upload_dir: Path) -> list[Path]:
+    if not upload_dir.is_dir():
+        return []
+    return sorted(
+        path for path in upload_dir.iterdir() if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES
+    )
+
+
+def backfill(upload_dir: Path, widths: tuple[int, ...], quality: int, force: bool, workers: int) -> None:
+    images = iter_images(upload_dir)
+    if not images:
+        print(f"No images found in: {upload_dir}")
+        return
+
+    failed: list[tuple[Path, Exception]] = []
+
+    def process(image_path: Path) -> int:
+        try:
+            return len(generate_variants(image_path, widths, quality=quality, force=force))
+        except Exception as exc:  # a broken upload should not stop the rest of the backfill
+            failed.append((image_path, exc))
+            return 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        written = sum(executor.map(process, images))
+    elapsed = time.perf_counter() - started
+
+    original_bytes = sum(path.stat().st_size for path in images)
+    smallest = [variant_path(path, widths[0]) for path in images]
+    thumbnail_bytes = sum(path.stat().st_size for path in smallest if path.exists())
+    print(
+        f"Done. images={len(images)}, variants_written={written}, failed={len(failed)}, "
+        f"elapsed={elapsed:.1f}s, output_dir={upload_dir / VARIANT_DIR}"
+    )
+    print(
+        f"Originals: {original_bytes / (1024 * 1024):.1f} MB; "
+        f"{widths[0]}px variants: {thumbnail_bytes / (1024 * 1024):.1f} MB"
+    )
+    for image_path, exc in failed:
+        print(f"- {image_path.name}: {exc}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Create WebP variants of uploaded product images.")
+    parser.add_argument("--force", action="store_true", help="Rewrite variants that already exist.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Threads that resize images.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not variants_available():
+        raise SystemExit('Image variants need Pillow: pip install -e ".[images]"')
+
+    app = create_app(register_blueprints=False)
+    widths = app.config["IMAGE_VARIANT_WIDTHS"]
+    if not widths:
+        raise SystemExit("IMAGE_VARIANT_WIDTHS is empty. Nothing to create.")
+    backfill(
+        Path(app.static_folder) / "uploads" / "products",
+        widths=widths,
+        quality=app.config["IMAGE_VARIANT_QUALITY"],
+        force=args.force,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Usage:
 
 from sstq import create_app
 from sstq.extensions import db
+from sstq.migrations import ensure_schema
 from sstq.models import Claim, Issue
 
 TARGET_ISSUE_COUNT = 30
@@ -26,9 +27,10 @@ STATUS_CYCLE = [
 
 
 def main() -> None:
-    app = create_app()
+    app = create_app(register_blueprints=False)
 
     with app.app_context():
+        ensure_schema()
         current_count = Issue.query.count()
         if current_count >= TARGET_ISSUE_COUNT:
             print(f"Issues already seeded: {current_count}")
@@ -17,17 +17,37 @@ Usage:
     - Import multiple JSONL sources in one run.
 
   python ./src/sstq/scripts/create_products.py --file src/instance/new_products.jsonl --update-existing
-    - Update existing products with the same barcode.
+    - Update existing products with the same barcode. Products whose mapped record did not change
+      since the last import (same content hash) are not rewritten.
+
+  python ./src/sstq/scripts/create_products.py --file src/instance/off_dump.jsonl --workers 8
+    - Decode and map the file in 8 processes (byte-range shards); this process does all writes.
+
+Records are written in batches of --batch-size with INSERT ... ON CONFLICT, so the import does
+not look up every barcode on its own. Each file's size, mtime and imported byte offset are kept in
+the import_checkpoints table: files that did not change are skipped, and files that only had lines
+appended are read from where the last import stopped (--ignore-checkpoints reads everything again).
+An --update-existing run reads files in full again if they were last imported without it.
 """
 
 import argparse
+import hashlib
 import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from sstq import create_app
 from sstq.extensions import db
-from sstq.models import Product
+from sstq.migrations import ensure_schema
+from sstq.models import ImportCheckpoint, Product
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 INSTANCE_DIR_CANDIDATES = [
@@ -40,6 +60,10 @@ DEFAULT_SOURCE_FILES = [
     "Electronics_with_codes.jsonl",
     "luxury_clothing_with_codes.jsonl",
 ]
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_SHARD_BYTES = 8 * 1024 * 1024
+TAIL_HASH_BYTES = 4096
+MAPPED_COLUMNS = ["barcode", "name", "brand", "category", "description", "image"]
 
 
 def get_default_jsonl_paths() -> list[Path]:
@@ -221,6 +245,11 @@ def map_record(item: dict[str, Any], line_no: int, source_name: str) -> dict[str
     }
 
 
+def content_hash(mapped: dict[str, Any]) -> str:
+    payload = json.dumps([mapped[column] for column in MAPPED_COLUMNS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def resolve_jsonl_path(raw_path: str) -> Path:
     candidate = Path(raw_path).expanduser()
     if candidate.is_absolute():
@@ -239,51 +268,269 @@ def resolve_jsonl_path(raw_path: str) -> Path:
     return candidate
 
 
-def import_products(jsonl_paths: list[Path], update_existing: bool) -> None:
-    inserted = 0
-    updated = 0
-    skipped = 0
-    invalid = 0
+class ProductUpserter:
+    """Collects mapped records and writes them in chunks with INSERT ... ON CONFLICT.
+
+    A barcode that appears more than once keeps its first record, or its last one with
+    update_existing, which is what the old one-row-at-a-time import ended up storing.
+    With update_existing, products whose stored content hash matches the record are left alone.
+    """
+
+    def __init__(self, update_existing: bool, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.update_existing = update_existing
+        self.batch_size = batch_size
+        self.pending: dict[str, dict[str, Any]] = {}
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+
+    def add(self, mapped: dict[str, Any]) -> None:
+        barcode = mapped["barcode"]
+        if barcode in self.pending:
+            if self.update_existing:
+                # the later record wins; flush() counts each barcode once, by what it does to the table
+                self.pending[barcode] = mapped
+            else:
+                self.skipped += 1
+            return
+
+        self.pending[barcode] = mapped
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def existing_hashes(self, barcodes: list[str]) -> dict[str, str | None]:
+        existing = {}
+        # stay under SQLite's bound-parameter limit on older versions
+        for start in range(0, len(barcodes), 900):
+            chunk = barcodes[start:start + 900]
+            rows = db.session.execute(select(Product.barcode, Product.content_hash).where(Product.barcode.in_(chunk)))
+            existing.update((barcode, stored_hash) for barcode, stored_hash in rows)
+        return existing
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        records = list(self.pending.values())
+        self.pending = {}
+
+        existing = self.existing_hashes([record["barcode"] for record in records])
+        statement = sqlite_insert(Product.__table__)
+        if self.update_existing:
+            changed = [record for record in records if existing.get(record["barcode"], "") != record["content_hash"]]
+            self.unchanged += len(records) - len(changed)
+            self.updated += sum(1 for record in changed if record["barcode"] in existing)
+            self.inserted += sum(1 for record in changed if record["barcode"] not in existing)
+            records = changed
+            statement = statement.on_conflict_do_update(
+                index_elements=[Product.barcode],
+                set_={column: statement.excluded[column] for column in [*MAPPED_COLUMNS, "content_hash"] if column != "barcode"},
+            )
+        else:
+            records = [record for record in records if record["barcode"] not in existing]
+            statement = statement.on_conflict_do_nothing(index_elements=[Product.barcode])
+            self.skipped += len(existing)
+            self.inserted += len(records)
+
+        if records:
+            db.session.execute(statement, records)
+        db.session.commit()
 
-    app = create_app()
-    with app.app_context():
-        db.create_all()
 
-        for jsonl_path in jsonl_paths:
-            with jsonl_path.open("r", encoding="utf-8") as handle:
-                for line_no, line in enumerate(handle, start=1):
-                    try:
-                        item = json.loads(line)
-                    except json.JSONDecodeError:
-                        invalid += 1
-                        continue
-
-                    mapped = map_record(item, line_no, get_source_name(jsonl_path, item))
-                    if not mapped:
-                        invalid += 1
-                        continue
-
-                    existing = db.session.get(Product, mapped["barcode"])
-                    if existing:
-                        if not update_existing:
-                            skipped += 1
-                            continue
-                        existing.name = mapped["name"]
-                        existing.brand = mapped["brand"]
-                        existing.category = mapped["category"]
-                        existing.description = mapped["description"]
-                        existing.image = mapped["image"]
-                        updated += 1
-                    else:
-                        db.session.add(Product(**mapped))
-                        inserted += 1
-
-                    if (inserted + updated) % 500 == 0:
-                        db.session.commit()
+class Shard(NamedTuple):
+    path: Path
+    start: int
+    end: int
+    first_line: int
+
+
+def plan_shards(
+    jsonl_path: Path,
+    shard_bytes: int = DEFAULT_SHARD_BYTES,
+    start: int = 0,
+    first_line: int = 1,
+    size: int | None = None,
+) -> tuple[list[Shard], int]:
+    """Split a JSONL file (from byte `start` up to `size`) into byte ranges that end on line boundaries.
+
+    The newlines before every shard are counted up front, so records keep their real line
+    numbers (map_record writes them into descriptions) no matter which worker parses them.
+    Returns the shards and the number of lines before `size`.
+    """
+    size = jsonl_path.stat().st_size if size is None else size
+    shards = []
+    line_no = first_line
+    with jsonl_path.open("rb") as handle:
+        while start < size:
+            handle.seek(min(start + shard_bytes, size))
+            handle.readline()
+            end = handle.tell()
+            shards.append(Shard(jsonl_path, start, end, line_no))
+
+            handle.seek(start)
+            remaining = end - start
+            while remaining:
+                block = handle.read(min(remaining, 1024 * 1024))
+                line_no += block.count(b"\n")
+                remaining -= len(block)
+            start = end
+    return shards, line_no - 1
+
+
+def parse_shard(shard: Shard) -> tuple[list[dict[str, Any]], int]:
+    """Decode and map one shard. Runs in a worker process; returns (mapped records, invalid lines)."""
+    records = []
+    invalid = 0
+    with shard.path.open("rb") as handle:
+        handle.seek(shard.start)
+        position = shard.start
+        line_no = shard.first_line
+        while position < shard.end:
+            line = handle.readline()
+            if not line:
+                break
+            position += len(line)
+            try:
+                item = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                invalid += 1
+                line_no += 1
+                continue
+
+            mapped = map_record(item, line_no, get_source_name(shard.path, item))
+            line_no += 1
+            if not mapped:
+                invalid += 1
+                continue
+            mapped["content_hash"] = content_hash(mapped)
+            records.append(mapped)
+    return records, invalid
+
+
+def iter_parsed_shards(shards: list[Shard], workers: int) -> Iterator[tuple[list[dict[str, Any]], int]]:
+    """Parse shards in a process pool and yield the results in file order.
+
+    At most two shards per worker are in flight, so a slow writer holds back the parsers
+    instead of letting parsed records pile up in memory.
+    """
+    if workers <= 1 or len(shards) <= 1:
+        for shard in shards:
+            yield parse_shard(shard)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for shard in shards:
+            in_flight.append(pool.submit(parse_shard, shard))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def tail_hash(jsonl_path: Path, offset: int) -> str:
+    with jsonl_path.open("rb") as handle:
+        handle.seek(max(0, offset - TAIL_HASH_BYTES))
+        return hashlib.sha256(handle.read(offset - handle.tell())).hexdigest()
+
+
+def plan_file(
+    jsonl_path: Path, shard_bytes: int, use_checkpoint: bool, update_existing: bool = False
+) -> tuple[list[Shard], dict[str, Any] | None]:
+    """Shards still to import for one file, and the checkpoint to store once they are written.
+
+    An unchanged file (same size and mtime as last time) needs nothing. A file that only grew, with
+    the bytes before the old end still the same, is read from where the last run stopped. Anything
+    else is read in full, and the content hashes skip the records that did not change.
+    A checkpoint from an insert-only run is ignored by an update run: that run left existing
+    barcodes as they were, so their records in the file were never applied.
+    """
+    stat = jsonl_path.stat()
+    source_path = str(jsonl_path.resolve())
+    checkpoint = db.session.get(ImportCheckpoint, source_path) if use_checkpoint else None
+    if checkpoint is not None and update_existing and not checkpoint.update_existing:
+        checkpoint = None
+    start, first_line = 0, 1
+    if checkpoint is not None:
+        if checkpoint.size == stat.st_size and checkpoint.mtime_ns == stat.st_mtime_ns:
+            return [], None
+        if stat.st_size > checkpoint.offset and tail_hash(jsonl_path, checkpoint.offset) == checkpoint.tail_hash:
+            start, first_line = checkpoint.offset, checkpoint.lines + 1
+
+    shards, lines = plan_shards(jsonl_path, shard_bytes, start=start, first_line=first_line, size=stat.st_size)
+    return shards, {
+        "source_path": source_path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "offset": stat.st_size,
+        "lines": lines,
+        "tail_hash": tail_hash(jsonl_path, stat.st_size),
+        # update runs only resume from update checkpoints, so this covers everything before 'offset'
+        "update_existing": update_existing,
+    }
 
-        db.session.commit()
 
-    print(f"Done. inserted={inserted}, updated={updated}, skipped={skipped}, invalid={invalid}")
+def save_checkpoint(values: dict[str, Any]) -> None:
+    checkpoint = db.session.get(ImportCheckpoint, values["source_path"]) or ImportCheckpoint(
+        source_path=values["source_path"]
+    )
+    for name, value in values.items():
+        setattr(checkpoint, name, value)
+    checkpoint.updated_at = datetime.now(timezone.utc)
+    db.session.add(checkpoint)
+    db.session.commit()
+
+
+def import_products(
+    jsonl_paths: list[Path],
+    update_existing: bool,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int | None = None,
+    shard_bytes: int = DEFAULT_SHARD_BYTES,
+    use_checkpoints: bool = True,
+) -> None:
+    invalid = 0
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+
+    app = create_app(register_blueprints=False)
+    with app.app_context():
+        ensure_schema()
+        # this process is the only writer; the workers only parse
+        upserter = ProductUpserter(update_existing, batch_size)
+
+        shards = []
+        # a checkpoint is written once the last shard of its file has been upserted
+        checkpoints_after: dict[int, dict[str, Any]] = {}
+        unchanged_files = 0
+        for jsonl_path in jsonl_paths:
+            file_shards, checkpoint = plan_file(jsonl_path, shard_bytes, use_checkpoints, update_existing)
+            if checkpoint is None:
+                unchanged_files += 1
+                continue
+            shards += file_shards
+            if file_shards:
+                checkpoints_after[len(shards) - 1] = checkpoint
+            else:
+                save_checkpoint(checkpoint)
+
+        for index, (records, shard_invalid) in enumerate(iter_parsed_shards(shards, workers)):
+            invalid += shard_invalid
+            for mapped in records:
+                upserter.add(mapped)
+            if index in checkpoints_after:
+                upserter.flush()
+                save_checkpoint(checkpoints_after[index])
+
+        upserter.flush()
+
+    elapsed = time.perf_counter() - started
+    processed = upserter.inserted + upserter.updated + upserter.unchanged + upserter.skipped
+    print(
+        f"Done. inserted={upserter.inserted}, updated={upserter.updated}, unchanged={upserter.unchanged}, "
+        f"skipped={upserter.skipped}, invalid={invalid}, unchanged_files={unchanged_files} "
+        f"in {elapsed:.2f}s ({processed / elapsed:,.0f} records/s, {workers} parse workers)"
+    )
 
 def main() -> None:
     default_files = get_default_jsonl_paths()
@@ -304,6 +551,29 @@ def main() -> None:
         action="store_true",
         help="Update existing products with same barcode.",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Products written per INSERT ... ON CONFLICT batch (default: {DEFAULT_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--ignore-checkpoints",
+        action="store_true",
+        help="Read every file in full even if it has not changed since the last import.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes that decode and map JSONL shards (default: CPU count, 1 parses in this process).",
+    )
+    parser.add_argument(
+        "--shard-mb",
+        type=float,
+        default=DEFAULT_SHARD_BYTES / (1024 * 1024),
+        help="Approximate size of the byte ranges handed to each parse worker.",
+    )
     args = parser.parse_args()
 
     jsonl_paths = [resolve_jsonl_path(path) for path in (args.file or [str(path) for path in default_files])]
@@ -312,7 +582,14 @@ def main() -> None:
         missing_text = ", ".join(str(path) for path in missing_paths)
         raise FileNotFoundError(f"File not found: {missing_text}")
 
-    import_products(jsonl_paths, update_existing=args.update_existing)
+    import_products(
+        jsonl_paths,
+        update_existing=args.update_existing,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        shard_bytes=max(1, int(args.shard_mb * 1024 * 1024)),
+        use_checkpoints=not args.ignore_checkpoints,
+    )
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,40 @@
-"""Export the whole SQLite database into a timestamped JSONL backup.
+"""Export the whole SQLite database into a timestamped backup.
 
 Usage:
   PYTHONPATH=src python3 src/sstq/scripts/export_database_backup.py
-  PYTHONPATH=src python3 src/sstq/scripts/export_database_backup.py --output src/instance/backup/20260321-120000.jsonl
+    - Write src/instance/backup/<timestamp>/ with gzip segments per table and a manifest.json.
+
+  PYTHONPATH=src python3 src/sstq/scripts/export_database_backup.py --compression zstd --workers 4
+    - Use zstd (needs the 'zstandard' package) and four export processes.
+
+  PYTHONPATH=src python3 src/sstq/scripts/export_database_backup.py --since src/instance/backup/20260321-120000
+    - Write an incremental backup with only the rows changed (and deleted) since that backup.
+
+  PYTHONPATH=src python3 src/sstq/scripts/export_database_backup.py --verify src/instance/backup/20260321-120000
+    - Re-read an existing backup and check every segment against the manifest checksums.
+
+  PYTHONPATH=src python3 src/sstq/scripts/export_database_backup.py --legacy-jsonl --output src/instance/backup/20260321-120000.jsonl
+    - Write the old single uncompressed JSONL file.
 """
 
 import argparse
 import json
 import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
 
+from sstq.backup import (
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_SEGMENT_ROWS,
+    SEGMENT_SUFFIXES,
+    BackupError,
+    export_changes,
+    export_database,
+    list_tables,
+    verify_backup,
+)
+
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 INSTANCE_DIR = PROJECT_ROOT / "src" / "instance"
@@ -18,27 +42,20 @@ BACKUP_DIR = INSTANCE_DIR / "backup"
 DB_PATH = INSTANCE_DIR / "trace_quest.db"
 
 
-def default_output_path() -> Path:
+def default_output_path(legacy: bool = False) -> Path:
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    return BACKUP_DIR / f"{timestamp}.jsonl"
+    return BACKUP_DIR / (f"{timestamp}.jsonl" if legacy else timestamp)
 
 
-def export_database(output_path: Path) -> None:
+def export_legacy_jsonl(output_path: Path) -> None:
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
 
-    table_names = [
-        row["name"]
-        for row in conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
-        )
-    ]
-
     exported = 0
     with output_path.open("w", encoding="utf-8") as fh:
-        for table_name in table_names:
+        for table_name in list_tables(conn):
             for row in conn.execute(f"SELECT * FROM {table_name}"):
                 fh.write(json.dumps({"table": table_name, "row": dict(row)}, ensure_ascii=False) + "\n")
                 exported += 1
@@ -48,12 +65,50 @@ def export_database(output_path: Path) -> None:
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Export the whole SQLite database into a timestamped JSONL backup.")
-    parser.add_argument("--output", help="Optional output path for the backup JSONL file.")
+    parser = argparse.ArgumentParser(description="Export the whole SQLite database into a timestamped backup.")
+    parser.add_argument("--output", help="Output folder (or file with --legacy-jsonl).")
+    parser.add_argument("--compression", choices=sorted(SEGMENT_SUFFIXES), default="gzip", help="Segment compression (default: gzip).")
+    parser.add_argument("--level", type=int, help="Compression level (default: 6 for gzip, 3 for zstd).")
+    parser.add_argument("--workers", type=int, help="Tables exported in parallel (default: CPU count).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows fetched per database round trip.")
+    parser.add_argument("--segment-rows", type=int, default=DEFAULT_SEGMENT_ROWS, help="Rows per segment file before starting a new one.")
+    parser.add_argument("--since", metavar="BACKUP", help="Write an incremental backup on top of this full or incremental backup.")
+    parser.add_argument("--verify", metavar="BACKUP", help="Verify an existing backup folder instead of exporting.")
+    parser.add_argument("--legacy-jsonl", action="store_true", help="Write a single uncompressed JSONL file.")
     args = parser.parse_args()
 
-    output_path = Path(args.output).expanduser() if args.output else default_output_path()
-    export_database(output_path)
+    if args.verify:
+        problems = verify_backup(Path(args.verify).expanduser())
+        for problem in problems:
+            print(f"- {problem}")
+        print("Backup OK." if not problems else f"Backup has {len(problems)} problem(s).")
+        raise SystemExit(1 if problems else 0)
+
+    output_path = Path(args.output).expanduser() if args.output else default_output_path(args.legacy_jsonl)
+    if args.legacy_jsonl:
+        export_legacy_jsonl(output_path)
+        return
+
+    options = dict(
+        compression=args.compression, level=args.level, chunk_rows=args.chunk_rows, segment_rows=args.segment_rows
+    )
+    started = time.perf_counter()
+    try:
+        if args.since:
+            manifest = export_changes(DB_PATH, output_path, Path(args.since).expanduser(), **options)
+        else:
+            manifest = export_database(DB_PATH, output_path, workers=args.workers, **options)
+    except BackupError as exc:
+        raise SystemExit(str(exc))
+    elapsed = time.perf_counter() - started
+
+    rows = sum(info["rows"] for info in manifest["tables"].values())
+    deleted = sum(info.get("deleted", 0) for info in manifest["tables"].values())
+    size = sum(segment["bytes"] for info in manifest["tables"].values() for segment in info["segments"])
+    print(
+        f"Exported {rows} rows{f' and {deleted} deletions' if args.since else ''} from {len(manifest['tables'])} "
+        f"tables to {output_path} ({size} bytes, {manifest['compression']}, {manifest['kind']}) in {elapsed:.2f}s"
+    )
 
 
 if __name__ == "__main__":
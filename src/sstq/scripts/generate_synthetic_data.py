@@ -0,0 +1,373 @@
+"""Generate a large synthetic dataset with bulk multi-row INSERT statements.
+
+Products, stages, breakdowns, claims, evidence, users/players and mission history are
+synthesized in memory and written with `insert().values([...])` batches sized to SQLite's
+bound-variable limit. Primary keys are assigned up front, so child rows never need a
+round trip to learn their parent's id. The same --seed always produces the same rows.
+
+Usage:
+  python ./src/sstq/scripts/generate_synthetic_data.py --products 100000
+    - 100k products with 5 stages, 3 breakdowns, 2 claims (1 evidence each) per product.
+
+  python ./src/sstq/scripts/generate_synthetic_data.py --products 1000000 --players 50000 --fast
+    - Millions of rows; --fast relaxes durability PRAGMAs on the loading connection.
+
+  python ./src/sstq/scripts/generate_synthetic_data.py --products 5000 --seed 7 --prefix DEMO
+    - Deterministic demo data with barcodes starting with 'DEMO'.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.migrations import ensure_schema
+from sstq.models import Breakdown, Claim, Evidence, Mission, Player, Product, Stage, User
+from sstq.scripts.create_products import content_hash
+
+# SQLite raised its default SQLITE_MAX_VARIABLE_NUMBER from 999 to 32766 in 3.32
+MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+# durability is traded for speed on the loading connection only; a crash mid-load can corrupt the file
+FAST_PRAGMAS = {
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -256 * 1024,
+    "locking_mode": "EXCLUSIVE",
+    # ids are assigned here, so parents always exist before their children are written
+    "foreign_keys": "OFF",
+}
+
+CATEGORIES = [
+    "Snacks",
+    "Beverages",
+    "Plant-based foods",
+    "Coffees",
+    "Cocoa and its products",
+    "Sweet snacks",
+    "Luxury",
+    "Electronics",
+]
+BRANDS = ["Northfield", "Harbor & Co", "Verdant", "Sunpeak", "Old Mill", "Blue Ridge", "Kestrel", "Amberline"]
+COUNTRIES = [
+    "United Kingdom", "France", "Germany", "Spain", "Italy", "Brazil", "Peru",
+    "India", "Vietnam", "Thailand", "Kenya", "United States", "Canada",
+]
+REGIONS = ["North", "South", "East", "West", "Central", "Coastal", "Highland", "River Basin"]
+STAGE_TYPES = ["Raw Material Sourcing", "Processing", "Assembly", "Transport", "Retail"]
+BREAKDOWN_NAMES = ["Primary Ingredient", "Secondary Ingredient", "Packaging Material", "Assembly", "Finishing"]
+CLAIM_TYPES = ["Origin", "Sustainability", "Ethical Sourcing", "Quality", "Certification"]
+CLAIM_TEXTS = [
+    "Core ingredients are sourced from verified suppliers.",
+    "Production follows documented quality controls.",
+    "Supply chain records are available for review.",
+    "Sourcing aligns with published procurement standards.",
+]
+CONFIDENCE_LABELS = ["verified", "partially-verified", "unverified"]
+EVIDENCE_TYPES = ["Certificate", "Audit Report", "Invoice", "Shipment Record", "Lab Result", "Supplier Statement"]
+ISSUERS = ["Internal QA Team", "Third-Party Auditor", "Supplier Compliance Office", "Independent Lab"]
+TIERS = ["easy", "normal", "hard"]
+
+# fixed reference point so reruns with the same seed produce identical dates
+BASE_DATE = date(2024, 1, 1)
+BASE_DATETIME = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def _next_id(connection, column) -> int:
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Loader:
+    def __init__(self, connection):
+        self.connection = connection
+        self.report: list[tuple[str, int, float]] = []
+        self._statements: dict[tuple[str, int], str] = {}
+
+    def _multi_row_sql(self, table, row_count: int) -> str:
+        # compiling a multi-row insert().values() costs far more than running it, so the SQL for each
+        # batch size is compiled once and then executed with plain positional parameters
+        key = (table.name, row_count)
+        if key not in self._statements:
+            placeholder_rows = [{column.name: None for column in table.columns}] * row_count
+            compiled = insert(table).values(placeholder_rows).compile(dialect=self.connection.dialect)
+            self._statements[key] = str(compiled)
+        return self._statements[key]
+
+    def load(self, model, rows: Iterable[dict]) -> int:
+        table = model.__table__
+        columns = list(table.columns)
+        # apply the same type conversions SQLAlchemy would (e.g. date -> 'YYYY-MM-DD')
+        dialect = self.connection.dialect
+        processors = [column.type.dialect_impl(dialect).bind_processor(dialect) for column in columns]
+        batch_size = max(1, MAX_VARIABLES // len(columns))
+        written = 0
+        started = time.perf_counter()
+        for batch in _batches(rows, batch_size):
+            parameters = []
+            for row in batch:
+                for column, processor in zip(columns, processors):
+                    value = row[column.name]
+                    parameters.append(processor(value) if processor and value is not None else value)
+            self.connection.exec_driver_sql(self._multi_row_sql(table, len(batch)), tuple(parameters))
+            written += len(batch)
+        self.connection.commit()
+        elapsed = time.perf_counter() - started
+        self.report.append((table.name, written, elapsed))
+        print(f"  {table.name:<12} {written:>10} rows in {elapsed:7.2f}s ({written / elapsed if elapsed else 0:,.0f} rows/s)")
+        return written
+
+
+def product_rows(rng: random.Random, barcodes: list[str]) -> Iterator[dict]:
+    for index, barcode in enumerate(barcodes):
+        category = CATEGORIES[index % len(CATEGORIES)]
+        brand = rng.choice(BRANDS)
+        row = {
+            "barcode": barcode,
+            "name": f"{brand} {category} {index}",
+            "category": category,
+            "brand": brand,
+            "description": f"Synthetic {category.lower()} product generated for load testing.",
+            "image": None,
+        }
+        # the hash create_products.py compares, so importing the same records later skips them
+        row["content_hash"] = content_hash(row)
+        yield row
+
+
+def stage_rows(rng: random.Random, barcodes: list[str], per_product: int, first_id: int) -> Iterator[dict]:
+    stage_id = first_id
+    for barcode in barcodes:
+        start = BASE_DATE + timedelta(days=rng.randint(0, 365))
+        for position in range(per_product):
+            end = start + timedelta(days=rng.randint(2, 14))
+            yield {
+                "stage_id": stage_id,
+                "product_barcode": barcode,
+                "stage_type": STAGE_TYPES[min(position, len(STAGE_TYPES) - 1)],
+                "country": rng.choice(COUNTRIES),
+                "region": rng.choice(REGIONS),
+                "start_date": start,
+                "end_date": end,
+                "description": "Synthetic supply chain stage.",
+            }
+            stage_id += 1
+            start = end
+
+
+def breakdown_rows(rng: random.Random, barcodes: list[str], per_product: int, first_id: int) -> Iterator[dict]:
+    if per_product <= 0:
+        # '--breakdowns 0': no rows, and nothing to make add up to 100
+        return
+    breakdown_id = first_id
+    for barcode in barcodes:
+        weights = [rng.random() + 0.01 for _ in range(per_product)]
+        total = sum(weights)
+        percentages = [round(weight / total * 100, 2) for weight in weights]
+        percentages[-1] = round(percentages[-1] + 100 - sum(percentages), 2)
+        for position, percentage in enumerate(percentages):
+            yield {
+                "breakdown_id": breakdown_id,
+                "product_barcode": barcode,
+                "breakdown_name": BREAKDOWN_NAMES[position % len(BREAKDOWN_NAMES)],
+                "country": rng.choice(COUNTRIES),
+                "percentage": percentage,
+                "notes": None,
+            }
+            breakdown_id += 1
+
+
+def claim_rows(rng: random.Random, barcodes: list[str], per_product: int, first_id: int) -> Iterator[dict]:
+    claim_id = first_id
+    for barcode in barcodes:
+        for _ in range(per_product):
+            yield {
+                "claim_id": claim_id,
+                "product_barcode": barcode,
+                "claim_type": rng.choice(CLAIM_TYPES),
+                "claim_text": rng.choice(CLAIM_TEXTS),
+                "confidence_label": rng.choice(CONFIDENCE_LABELS),
+                "rationale": "Synthetic claim rationale.",
+            }
+            claim_id += 1
+
+
+def evidence_rows(rng: random.Random, claim_ids: range, per_claim: int, first_id: int) -> Iterator[dict]:
+    evidence_id = first_id
+    for claim_id in claim_ids:
+        for _ in range(per_claim):
+            yield {
+                "evidence_id": evidence_id,
+                "claim_id": claim_id,
+                "evidence_type": rng.choice(EVIDENCE_TYPES),
+                "issuer": rng.choice(ISSUERS),
+                "date": BASE_DATETIME + timedelta(minutes=rng.randint(0, 525600)),
+                "summary": "Synthetic supporting document.",
+                "file_reference": None,
+            }
+            evidence_id += 1
+
+
+def user_rows(prefix: str, user_ids: range, password_hash: str) -> Iterator[dict]:
+    for user_id in user_ids:
+        yield {
+            "user_id": user_id,
+            "username": f"{prefix.lower()}player{user_id}",
+            "role": "consumer",
+            "password_hash": password_hash,
+        }
+
+
+def player_rows(rng: random.Random, user_ids: range, first_id: int) -> Iterator[dict]:
+    for offset, user_id in enumerate(user_ids):
+        yield {"player_id": first_id + offset, "user_id": user_id, "points": rng.randint(0, 2000)}
+
+
+def mission_rows(
+    rng: random.Random, player_ids: range, barcodes: list[str], missions_per_player: int, first_id: int
+) -> Iterator[dict]:
+    mission_id = first_id
+    for player_id in player_ids:
+        for _ in range(missions_per_player):
+            group_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            tier = rng.choice(TIERS)
+            category = rng.choice(CATEGORIES)
+            completed_at = BASE_DATETIME + timedelta(minutes=rng.randint(0, 525600))
+            score = rng.randint(0, 6)
+            for question_number in range(1, 7):
+                barcode = rng.choice(barcodes)
+                answer = rng.choice(COUNTRIES)
+                yield {
+                    "mission_id": mission_id,
+                    "player_id": player_id,
+                    "mission_group_id": group_id,
+                    "mission_category": category,
+                    "tier": tier,
+                    "product_barcode": barcode,
+                    "product_name": f"Synthetic product {barcode}",
+                    "question_number": question_number,
+                    "total_questions": 6,
+                    "question": "Which country appears first in the timeline?",
+                    "player_answer": answer if question_number <= score else rng.choice(COUNTRIES),
+                    "answer": answer,
+                    "all_answers": ", ".join(rng.sample(COUNTRIES, 4)),
+                    "choice_blob": None,
+                    "explanation": "Check the timeline section of the passport.",
+                    "section_label": "Timeline",
+                    "section_url": f"/product/{barcode}",
+                    "score": score,
+                    "completed_at": completed_at,
+                }
+                mission_id += 1
+
+
+def generate(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    app = create_app(register_blueprints=False)
+
+    with app.app_context():
+        ensure_schema()
+        started = time.perf_counter()
+
+        with db.engine.connect() as connection:
+            if args.fast:
+                for name, value in FAST_PRAGMAS.items():
+                    connection.exec_driver_sql(f"PRAGMA {name}={value}")
+            connection.commit()
+
+            existing = set(
+                connection.execute(
+                    select(Product.barcode).where(Product.barcode.like(f"{args.prefix}%"))
+                ).scalars()
+            )
+            if existing:
+                raise SystemExit(
+                    f"{len(existing)} products with prefix '{args.prefix}' already exist. Use another --prefix."
+                )
+
+            barcodes = [f"{args.prefix}{index:010d}" for index in range(args.products)]
+            loader = Loader(connection)
+            print(f"Generating with seed={args.seed}, batch limit={MAX_VARIABLES} variables")
+
+            loader.load(Product, product_rows(rng, barcodes))
+            loader.load(Stage, stage_rows(rng, barcodes, args.stages, _next_id(connection, Stage.stage_id)))
+            loader.load(
+                Breakdown,
+                breakdown_rows(rng, barcodes, args.breakdowns, _next_id(connection, Breakdown.breakdown_id)),
+            )
+
+            first_claim_id = _next_id(connection, Claim.claim_id)
+            loader.load(Claim, claim_rows(rng, barcodes, args.claims, first_claim_id))
+            claim_ids = range(first_claim_id, first_claim_id + len(barcodes) * args.claims)
+            loader.load(
+                Evidence, evidence_rows(rng, claim_ids, args.evidence, _next_id(connection, Evidence.evidence_id))
+            )
+
+            if args.players:
+                first_user_id = _next_id(connection, User.user_id)
+                user_ids = range(first_user_id, first_user_id + args.players)
+                # one hash shared by every synthetic account; hashing per user would dominate the run
+                loader.load(User, user_rows(args.prefix, user_ids, generate_password_hash(args.password)))
+                first_player_id = _next_id(connection, Player.player_id)
+                loader.load(Player, player_rows(rng, user_ids, first_player_id))
+                if barcodes and args.missions:
+                    player_ids = range(first_player_id, first_player_id + args.players)
+                    loader.load(
+                        Mission,
+                        mission_rows(rng, player_ids, barcodes, args.missions, _next_id(connection, Mission.mission_id)),
+                    )
+
+        # drop the relaxed connection so nothing else inherits its PRAGMAs
+        db.engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(rows for _, rows, _ in loader.report)
+    print(f"Done. rows={total_rows}, elapsed={elapsed:.2f}s, throughput={total_rows / elapsed if elapsed else 0:,.0f} rows/s")
+
+
+def _positive_or_zero(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be 0 or greater")
+    return number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a large synthetic dataset with bulk inserts.")
+    parser.add_argument("--products", type=_positive_or_zero, default=10000, help="Products to create (default: 10000).")
+    parser.add_argument("--stages", type=_positive_or_zero, default=5, help="Stages per product (default: 5).")
+    parser.add_argument("--breakdowns", type=_positive_or_zero, default=3, help="Breakdown rows per product (default: 3).")
+    parser.add_argument("--claims", type=_positive_or_zero, default=2, help="Claims per product (default: 2).")
+    parser.add_argument("--evidence", type=_positive_or_zero, default=1, help="Evidence rows per claim (default: 1).")
+    parser.add_argument("--players", type=_positive_or_zero, default=1000, help="Consumer accounts with players (default: 1000).")
+    parser.add_argument("--missions", type=_positive_or_zero, default=3, help="Completed missions per player, 6 rows each (default: 3).")
+    parser.add_argument("--password", default="synthetic", help="Password for every synthetic account.")
+    parser.add_argument("--prefix", default="SYN", help="Barcode/username prefix (default: SYN).")
+    parser.add_argument("--seed", type=int, default=2020, help="Random seed (default: 2020).")
+    parser.add_argument("--fast", action="store_true", help="Relax durability PRAGMAs while loading.")
+    args = parser.parse_args()
+    generate(args)
+
+
+if __name__ == "__main__":
+    main()
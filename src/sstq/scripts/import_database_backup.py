@@ -1,22 +1,56 @@
-"""Import a JSONL backup file and overwrite the current SQLite database.
+"""Import a backup and overwrite the current SQLite database.
+
+Rows are streamed from the backup and inserted in batches, table by table in dependency order.
+The restore is built in a sibling file ('trace_quest.db.restoring') that replaces the database
+only once it is complete, so a corrupt segment or a bad line leaves the current database alone.
+Progress is committed together with every batch, so an interrupted restore continues where it
+stopped when it is run again with the same arguments (use --restart to start over).
 
 Usage:
-  PYTHONPATH=src python3 src/sstq/scripts/import_database_backup.py --file src/instance/backup/20260321-120000.jsonl
+  PYTHONPATH=src python3 src/sstq/scripts/import_database_backup.py --file src/instance/backup/20260321-120000
+    - Restore a backup folder written by export_database_backup.py (segment checksums are verified).
+
+  PYTHONPATH=src python3 src/sstq/scripts/import_database_backup.py --file src/instance/backup/20260321-120000 \
+      --incremental src/instance/backup/20260322-120000 --incremental src/instance/backup/20260323-120000
+    - Restore a full backup, then replay incremental backups on top of it, oldest first.
+
+  PYTHONPATH=src python3 src/sstq/scripts/import_database_backup.py --file src/instance/backup/20260321-095508.jsonl
+    - Restore a legacy single-file JSONL backup.
+
+  PYTHONPATH=src python3 src/sstq/scripts/import_database_backup.py --file src/instance/backup/20260321-120000 --restart
+    - Ignore the progress of an interrupted restore and start from scratch.
 """
 
 import argparse
 import json
+import os
 import sqlite3
+import tempfile
+import time
+from itertools import islice
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 
 from sstq import create_app
+from sstq.backup import (
+    BackupError,
+    check_backup_chain,
+    is_backup_folder,
+    iter_backup_deletes,
+    iter_backup_records,
+    read_manifest,
+)
+from sstq.change_tracking import CHANGE_TABLE, TRACKED_TABLES, drop_trigger_statements, install_statements
 from sstq.extensions import db
+from sstq.migrations import VERSION_TABLE, ensure_schema
+from sstq.upload_store import drop_reference_trigger_statements, recount_statement, reference_trigger_statements
 
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 INSTANCE_DIR = PROJECT_ROOT / "src" / "instance"
 BACKUP_DIR = INSTANCE_DIR / "backup"
 DB_PATH = INSTANCE_DIR / "trace_quest.db"
+RESTORE_SUFFIX = ".restoring"
 
 TABLE_ORDER = [
     "users",
@@ -30,8 +64,25 @@ TABLE_ORDER = [
     "missions",
     "badges",
     "changelogs",
+    "stored_blobs",
 ]
 
+# restore bookkeeping inside the target database, so a batch and its progress commit together
+PROGRESS_TABLE = "sstq_import_progress"
+# tables that belong to the database doing the restore, not to the backup
+SKIPPED_TABLES = {VERSION_TABLE, CHANGE_TABLE, PROGRESS_TABLE}
+DEFAULT_BATCH_ROWS = 5000
+PROGRESS_INTERVAL = 2.0
+
+# only for the duration of the load: a crashed process loses at most the open batch, and the
+# foreign keys of a backup are consistent as a whole, not at every point of the load order
+LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -256 * 1024,
+    "foreign_keys": "OFF",
+}
+
 
 def resolve_backup_path(raw_path: str) -> Path:
     candidate = Path(raw_path).expanduser()
@@ -50,18 +101,72 @@ def resolve_backup_path(raw_path: str) -> Path:
     return candidate
 
 
-def load_rows(backup_path: Path) -> dict[str, list[dict]]:
-    rows_by_table: dict[str, list[dict]] = {}
-    with backup_path.open("r", encoding="utf-8") as fh:
-        for line in fh:
+class ProgressReporter:
+    def __init__(self, interval: float = PROGRESS_INTERVAL):
+        self.interval = interval
+        self.last_report = 0.0
+        self.last_line = None
+
+    def update(
+        self, label: str, done: int, total: int | None, started: float, resumed_at: int = 0, force: bool = False
+    ) -> None:
+        now = time.perf_counter()
+        if (not force and now - self.last_report < self.interval) or self.last_line == (label, done):
+            return
+        self.last_report = now
+        self.last_line = (label, done)
+        elapsed = max(now - started, 1e-9)
+        of_total = f"/{total}" if total is not None else ""
+        print(f"  {label}: {done}{of_total} rows ({(done - resumed_at) / elapsed:,.0f} rows/s)")
+
+
+def iter_rows(path: Path, table_name: str | None = None) -> Iterator[dict]:
+    # lines are parsed one at a time; folder backups verify segment checksums while reading
+    tables = {table_name} if table_name else None
+    return (row for _, row in iter_backup_records(path, tables))
+
+
+def table_sources(backup_path: Path, spill_dir: Path, skip_tables: set[str]) -> dict[str, tuple[Callable, int | None]]:
+    """Map every table in the backup to (row iterator factory, row count if known)."""
+    if is_backup_folder(backup_path):
+        # folders keep each table in its own segments, so any table can be read on its own
+        _, manifest = read_manifest(backup_path)
+        return {
+            table: (lambda table=table: iter_rows(backup_path, table), info["rows"])
+            for table, info in manifest["tables"].items()
+        }
+
+    # legacy files are written in table-name order; lines are spilled to one file per table so the
+    # tables can still be loaded in dependency order without holding any of them in memory
+    spill_files: dict[str, object] = {}
+    counts: dict[str, int] = {}
+    with backup_path.open("r", encoding="utf-8") as handle:
+        for line in handle:
             if not line.strip():
                 continue
-            item = json.loads(line)
-            rows_by_table.setdefault(item["table"], []).append(item["row"])
-    return rows_by_table
+            table = json.loads(line)["table"]
+            counts[table] = counts.get(table, 0) + 1
+            if table in skip_tables:
+                continue
+            if table not in spill_files:
+                spill_files[table] = (spill_dir / f"{table}.jsonl").open("w", encoding="utf-8")
+            spill_files[table].write(line if line.endswith("\n") else line + "\n")
+    for spill in spill_files.values():
+        spill.close()
 
+    return {
+        table: (lambda table=table: iter_rows(spill_dir / f"{table}.jsonl"), count)
+        for table, count in counts.items()
+    }
 
-def insert_rows(conn: sqlite3.Connection, table_name: str, rows: list[dict]) -> int:
+
+def batched(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def insert_rows(conn: sqlite3.Connection, table_name: str, rows: list[dict], replace: bool = False) -> int:
     if not rows:
         return 0
 
@@ -70,37 +175,107 @@ def insert_rows(conn: sqlite3.Connection, table_name: str, rows: list[dict]) ->
     column_sql = ", ".join(columns)
     values = [[row.get(column) for column in columns] for row in rows]
     conn.executemany(
-        f"INSERT INTO {table_name} ({column_sql}) VALUES ({placeholders})",
+        f"INSERT {'OR REPLACE ' if replace else ''}INTO {table_name} ({column_sql}) VALUES ({placeholders})",
         values,
     )
     return len(rows)
 
 
-def restore_backup(backup_path: Path) -> None:
-    rows_by_table = load_rows(backup_path)
+def read_progress(conn: sqlite3.Connection) -> dict[str, tuple[int, bool]]:
+    return {name: (rows, bool(finished)) for name, rows, finished in conn.execute(
+        f"SELECT name, rows, finished FROM {PROGRESS_TABLE}"
+    )}
+
+
+def save_progress(conn: sqlite3.Connection, name: str, rows: int, finished: bool = False) -> None:
+    conn.execute(
+        f"INSERT OR REPLACE INTO {PROGRESS_TABLE} (name, rows, finished) VALUES (?, ?, ?)",
+        (name, rows, int(finished)),
+    )
+
+
+def restore_path() -> Path:
+    return DB_PATH.with_name(DB_PATH.name + RESTORE_SUFFIX)
+
 
-    if DB_PATH.exists():
-        DB_PATH.unlink()
+def _remove_database(path: Path) -> None:
+    # a WAL left next to a database file must never be applied to a different one
+    for suffix in ("", "-wal", "-shm"):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def start_restore(identity: str, restart: bool) -> tuple[sqlite3.Connection, bool]:
+    """Open the restore file, either continuing a matching interrupted restore or starting fresh."""
+    target = restore_path()
+    if target.exists() and not restart:
+        conn = sqlite3.connect(target)
+        try:
+            matches = conn.execute(f"SELECT 1 FROM {PROGRESS_TABLE} WHERE name = ?", (identity,)).fetchone()
+        except sqlite3.OperationalError:
+            matches = None
+        if matches:
+            return conn, True
+        conn.close()
 
-    app = create_app()
+    _remove_database(target)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{target}"}, register_blueprints=False)
     with app.app_context():
-        db.drop_all()
-        db.create_all()
+        ensure_schema()
+        db.engine.dispose()
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys=OFF")
+    conn = sqlite3.connect(target)
+    conn.execute(
+        f"CREATE TABLE {PROGRESS_TABLE} (name TEXT PRIMARY KEY, rows INTEGER NOT NULL, finished INTEGER NOT NULL)"
+    )
+    # the identity row ties the progress to one backup chain; a different chain never resumes it
+    save_progress(conn, identity, 0, finished=True)
+    conn.commit()
+    return conn, False
 
-    restored = 0
+
+def replace_database() -> None:
+    """Swap the completed restore in for the current database."""
+    for suffix in ("-wal", "-shm"):
+        DB_PATH.with_name(DB_PATH.name + suffix).unlink(missing_ok=True)
+    os.replace(restore_path(), DB_PATH)
+
+
+def load_table(conn, table_name, source, total, batch_rows, progress, reporter) -> int:
+    already, finished = progress.get(table_name, (0, False))
+    if finished:
+        return 0
+
+    started = time.perf_counter()
+    done = already
+    # backups never change, so the rows committed before an interruption are exactly the first ones
+    for batch in batched(islice(source(), already, None), batch_rows):
+        done += insert_rows(conn, table_name, batch)
+        save_progress(conn, table_name, done)
+        conn.commit()
+        reporter.update(table_name, done, total, started, resumed_at=already)
+    save_progress(conn, table_name, done, finished=True)
+    conn.commit()
+    reporter.update(table_name, done, total, started, resumed_at=already, force=True)
+    return done - already
+
+
+def apply_incremental(conn: sqlite3.Connection, backup_path: Path, batch_rows: int) -> tuple[int, int]:
+    # changed rows replace whatever the previous backup had under the same key, tombstones remove rows;
+    # an incremental is applied in a single transaction, so it is either fully replayed or not at all
+    upserted = 0
     for table_name in TABLE_ORDER:
-        rows = rows_by_table.get(table_name, [])
-        restored += insert_rows(conn, table_name, rows)
+        for batch in batched(iter_rows(backup_path, table_name), batch_rows):
+            upserted += insert_rows(conn, table_name, batch, replace=True)
+    deleted = 0
+    for table_name, key in iter_backup_deletes(backup_path):
+        deleted += conn.execute(
+            f"DELETE FROM {table_name} WHERE {TRACKED_TABLES[table_name]} = ?", (key,)
+        ).rowcount
+    return upserted, deleted
 
-    for table_name, rows in rows_by_table.items():
-        if table_name in TABLE_ORDER:
-            continue
-        restored += insert_rows(conn, table_name, rows)
 
-    for table_name in rows_by_table:
+def reset_sequences(conn: sqlite3.Connection, tables: Iterable[str]) -> None:
+    for table_name in tables:
         try:
             pk_info = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
             pk_columns = [row[1] for row in pk_info if row[5]]
@@ -115,21 +290,106 @@ def restore_backup(backup_path: Path) -> None:
         except sqlite3.OperationalError:
             pass
 
+
+def restore_backup(
+    backup_path: Path,
+    incremental_paths: list[Path] | None = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    restart: bool = False,
+) -> None:
+    incremental_paths = incremental_paths or []
+    if incremental_paths and not is_backup_folder(backup_path):
+        raise SystemExit("Incremental backups can only be replayed on top of a full backup folder.")
+    try:
+        manifests = check_backup_chain([backup_path, *incremental_paths]) if is_backup_folder(backup_path) else []
+    except BackupError as exc:
+        raise SystemExit(str(exc))
+
+    identity = "backup:" + json.dumps([str(path.resolve()) for path in [backup_path, *incremental_paths]])
+    conn, resumed = start_restore(identity, restart)
+    started = time.perf_counter()
+    if resumed:
+        print(f"Resuming the interrupted restore of {backup_path} into {restore_path()}")
+    for name, value in LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    # the restore is not a change to back up, and the backup already has the upload reference counts;
+    # triggers come back once the data is in place
+    for statement in [*drop_trigger_statements(), *drop_reference_trigger_statements()]:
+        conn.execute(statement)
+    conn.commit()
+
+    progress = read_progress(conn)
+    reporter = ProgressReporter()
+    finished_tables = {name for name, (_, finished) in progress.items() if finished}
+    restored = 0
+    with tempfile.TemporaryDirectory(dir=DB_PATH.parent, prefix="import-spill-") as spill_dir:
+        sources = table_sources(backup_path, Path(spill_dir), SKIPPED_TABLES | finished_tables)
+        # dependency order first, then anything the backup has that is not listed (e.g. jobs)
+        tables = [table for table in TABLE_ORDER if table in sources]
+        tables += sorted(table for table in sources if table not in TABLE_ORDER and table not in SKIPPED_TABLES)
+        for table_name in tables:
+            source, total = sources[table_name]
+            restored += load_table(conn, table_name, source, total, batch_rows, progress, reporter)
+
+    for index, incremental_path in enumerate(incremental_paths):
+        step = f"incremental:{index}"
+        if progress.get(step, (0, False))[1]:
+            continue
+        upserted, deleted = apply_incremental(conn, incremental_path, batch_rows)
+        save_progress(conn, step, upserted + deleted, finished=True)
+        conn.commit()
+        print(f"Replayed {incremental_path}: {upserted} changed rows, {deleted} deleted rows")
+
+    reset_sequences(conn, tables)
+
+    # start the change log over, but keep its version counter past the last replayed backup so an
+    # incremental taken from the last backup stays valid
+    conn.execute(f"DELETE FROM {CHANGE_TABLE}")
+    last_version = manifests[-1].get("change_version") if manifests else None
+    if last_version:
+        updated = conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (last_version, CHANGE_TABLE)
+        ).rowcount
+        if not updated:
+            conn.execute("INSERT INTO sqlite_sequence(name, seq) VALUES(?, ?)", (CHANGE_TABLE, last_version))
+    # incrementals replace rows one by one, so count the upload references again rather than trust the copies
+    conn.execute(recount_statement())
+    for statement in [*install_statements(), *reference_trigger_statements()]:
+        conn.execute(statement)
+    conn.execute(f"DROP TABLE {PROGRESS_TABLE}")
     conn.commit()
+
+    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
     conn.close()
-    print(f"Imported {restored} rows from {backup_path} into {DB_PATH}")
+    replace_database()
+    if violations:
+        print(f"Warning: {len(violations)} rows reference missing parent rows (PRAGMA foreign_key_check).")
+    print(
+        f"Imported {restored} rows from {backup_path} into {DB_PATH} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Import a backup JSONL file and overwrite the current SQLite database.")
-    parser.add_argument("--file", required=True, help="Path to the backup JSONL file.")
+    parser.add_argument("--file", required=True, help="Path to the full backup folder or legacy JSONL file.")
+    parser.add_argument(
+        "--incremental",
+        action="append",
+        default=[],
+        help="Incremental backup to replay after the full backup; repeat in order, oldest first.",
+    )
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Rows inserted and committed per batch.")
+    parser.add_argument("--restart", action="store_true", help="Start over instead of resuming an interrupted restore.")
     args = parser.parse_args()
 
     backup_path = resolve_backup_path(args.file)
-    if not backup_path.exists():
-        raise SystemExit(f"Backup file not found: {backup_path}")
+    incremental_paths = [resolve_backup_path(path) for path in args.incremental]
+    for path in [backup_path, *incremental_paths]:
+        if not path.exists():
+            raise SystemExit(f"Backup file not found: {path}")
 
-    restore_backup(backup_path)
+    restore_backup(backup_path, incremental_paths, batch_rows=args.batch_rows, restart=args.restart)
 
 
 if __name__ == "__main__":
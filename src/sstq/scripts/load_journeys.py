@@ -0,0 +1,242 @@
+"""Drive the real Flask app through the main user journey and report per-step latency.
+
+Every virtual user logs in, scans a barcode, opens the product passport and its evidence,
+starts a Trace Quest mission and submits it, then logs out. The app runs in-process against
+a seeded SQLite database in a temporary folder, so no server or network is needed.
+
+Usage:
+  python ./src/sstq/scripts/load_journeys.py
+    - 8 virtual users, 5 journeys each, against 40 seeded products.
+
+  python ./src/sstq/scripts/load_journeys.py --concurrency 16 --iterations 20 --products 200
+    - A heavier run.
+
+  python ./src/sstq/scripts/load_journeys.py --max-p95-ms 250 --max-error-rate 0
+    - Exit with status 1 if any step's p95 is above 250 ms or any request failed (release gate).
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from werkzeug.security import generate_password_hash
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.migrations import ensure_schema
+from sstq.models import Breakdown, Claim, Evidence, Product, Stage, User
+
+PASSWORD = "load-test"
+STEPS = ["login", "scan", "product", "evidence", "mission_start", "mission_view", "mission_submit", "logout"]
+MISSION_ID_PATTERN = re.compile(r"/misson/(\d+)")
+
+
+def seed_database(products: int, users: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    countries = ["Spain", "Brazil", "Ghana", "United Kingdom", "Vietnam", "Peru", "India"]
+    # one hash is enough for every account and avoids seconds of scrypt work while seeding
+    password_hash = generate_password_hash(PASSWORD)
+
+    barcodes = []
+    for index in range(products):
+        barcode = f"LOAD-{index:06d}"
+        barcodes.append(barcode)
+        db.session.add(
+            Product(
+                barcode=barcode,
+                name=f"Load Snack {index}",
+                category="Snacks",
+                brand=f"Brand {index % 7}",
+                description="Seeded for the load test.",
+            )
+        )
+        first, second = rng.sample(countries, 2)
+        share = rng.randint(20, 80)
+        db.session.add_all(
+            [
+                Stage(product_barcode=barcode, stage_type="Raw Materials", country=first, description="Sourced."),
+                Stage(product_barcode=barcode, stage_type="Assembly", country=second, description="Assembled."),
+                Breakdown(product_barcode=barcode, breakdown_name="Cocoa", country=first, percentage=share),
+                Breakdown(product_barcode=barcode, breakdown_name="Sugar", country=second, percentage=100 - share),
+            ]
+        )
+        claim = Claim(
+            product_barcode=barcode,
+            claim_type="Origin",
+            claim_text="Ingredients are traceable to source countries.",
+            confidence_label=rng.choice(["verified", "partially-verified", "unverified"]),
+            rationale="Seeded claim.",
+        )
+        db.session.add(claim)
+        db.session.flush()
+        db.session.add(
+            Evidence(claim_id=claim.claim_id, evidence_type="Certificate", issuer="Load Lab", summary="Seeded evidence.")
+        )
+
+    for index in range(users):
+        db.session.add(User(username=f"loaduser{index}", role="consumer", password_hash=password_hash))
+
+    db.session.commit()
+    return barcodes
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    # nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.lock = threading.Lock()
+
+    def record(self, step: str, elapsed: float, ok: bool) -> None:
+        with self.lock:
+            self.latencies[step].append(elapsed)
+            if not ok:
+                self.errors[step] += 1
+
+
+def run_journey(client, username: str, barcode: str, recorder: Recorder) -> None:
+    def timed(step, expected_status, call):
+        started = time.perf_counter()
+        try:
+            response = call()
+            ok = response.status_code == expected_status
+        except Exception:
+            response, ok = None, False
+        recorder.record(step, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    if not timed("login", 302, lambda: client.post(
+        "/login", data={"username": username, "password": PASSWORD, "action": "login"}
+    )):
+        return
+    timed("scan", 302, lambda: client.get("/search_product", query_string={"barcode": barcode}))
+    timed("product", 200, lambda: client.get(f"/product/{barcode}"))
+    timed("evidence", 200, lambda: client.get(f"/product/evidence/{barcode}"))
+
+    response = timed("mission_start", 302, lambda: client.post(
+        "/trace_quest", data={"mission_category": "snacks", "difficulty": "easy"}
+    ))
+    match = MISSION_ID_PATTERN.search(response.headers.get("Location", "")) if response else None
+    if match:
+        mission_url = f"/misson/{match.group(1)}"
+        timed("mission_view", 200, lambda: client.get(mission_url))
+        answers = {f"answer_{number}": "load-test answer" for number in range(1, 7)}
+        timed("mission_submit", 302, lambda: client.post(mission_url, data=answers))
+    else:
+        recorder.record("mission_view", 0.0, False)
+        recorder.record("mission_submit", 0.0, False)
+
+    timed("logout", 302, lambda: client.get("/logout"))
+
+
+def summarize(recorder: Recorder, wall_seconds: float) -> dict[str, dict[str, float]]:
+    summary = {}
+    for step in STEPS:
+        samples = sorted(recorder.latencies[step])
+        summary[step] = {
+            "requests": len(samples),
+            "errors": recorder.errors[step],
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "rps": round(len(samples) / wall_seconds, 1) if wall_seconds else 0.0,
+        }
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="In-process load test of the main user journey.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users running in parallel (default: 8).")
+    parser.add_argument("--iterations", type=int, default=5, help="Journeys per virtual user (default: 5).")
+    parser.add_argument("--products", type=int, default=40, help="Seeded products (default: 40).")
+    parser.add_argument("--seed", type=int, default=2020, help="Random seed for the seeded data.")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any step's p95 latency exceeds this.")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if the share of failed requests exceeds this (0-1).")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{Path(temp_dir) / 'load_test.db'}",
+            "SECRET_KEY": "load-test",
+            "JOB_WORKERS": 0,
+        })
+        with app.app_context():
+            ensure_schema()
+            barcodes = seed_database(args.products, args.concurrency, args.seed)
+
+        recorder = Recorder()
+
+        def virtual_user(index):
+            rng = random.Random(args.seed + index)
+            client = app.test_client()
+            for _ in range(args.iterations):
+                run_journey(client, f"loaduser{index}", rng.choice(barcodes), recorder)
+
+        threads = [threading.Thread(target=virtual_user, args=(index,)) for index in range(args.concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - started
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    summary = summarize(recorder, wall_seconds)
+    total_requests = sum(step["requests"] for step in summary.values())
+    total_errors = sum(step["errors"] for step in summary.values())
+    journeys = args.concurrency * args.iterations
+
+    if args.json:
+        print(json.dumps({
+            "wall_seconds": round(wall_seconds, 3),
+            "journeys_per_second": round(journeys / wall_seconds, 2),
+            "steps": summary,
+        }, indent=2))
+    else:
+        print(f"{'step':<16}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+        for step, row in summary.items():
+            print(
+                f"{step:<16}{row['requests']:>9}{row['errors']:>8}{row['p50_ms']:>9.1f}"
+                f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['rps']:>9.1f}"
+            )
+        print(
+            f"Done. journeys={journeys}, requests={total_requests}, errors={total_errors}, "
+            f"wall={wall_seconds:.2f}s, journeys/s={journeys / wall_seconds:.2f}"
+        )
+
+    failures = []
+    if args.max_p95_ms is not None:
+        failures += [
+            f"{step} p95 {row['p95_ms']:.1f} ms > {args.max_p95_ms:.1f} ms"
+            for step, row in summary.items()
+            if row["p95_ms"] > args.max_p95_ms
+        ]
+    if args.max_error_rate is not None and total_requests:
+        error_rate = total_errors / total_requests
+        if error_rate > args.max_error_rate:
+            failures.append(f"error rate {error_rate:.2%} > {args.max_error_rate:.2%}")
+    if failures:
+        print("Load test thresholds failed: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
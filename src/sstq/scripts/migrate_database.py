@@ -0,0 +1,42 @@
+"""Apply versioned schema migrations to the application database.
+
+Usage:
+  python ./src/sstq/scripts/migrate_database.py
+    - Apply every pending migration (creates tables and indexes on a new database).
+
+  python ./src/sstq/scripts/migrate_database.py --status
+    - Show the stored schema version and any pending migrations without changing anything.
+
+  python ./src/sstq/scripts/migrate_database.py --target 2
+    - Apply pending migrations up to and including version 2.
+"""
+
+import argparse
+
+from sstq import create_app
+from sstq.migrations import LATEST_VERSION, current_version, pending_migrations, upgrade
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations to the application database.")
+    parser.add_argument("--status", action="store_true", help="Only report the current schema version.")
+    parser.add_argument("--target", type=int, help=f"Stop after this version (default: {LATEST_VERSION}).")
+    args = parser.parse_args()
+
+    app = create_app(register_blueprints=False)
+    with app.app_context():
+        if args.status:
+            pending = pending_migrations()
+            print(f"Schema version: {current_version()} (latest {LATEST_VERSION})")
+            for migration in pending:
+                print(f"- pending {migration.version:04d}: {migration.description}")
+            if not pending:
+                print("Database is up to date.")
+            return
+
+        applied = upgrade(target=args.target, echo=print)
+        print(f"Done. applied={len(applied)}, schema_version={current_version()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Take a consistent online snapshot of the SQLite database.
+
+Usage:
+  python ./src/sstq/scripts/snapshot_database.py
+    - Copy the database with the SQLite backup API, verify it with PRAGMA integrity_check,
+      then apply SNAPSHOT_KEEP / SNAPSHOT_RETENTION_DAYS rotation.
+
+  python ./src/sstq/scripts/snapshot_database.py --list
+    - Show the existing snapshots, newest first.
+
+  python ./src/sstq/scripts/snapshot_database.py --verify src/instance/snapshots/snapshot-20260321-120000.db
+    - Run the integrity check on an existing snapshot.
+"""
+
+import argparse
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.snapshots import SnapshotError, list_snapshots, snapshot_dir, snapshot_now, verify_snapshot
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Take a consistent online snapshot of the SQLite database.")
+    parser.add_argument("--list", action="store_true", help="List existing snapshots.")
+    parser.add_argument("--verify", metavar="SNAPSHOT", help="Check an existing snapshot file.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print copy progress.")
+    args = parser.parse_args()
+
+    if args.verify:
+        problems = verify_snapshot(args.verify)
+        for problem in problems:
+            print(f"- {problem}")
+        print("Snapshot OK." if not problems else f"Snapshot has {len(problems)} problem(s).")
+        raise SystemExit(1 if problems else 0)
+
+    app = create_app(register_blueprints=False)
+    with app.app_context():
+        if args.list:
+            for path in list_snapshots(snapshot_dir()):
+                print(f"{path.name}  {path.stat().st_size} bytes")
+            return
+
+        def progress(copied: int, total: int) -> None:
+            if not args.quiet:
+                print(f"\rCopied {copied}/{total} pages", end="", flush=True)
+
+        try:
+            result = snapshot_now(db.engine, progress=progress)
+        except SnapshotError as exc:
+            raise SystemExit(str(exc))
+        if not args.quiet:
+            print()
+        print(
+            f"Snapshot {result['path']} ({result['bytes']} bytes) verified in {result['seconds']:.2f}s, "
+            f"removed {len(result['removed'])} old snapshot(s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Delete abandoned temp uploads from static/uploads/cache and static/uploads/cache/evidence.
+
+Usage:
+  python ./src/sstq/scripts/sweep_upload_cache.py
+    - Delete cache files older than UPLOAD_CACHE_TTL_HOURS (default 24) that no add/edit page
+      has shown within that time. The job runner does the same every UPLOAD_CACHE_SWEEP_SECONDS;
+      use this from cron when the app runs with JOB_WORKERS=0.
+
+  python ./src/sstq/scripts/sweep_upload_cache.py --ttl-hours 6 --dry-run
+    - Only report what a 6 hour TTL would delete.
+"""
+
+import argparse
+
+from sstq import create_app
+from sstq.migrations import ensure_schema
+from sstq.upload_cache import sweep_upload_cache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete abandoned temp uploads from the upload cache.")
+    parser.add_argument("--ttl-hours", type=float, help="Override UPLOAD_CACHE_TTL_HOURS for this run.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Files checked per database query.")
+    parser.add_argument("--dry-run", action="store_true", help="Report without deleting anything.")
+    args = parser.parse_args()
+
+    app = create_app(register_blueprints=False)
+    with app.app_context():
+        ensure_schema()
+        ttl_hours = app.config["UPLOAD_CACHE_TTL_HOURS"] if args.ttl_hours is None else args.ttl_hours
+        result = sweep_upload_cache(ttl_hours, batch_size=args.batch_size, dry_run=args.dry_run)
+        action = "Would remove" if args.dry_run else "Removed"
+        print(
+            f"{action} {result.removed} of {result.expired} expired files "
+            f"(kept {result.kept} still in use), bytes={result.bytes_reclaimed}, "
+            f"MB={result.bytes_reclaimed / (1024 * 1024):.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,33 +3,46 @@
 Usage:
   python ./src/sstq/scripts/upload_picture.py
     - Read *.jpg/jpeg from script-local upload_picture folder first.
-    - Rename files with the same rule as web upload: <barcode>-<random>.jpg
+    - Name files by the sha256 of their content: <sha256>.jpg, in the upload store
+      (sstq/upload_store.py). Identical photos are stored once, however many products
+      (or earlier uploads) use them.
     - Save files into static/uploads/products and update Product.image.
+    - Create the WebP variants for the product pages' srcset when Pillow is installed.
     - Skip product when Product.image file already exists.
 
   python ./src/sstq/scripts/upload_picture.py --source upload_picture
     - Use a specific source folder (relative or absolute path).
 
   python ./src/sstq/scripts/upload_picture.py --dry-run
-    - Show what would be updated without writing files or database changes.
+    - Show what would be updated without writing files or database changes, and how many
+      bytes the deduplication would save.
 
   python ./src/sstq/scripts/upload_picture.py --replace-existing
-    - Replace Product.image when old image file exists, and delete old file.
+    - Replace Product.image when old image file exists, and delete old file
+      (unless another product still uses it).
+
+  python ./src/sstq/scripts/upload_picture.py --workers 16 --batch-size 1000
+    - Hash and copy files with 16 threads; update the products 1000 per statement and commit.
 """
 
 from __future__ import annotations
 
 import argparse
-import shutil
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable, NamedTuple
 from urllib.parse import urlparse
-from uuid import uuid4
 
-from werkzeug.utils import secure_filename
+from sqlalchemy import bindparam, select, update
 
 from sstq import create_app
 from sstq.extensions import db
+from sstq.image_variants import generate_variants, variants_available
+from sstq.migrations import ensure_schema
 from sstq.models import Product
+from sstq.upload_store import blob_url, hash_file, place_file, register_blobs, release
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 DEFAULT_SOURCE_CANDIDATES = [
@@ -37,6 +50,16 @@ DEFAULT_SOURCE_CANDIDATES = [
     PROJECT_ROOT / "upload_picture",
     PROJECT_ROOT / "src" / "upload_picture",
 ]
+# hashing and copying wait on the disk and hashlib releases the GIL, so threads scale past the CPU count
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+DEFAULT_BATCH_SIZE = 500
+SQL_IN_CHUNK = 900
+
+
+class SourceImage(NamedTuple):
+    path: Path
+    digest: str
+    size: int
 
 
 def normalize_barcode(value: str) -> str:
@@ -63,14 +86,34 @@ def resolve_source_dir(raw_path: str | None) -> Path:
     return DEFAULT_SOURCE_CANDIDATES[0]
 
 
-def find_product_by_filename_barcode(filename_barcode: str) -> Product | None:
-    product = db.session.get(Product, filename_barcode)
+def load_products(filename_barcodes: Iterable[str]) -> dict[str, tuple[str, str | None]]:
+    """Map every filename barcode (as written and normalized) that matches a product to (barcode, image)."""
+    candidates = set()
+    for value in filename_barcodes:
+        candidates.add(value)
+        normalized = normalize_barcode(value)
+        if normalized:
+            candidates.add(normalized)
+
+    found: dict[str, tuple[str, str | None]] = {}
+    values = sorted(candidates)
+    for start in range(0, len(values), SQL_IN_CHUNK):
+        chunk = values[start:start + SQL_IN_CHUNK]
+        for barcode, image in db.session.execute(
+            select(Product.barcode, Product.image).where(Product.barcode.in_(chunk))
+        ):
+            found[barcode] = (barcode, image)
+    return found
+
+
+def find_product_by_filename_barcode(products: dict, filename_barcode: str) -> tuple[str, str | None] | None:
+    product = products.get(filename_barcode)
     if product:
         return product
 
     normalized = normalize_barcode(filename_barcode)
     if normalized and normalized != filename_barcode:
-        return db.session.get(Product, normalized)
+        return products.get(normalized)
     return None
 
 
@@ -102,15 +145,55 @@ def resolve_image_path(image_value: str | None, static_folder: Path, upload_dir:
     return candidate
 
 
-def import_pictures(source_dir: Path, dry_run: bool = False, replace_existing: bool = False) -> None:
-    app = create_app()
+def hash_source(path: Path) -> SourceImage:
+    digest, size = hash_file(path)
+    return SourceImage(path, digest, size)
+
+
+def copy_into_store(source: SourceImage, destination: Path, variant_widths: tuple[int, ...] = (), quality: int = 80) -> None:
+    place_file(source.path, destination)
+    if variant_widths:
+        try:
+            generate_variants(destination, variant_widths, quality=quality)
+        except Exception as exc:  # the photo is imported either way; create_image_variants.py can retry
+            print(f"Could not create image variants for {source.path.name}: {exc}")
+
+
+def update_product_images(updates: list[dict], batch_size: int) -> None:
+    statement = (
+        update(Product.__table__)
+        .where(Product.__table__.c.barcode == bindparam("product_barcode"))
+        .values(image=bindparam("new_image"))
+    )
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(statement, updates[start:start + batch_size])
+        db.session.commit()
+
+
+def _format_bytes(size: float) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def import_pictures(
+    source_dir: Path,
+    dry_run: bool = False,
+    replace_existing: bool = False,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    app = create_app(register_blueprints=False)
     copied = 0
+    copied_bytes = 0
+    reused = 0
+    saved_bytes = 0
     updated = 0
     skipped_existing = 0
     deleted_old = 0
     missing_barcodes: list[str] = []
+    started = time.perf_counter()
 
     with app.app_context():
+        ensure_schema()
         static_folder = Path(app.static_folder)
         upload_dir = static_folder / "uploads" / "products"
         if not dry_run:
@@ -121,15 +204,19 @@ def import_pictures(source_dir: Path, dry_run: bool = False, replace_existing: b
             print(f"No jpg/jpeg files found in: {source_dir}")
             return
 
+        products = load_products(image_path.stem.strip() for image_path in image_files)
+        selected: list[tuple[Path, str, str | None]] = []
+        old_images: set[str] = set()
         for image_path in image_files:
             filename_barcode = image_path.stem.strip()
-            product = find_product_by_filename_barcode(filename_barcode)
+            product = find_product_by_filename_barcode(products, filename_barcode)
             if not product:
                 missing_barcodes.append(filename_barcode)
                 continue
+            barcode, current_image = product
 
             old_image_path = resolve_image_path(
-                product.image,
+                current_image,
                 static_folder=static_folder,
                 upload_dir=upload_dir,
             )
@@ -137,34 +224,63 @@ def import_pictures(source_dir: Path, dry_run: bool = False, replace_existing: b
             if existing_image_found and not replace_existing:
                 skipped_existing += 1
                 continue
-
-            safe_barcode = secure_filename(product.barcode) if product.barcode else "product"
-            new_filename = f"{safe_barcode}-{uuid4().hex[:12]}.jpg"
-            destination = upload_dir / new_filename
-            image_url = f"/static/uploads/products/{new_filename}"
-
-            if existing_image_found and old_image_path and not dry_run:
-                old_image_path.unlink(missing_ok=True)
-                deleted_old += 1
+            if existing_image_found:
+                old_images.add(current_image)
+            selected.append((image_path, barcode, current_image))
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            hashed = dict(zip((item[0] for item in selected), executor.map(hash_source, (item[0] for item in selected))))
+
+            # one copy per distinct content; the rest (and content already in the folder) reuse it
+            to_copy: dict[str, tuple[SourceImage, Path]] = {}
+            for source in hashed.values():
+                destination = upload_dir / f"{source.digest}.jpg"
+                if source.digest in to_copy or destination.exists():
+                    reused += 1
+                    saved_bytes += source.size
+                    continue
+                to_copy[source.digest] = (source, destination)
 
             if not dry_run:
-                shutil.copy2(image_path, destination)
-                copied += 1
-
-            if product.image != image_url:
-                product.image = image_url
-                updated += 1
+                # thumbnails for the product list, see sstq/image_variants.py (skipped without Pillow)
+                widths = app.config["IMAGE_VARIANT_WIDTHS"] if variants_available() else ()
+                quality = app.config["IMAGE_VARIANT_QUALITY"]
+                for _ in executor.map(lambda item: copy_into_store(*item, widths, quality), to_copy.values()):
+                    pass
+            copied = len(to_copy)
+            copied_bytes = sum(source.size for source, _ in to_copy.values())
+
+        updates: list[dict] = []
+        blobs: dict[str, dict] = {}
+        for image_path, barcode, current_image in selected:
+            source = hashed[image_path]
+            image_url = blob_url("products", source.digest, "jpg")
+            blobs[image_url] = {"url": image_url, "sha256": source.digest, "size": source.size}
+            if current_image != image_url:
+                updates.append({"product_barcode": barcode, "new_image": image_url})
+        updated = len(updates)
 
         if not dry_run:
+            # the store rows go in first so the reference triggers count the product updates
+            register_blobs(list(blobs.values()))
             db.session.commit()
+            update_product_images(updates, max(1, batch_size))
+            for image_value in old_images:
+                if release(image_value):
+                    deleted_old += 1
 
-    total = len(iter_image_files(source_dir))
+    elapsed = time.perf_counter() - started
     mode = "DRY RUN" if dry_run else "Done"
+    copy_verb = "would copy" if dry_run else "copied"
     print(
-        f"{mode}. scanned={total}, copied={copied}, "
+        f"{mode}. scanned={len(image_files)}, copied={copied}, reused={reused}, "
         f"products_updated={updated}, skipped_existing={skipped_existing}, "
         f"deleted_old={deleted_old}, missing={len(missing_barcodes)}"
     )
+    print(
+        f"Storage: {copy_verb} {_format_bytes(copied_bytes)}, deduplication saves {_format_bytes(saved_bytes)} "
+        f"({elapsed:.1f}s, {_format_bytes((copied_bytes + saved_bytes) / max(elapsed, 1e-9))}/s hashed)"
+    )
     if missing_barcodes:
         print("Missing Product.barcode for files:")
         for barcode in sorted(set(missing_barcodes)):
@@ -192,6 +308,18 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Replace existing Product.image and delete old image files if they exist.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Threads that hash and copy the files (default: {DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Products updated per statement and commit (default: {DEFAULT_BATCH_SIZE}).",
+    )
     return parser.parse_args()
 
 
@@ -205,6 +333,8 @@ def main() -> None:
         source_dir=source_dir,
         dry_run=args.dry_run,
         replace_existing=args.replace_existing,
+        workers=args.workers,
+        batch_size=args.batch_size,
     )
 
 
@@ -0,0 +1,173 @@
+# point-in-time copies of the SQLite database made with the online backup API
+# pages are copied a batch at a time with a pause in between, so the app keeps writing while a snapshot is
+# taken; SQLite restarts the copy if another connection writes mid-way, so the finished file is always a
+# consistent image of one moment. Restarts and total time are capped, so a busy database fails the snapshot
+# instead of keeping it running forever. In WAL mode readers do not block writers, so the copy is made in one
+# step there and never restarts. Snapshots are checked with 'PRAGMA integrity_check' before they count.
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from flask import current_app
+
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".db"
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_dir():
+    configured = current_app.config.get("SNAPSHOT_DIR") or ""
+    return Path(configured) if configured else Path(current_app.instance_path) / "snapshots"
+
+
+def list_snapshots(directory):
+    """Finished snapshots, newest first."""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    snapshots = []
+    for path in directory.glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"):
+        stamp = path.name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+        try:
+            taken_at = datetime.strptime(stamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+        snapshots.append((taken_at, path))
+    return [path for _, path in sorted(snapshots, reverse=True)]
+
+
+def verify_snapshot(path):
+    """Run 'PRAGMA integrity_check' on a snapshot. Returns the list of reported problems (empty when ok)."""
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as connection:
+            results = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as exc:
+        # badly damaged files fail before the check can report anything
+        return [str(exc)]
+    return [] if results == ["ok"] else results
+
+
+def take_snapshot(
+    db_path,
+    directory,
+    pages_per_step=1024,
+    step_sleep=0.05,
+    now=None,
+    progress=None,
+    max_restarts=10,
+    timeout=600,
+):
+    """Copy `db_path` into a new verified snapshot file in `directory` and return its path.
+
+    Raises SnapshotError when the copy had to start over more than `max_restarts` times or took longer than
+    `timeout` seconds.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    now = now or datetime.now(timezone.utc)
+    target = directory / f"{SNAPSHOT_PREFIX}{now.strftime(TIMESTAMP_FORMAT)}{SNAPSHOT_SUFFIX}"
+    partial = target.with_name(target.name + ".partial")
+    if target.exists():
+        raise SnapshotError(f"Snapshot {target.name} already exists.")
+    partial.unlink(missing_ok=True)
+
+    deadline = time.monotonic() + timeout
+    state = {"copied": 0, "restarts": 0}
+
+    def report(status, remaining, total):
+        copied = total - remaining
+        # every step copies at least one page, so no progress means the copy went back to the first page
+        if 0 < copied <= state["copied"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise SnapshotError(
+                    f"Snapshot restarted {state['restarts']} times because the database kept changing."
+                )
+        state["copied"] = copied
+        if time.monotonic() > deadline:
+            raise SnapshotError(f"Snapshot did not finish within {timeout:g} seconds.")
+        if progress:
+            progress(copied, total)
+
+    try:
+        with closing(sqlite3.connect(db_path)) as source, closing(sqlite3.connect(partial)) as destination:
+            if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                # one read transaction over the whole copy: writers carry on into the WAL and nothing restarts
+                pages_per_step = -1
+            source.backup(destination, pages=pages_per_step, progress=report, sleep=step_sleep)
+            # the copy inherits WAL mode from the source; a snapshot should be one self-contained file
+            destination.execute("PRAGMA journal_mode=DELETE")
+
+        problems = verify_snapshot(partial)
+        if problems:
+            raise SnapshotError(f"Snapshot failed integrity_check: {'; '.join(problems[:5])}")
+
+        with open(partial, "rb") as handle:
+            os.fsync(handle.fileno())
+        os.replace(partial, target)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return target
+
+
+def prune_snapshots(directory, keep=7, retention_days=30, now=None):
+    """Delete snapshots beyond the newest `keep` that are older than `retention_days`.
+
+    The newest snapshot is never deleted. Returns the removed paths.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=retention_days)
+    removed = []
+    for index, path in enumerate(list_snapshots(directory)):
+        if index == 0 or index < keep:
+            continue
+        stamp = path.name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+        taken_at = datetime.strptime(stamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+        if taken_at < cutoff:
+            path.unlink()
+            removed.append(path)
+    return removed
+
+
+def database_file(engine):
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        raise SnapshotError("Snapshots need a file-based SQLite database.")
+    return database
+
+
+def snapshot_now(engine, now=None, progress=None):
+    """Take, verify and rotate one snapshot using the app's SNAPSHOT_* settings."""
+    config = current_app.config
+    started = time.perf_counter()
+    directory = snapshot_dir()
+    path = take_snapshot(
+        database_file(engine),
+        directory,
+        pages_per_step=config.get("SNAPSHOT_PAGES_PER_STEP", 1024),
+        step_sleep=config.get("SNAPSHOT_STEP_SLEEP", 0.05),
+        now=now,
+        progress=progress,
+        max_restarts=config.get("SNAPSHOT_MAX_RESTARTS", 10),
+        timeout=config.get("SNAPSHOT_TIMEOUT_SECONDS", 600),
+    )
+    removed = prune_snapshots(
+        directory,
+        keep=config.get("SNAPSHOT_KEEP", 7),
+        retention_days=config.get("SNAPSHOT_RETENTION_DAYS", 30),
+        now=now,
+    )
+    return {
+        "path": path,
+        "bytes": path.stat().st_size,
+        "seconds": time.perf_counter() - started,
+        "removed": removed,
+    }
@@ -0,0 +1,128 @@
+# opt-in per-request SQL instrumentation (SQL_INSTRUMENTATION=1)
+# every statement executed while a request is active is timed and grouped by its "shape" (the statement with
+# literals and IN-lists collapsed). Requests that run too many or too slow queries are logged, repeated
+# SELECT shapes are reported as likely N+1 lazy loads, and a Server-Timing header is added to the response.
+import re
+from collections import Counter
+from time import perf_counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# kept on the statement's execution context, so a statement that raises leaves nothing behind on the connection
+START_TIME_ATTRIBUTE = "_sstq_sql_started"
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|:\w+|\[POSTCOMPILE_\w+\]|__\[POSTCOMPILE_\w+\])\s*,?)+\)", re.IGNORECASE)
+
+
+def statement_shape(statement):
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _IN_LIST.sub("IN (...)", shape)
+
+
+class RequestSqlStats:
+    def __init__(self):
+        self.query_count = 0
+        self.total_seconds = 0.0
+        self.shapes = Counter()
+        self.shape_seconds = Counter()
+
+    def record(self, statement, elapsed):
+        shape = statement_shape(statement)
+        self.query_count += 1
+        self.total_seconds += elapsed
+        self.shapes[shape] += 1
+        self.shape_seconds[shape] += elapsed
+
+    @property
+    def total_ms(self):
+        return self.total_seconds * 1000
+
+    def repeated_shapes(self, threshold):
+        return [
+            (shape, count, self.shape_seconds[shape] * 1000)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold and shape.upper().startswith("SELECT")
+        ]
+
+
+def _record(statement, context):
+    started = getattr(context, START_TIME_ATTRIBUTE, None)
+    if started is None:
+        return
+    delattr(context, START_TIME_ATTRIBUTE)
+    elapsed = perf_counter() - started
+
+    if has_request_context():
+        stats = g.get("sql_stats")
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        setattr(context, START_TIME_ATTRIBUTE, perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(statement, context)
+
+
+def _handle_error(exception_context):
+    # failed statements (a lock timeout, a constraint error) spent their time in SQL as well
+    _record(exception_context.statement or "", exception_context.execution_context)
+
+
+def _start_request():
+    g.sql_stats = RequestSqlStats()
+
+
+def _finish_request(app, response):
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+
+    route = f"{request.method} {request.path} (endpoint={request.endpoint})"
+    slow_ms = app.config.get("SQL_SLOW_REQUEST_MS", 200)
+    query_threshold = app.config.get("SQL_QUERY_COUNT_THRESHOLD", 30)
+    repeat_threshold = app.config.get("SQL_N_PLUS_ONE_THRESHOLD", 5)
+
+    if stats.total_ms >= slow_ms or stats.query_count >= query_threshold:
+        app.logger.warning(
+            "SQL-heavy request %s: %d queries, %.1f ms in SQL, %d distinct statements",
+            route,
+            stats.query_count,
+            stats.total_ms,
+            len(stats.shapes),
+        )
+
+    for shape, count, shape_ms in stats.repeated_shapes(repeat_threshold):
+        app.logger.warning(
+            "Likely N+1 in %s: statement ran %d times (%.1f ms): %s",
+            route,
+            count,
+            shape_ms,
+            shape[:300],
+        )
+
+    timing = f'sql;dur={stats.total_ms:.2f};desc="{stats.query_count} queries"'
+    existing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+    return response
+
+
+def install_sql_instrumentation(app, engine):
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return False
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(app, response))
+    return True
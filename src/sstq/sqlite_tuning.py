@@ -0,0 +1,81 @@
+# SQLite connection tuning: the selected profile's PRAGMAs are applied to every new DBAPI connection
+# through a SQLAlchemy 'connect' event, so pooled connections, job threads and scripts all behave the same
+from sqlalchemy import event
+
+EXTENSION_KEY = "sstq_sqlite_pragmas"
+
+# pragma values are written into 'PRAGMA name=value' as-is, so keep them to plain keywords and integers
+SQLITE_PROFILES = {
+    # leave SQLite's defaults untouched (rollback journal, synchronous=FULL, foreign keys off)
+    "default": {},
+    "production": {
+        # WAL lets readers continue while a mission submission is writing
+        "journal_mode": "WAL",
+        # with WAL, NORMAL only syncs at checkpoints; a power loss can drop the last commits but never corrupts
+        "synchronous": "NORMAL",
+        # wait for a competing writer instead of failing straight away with "database is locked"
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        # negative values are KiB, so this is a 64 MiB page cache per connection
+        "cache_size": -64 * 1024,
+        "foreign_keys": "ON",
+        "temp_store": "MEMORY",
+    },
+}
+
+# read back for the startup report; journal_mode is persistent and reported by the database itself
+REPORTED_PRAGMAS = ["journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "foreign_keys", "temp_store"]
+
+
+def resolve_pragmas(config):
+    profile_name = (config.get("SQLITE_TUNING_PROFILE") or "default").strip().lower()
+    if profile_name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_TUNING_PROFILE '{profile_name}'. Use one of: {', '.join(SQLITE_PROFILES)}.")
+
+    pragmas = dict(SQLITE_PROFILES[profile_name])
+    pragmas.update(config.get("SQLITE_PRAGMA_OVERRIDES") or {})
+    return profile_name, pragmas
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def pragmas_in_effect(connection):
+    values = {}
+    for name in REPORTED_PRAGMAS:
+        row = connection.exec_driver_sql(f"PRAGMA {name}").fetchone()
+        values[name] = row[0] if row else None
+    return values
+
+
+def install_sqlite_tuning(app, engine):
+    if engine.dialect.name != "sqlite":
+        return None
+
+    profile_name, pragmas = resolve_pragmas(app.config)
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_pragmas(dbapi_connection, pragmas)
+
+    # only what was asked for: reading back what is in effect needs a connection, see pragma_report()
+    app.extensions[EXTENSION_KEY] = {"profile": profile_name, "requested": pragmas}
+    return pragmas
+
+
+def pragma_report(app, engine):
+    """The app's profile and the PRAGMA values a new connection really has, or None for other databases.
+
+    Opens a connection, so it is meant for a startup report (main.py) rather than every create_app().
+    """
+    settings = app.extensions.get(EXTENSION_KEY)
+    if settings is None:
+        return None
+    with engine.connect() as connection:
+        return {"profile": settings["profile"], "pragmas": pragmas_in_effect(connection)}
@@ -43,6 +43,9 @@ const EDITOR_CONFIG = {
       { name: "rationale", label: "Rationale", placeholder: "Checked against latest certificates", multiline: true },
     ],
     textareaId: "claim_rows",
+    // existing claims send their id back, so an edited claim keeps it (and its issue reports)
+    idField: "claim_id",
+    idInputId: "claim_ids",
     listId: "claim-list",
     scriptId: "claim-items",
     title: (row, index) => row.claim_type || `Claim Row ${index + 1}`,
@@ -256,15 +259,17 @@ function renderEditor(type) {
   if (!list || !textarea) return;
 
   const fieldNames = config.fields.map((field) => field.name);
-  const rows = parseItems(config.scriptId, fieldNames);
+  const rows = parseItems(config.scriptId, config.idField ? [...fieldNames, config.idField] : fieldNames);
+  const idInput = config.idInputId ? document.getElementById(config.idInputId) : null;
   const state = rows.length ? rows : [Object.fromEntries(fieldNames.map((name) => [name, ""]))];
   let expandedIndex = null;
 
   const syncTextarea = () => {
-    textarea.value = state
-      .filter((row) => config.fields.some((field) => String(row[field.name] || "").trim() !== ""))
-      .map((row) => buildRowText(config, row))
-      .join("\n");
+    const filledRows = state.filter((row) => config.fields.some((field) => String(row[field.name] || "").trim() !== ""));
+    textarea.value = filledRows.map((row) => buildRowText(config, row)).join("\n");
+    if (idInput) {
+      idInput.value = filledRows.map((row) => row[config.idField] || "").join(",");
+    }
   };
 
   const renderRows = () => {
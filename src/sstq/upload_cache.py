@@ -0,0 +1,134 @@
+# temporary uploads in 'static/uploads/cache' and 'cache/evidence'
+# the add/edit pages upload images and PDFs here first and only move them into the store when the product is
+# saved, so an abandoned edit leaves its files behind. Each temp upload gets a 'pending_uploads' row, pages
+# that still show the file refresh it and promoting the file removes it.
+# The sweeper deletes cache files older than UPLOAD_CACHE_TTL_HOURS unless their row was refreshed within
+# that time. It runs on the job runner every UPLOAD_CACHE_SWEEP_SECONDS and from 'scripts/sweep_upload_cache.py'.
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import NamedTuple
+
+from flask import current_app
+
+from sstq.extensions import db
+from sstq.jobs import job_handler
+from sstq.models import PendingUpload
+from sstq.upload_store import URL_PREFIX
+
+CACHE_FOLDERS = ("cache", "cache/evidence")
+
+
+class SweepResult(NamedTuple):
+    expired: int
+    removed: int
+    kept: int
+    bytes_reclaimed: int
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def track_pending_upload(url, user_id=None):
+    """Record a new temp upload, or refresh it when the URL is already known. The caller commits."""
+    now = _utcnow()
+    pending = db.session.get(PendingUpload, url)
+    if pending is None:
+        db.session.add(PendingUpload(url=url, user_id=user_id, created_at=now, last_seen_at=now))
+    else:
+        pending.last_seen_at = now
+
+
+def touch_pending_uploads(urls):
+    """Keep temp uploads that a page is showing again away from the sweeper. The caller commits."""
+    urls = [url for url in urls if url]
+    if urls:
+        PendingUpload.query.filter(PendingUpload.url.in_(urls)).update(
+            {"last_seen_at": _utcnow()}, synchronize_session=False
+        )
+
+
+def forget_pending_uploads(urls):
+    urls = [url for url in urls if url]
+    if urls:
+        PendingUpload.query.filter(PendingUpload.url.in_(urls)).delete(synchronize_session=False)
+
+
+def _iter_expired_files(static_folder, modified_before):
+    """(url, path, size) of the regular files in the cache folders last modified before the given time."""
+    uploads_root = Path(static_folder) / "uploads"
+    for folder in CACHE_FOLDERS:
+        try:
+            entries = os.scandir(uploads_root / folder)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                # 'cache/evidence' is scanned on its own, and nothing here should be a link
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime < modified_before:
+                    yield f"{URL_PREFIX}{folder}/{entry.name}", entry.path, stat.st_size
+
+
+def sweep_upload_cache(ttl_hours, *, batch_size=500, dry_run=False, static_folder=None, progress=None):
+    """Delete temp uploads that are older than `ttl_hours` and no longer shown by any page.
+
+    Files are checked against 'pending_uploads' a batch at a time; `progress(files_in_batch)` is called after
+    each batch. With `dry_run` nothing is deleted, but the result reports what would have been.
+    """
+    static_folder = static_folder or current_app.static_folder
+    ttl = timedelta(hours=ttl_hours)
+    seen_after = _utcnow() - ttl
+    expired_files = _iter_expired_files(static_folder, time.time() - ttl.total_seconds())
+
+    expired_count = removed = kept = reclaimed = 0
+    while batch := list(islice(expired_files, max(1, batch_size))):
+        in_use = {
+            row[0]
+            for row in db.session.query(PendingUpload.url).filter(
+                PendingUpload.url.in_([url for url, _, _ in batch]),
+                PendingUpload.last_seen_at >= seen_after,
+            )
+        }
+        for url, path, size in batch:
+            if url in in_use:
+                kept += 1
+                continue
+            if not dry_run:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+            removed += 1
+            reclaimed += size
+        expired_count += len(batch)
+        if progress is not None:
+            progress(len(batch))
+
+    if not dry_run:
+        # rows that outlived their TTL belong to files that are gone now (or were never written)
+        PendingUpload.query.filter(PendingUpload.last_seen_at < seen_after).delete(synchronize_session=False)
+        db.session.commit()
+    return SweepResult(expired_count, removed, kept, reclaimed)
+
+
+@job_handler("sweep_upload_cache", every="UPLOAD_CACHE_SWEEP_SECONDS")
+def sweep_upload_cache_job(job):
+    result = sweep_upload_cache(
+        current_app.config["UPLOAD_CACHE_TTL_HOURS"],
+        batch_size=job.batch_size,
+        progress=job.advance,
+    )
+    job.advance(0, message=f"Removed {result.removed} cached uploads, {result.bytes_reclaimed} bytes reclaimed")
+    current_app.logger.info(
+        "Upload cache sweep: expired=%d removed=%d kept=%d bytes_reclaimed=%d",
+        result.expired, result.removed, result.kept, result.bytes_reclaimed,
+    )
@@ -0,0 +1,185 @@
+# content-addressed store for uploaded files (product images, evidence PDFs)
+# each distinct file is kept once as 'static/uploads/<folder>/<sha256>.<ext>' with a row in 'stored_blobs'.
+# Triggers on products.image and evidence.file_reference keep the row's ref_count current, so routes, scripts
+# and restores are all counted the same way. Storing content that is already there only drops the new copy,
+# and a blob's file is removed once nothing references it any more.
+# Files saved before the store existed ('<barcode>-<random>' names) have no row; they are removed once no
+# product or evidence row uses them.
+import hashlib
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import DateTime, bindparam, text
+
+from sstq.extensions import db
+
+BLOB_TABLE = "stored_blobs"
+# table -> column holding an upload URL
+REFERENCE_COLUMNS = {
+    "products": "image",
+    "evidence": "file_reference",
+}
+URL_PREFIX = "/static/uploads/"
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def _reference_count_sql(url_expression):
+    return " + ".join(
+        f"(SELECT COUNT(*) FROM {table} WHERE {column} = {url_expression})"
+        for table, column in REFERENCE_COLUMNS.items()
+    )
+
+
+def reference_trigger_statements():
+    """Triggers that count references to stored blobs. URLs without a blob row match nothing."""
+    statements = []
+    for table, column in REFERENCE_COLUMNS.items():
+        increment = f"UPDATE {BLOB_TABLE} SET ref_count = ref_count + 1 WHERE url = NEW.{column};"
+        decrement = f"UPDATE {BLOB_TABLE} SET ref_count = ref_count - 1 WHERE url = OLD.{column};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_ref_insert AFTER INSERT ON {table} "
+            f"WHEN NEW.{column} IS NOT NULL BEGIN {increment} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_ref_update AFTER UPDATE OF {column} ON {table} "
+            f"WHEN OLD.{column} IS NOT NEW.{column} BEGIN {decrement} {increment} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_ref_delete AFTER DELETE ON {table} "
+            f"WHEN OLD.{column} IS NOT NULL BEGIN {decrement} END",
+        ]
+    return statements
+
+
+def drop_reference_trigger_statements():
+    """Bulk restores load the counts as they were and drop these while loading, then recount."""
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_blob_ref_{operation}"
+        for table in REFERENCE_COLUMNS
+        for operation in ("insert", "update", "delete")
+    ]
+
+
+def recount_statement():
+    return f"UPDATE {BLOB_TABLE} SET ref_count = {_reference_count_sql(f'{BLOB_TABLE}.url')}"
+
+
+def hash_file(path):
+    """(sha256 hex digest, size in bytes) of a file, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as handle:
+        while chunk := handle.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def blob_url(folder, digest, extension):
+    return f"{URL_PREFIX}{folder}/{digest}.{extension}"
+
+
+def resolve_upload_path(url, static_folder=None):
+    """Path of an upload URL inside 'static/uploads', or None for anything else (external URLs, '..')."""
+    url_path = urlparse(str(url or "")).path
+    if not url_path.startswith(URL_PREFIX):
+        return None
+    static_root = Path(static_folder or current_app.static_folder).resolve()
+    candidate = (static_root / url_path.removeprefix("/static/")).resolve()
+    try:
+        candidate.relative_to(static_root / "uploads")
+    except ValueError:
+        return None
+    return candidate
+
+
+def place_file(source, target, move=False):
+    """Put a file at its blob path. Copies go through a temporary name so a blob is never half written."""
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if move:
+        os.replace(source, target)
+        return
+    partial = target.with_name(f".{target.name}.partial")
+    shutil.copy2(source, partial)
+    os.replace(partial, target)
+
+
+def register_blobs(rows):
+    """Add store rows for [{'url', 'sha256', 'size'}] that do not exist yet.
+
+    A new row starts at the number of rows already referencing its URL, so files that were in place before
+    they were registered are counted correctly. The caller commits.
+    """
+    if not rows:
+        return
+    statement = text(
+        f"INSERT INTO {BLOB_TABLE} (url, sha256, size, ref_count, created_at) "
+        f"VALUES (:url, :sha256, :size, {_reference_count_sql(':url')}, :created_at) "
+        "ON CONFLICT (url) DO NOTHING"
+    ).bindparams(bindparam("created_at", type_=DateTime()))
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.session.execute(statement, [{**row, "created_at": created_at} for row in rows])
+
+
+def store_file(source, *, folder, extension, move=True, hashed=None):
+    """Add a file to the store. Returns (url, created); `created` is False when the content was already there.
+
+    With `move` the source is renamed into place (or deleted when the content is already stored), so it has
+    to be on the same filesystem as the uploads folder. `hashed` is the (digest, size) of the source when the
+    caller already has it. The caller commits.
+    """
+    digest, size = hashed or hash_file(source)
+    url = blob_url(folder, digest, extension)
+    target = resolve_upload_path(url)
+    # the row goes in before the file is checked: the insert takes SQLite's write lock (even when the row is
+    # already there) until the caller commits, and release() deletes the row and the file under that same lock.
+    # A release that got there first has already removed the file, so it is placed again below.
+    register_blobs([{"url": url, "sha256": digest, "size": size}])
+    created = not target.exists()
+    if created:
+        place_file(source, target, move=move)
+    elif move:
+        Path(source).unlink(missing_ok=True)
+    return url, created
+
+
+def _is_referenced(url):
+    return any(
+        db.session.execute(text(f"SELECT 1 FROM {table} WHERE {column} = :url LIMIT 1"), {"url": url}).first()
+        for table, column in REFERENCE_COLUMNS.items()
+    )
+
+
+def release(url):
+    """Remove the file behind an upload URL if nothing references it any more. Returns the bytes freed.
+
+    Call it after the change that dropped the reference is committed. For a blob the row is deleted first,
+    and only when its count is zero at that moment; the file goes before that delete is committed, so a
+    concurrent store_file() of the same content either waits for both or keeps the blob.
+    """
+    from sstq.image_variants import delete_variants
+
+    path = resolve_upload_path(url)
+    if path is None:
+        return 0
+
+    has_row = db.session.execute(text(f"SELECT 1 FROM {BLOB_TABLE} WHERE url = :url"), {"url": url}).first()
+    if has_row:
+        deleted = db.session.execute(
+            text(f"DELETE FROM {BLOB_TABLE} WHERE url = :url AND ref_count <= 0"), {"url": url}
+        ).rowcount
+        if not deleted:
+            db.session.commit()
+            return 0
+    elif _is_referenced(url):
+        return 0
+
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        size = 0
+    path.unlink(missing_ok=True)
+    delete_variants(path)
+    db.session.commit()
+    return size
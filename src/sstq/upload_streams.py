@@ -0,0 +1,130 @@
+# streamed, size-limited uploads for the helper upload endpoints
+# Werkzeug normally spools every uploaded file into a SpooledTemporaryFile, and 'FileStorage.save()' then
+# copies it again. For views wrapped in '@streamed_upload(kind, subdir)' each file part is written straight
+# to a '.partial' file in its destination folder instead. The part is hashed as it arrives, capped at the
+# type's size limit (UPLOAD_MAX_IMAGE_BYTES / UPLOAD_MAX_PDF_BYTES) and checked against the type's magic
+# bytes once the first bytes are in. A Content-Length above the limit is refused before the body is read.
+# The view moves the part into place; parts it leaves behind are deleted when the request is closed.
+import hashlib
+import io
+from functools import wraps
+from pathlib import Path
+from typing import NamedTuple
+from uuid import uuid4
+
+from flask import Request, current_app, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# kind -> config key with its size limit in bytes
+LIMIT_KEYS = {
+    "image": "UPLOAD_MAX_IMAGE_BYTES",
+    "pdf": "UPLOAD_MAX_PDF_BYTES",
+}
+# multipart boundaries, part headers and the small fields (barcode) sent next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+SNIFF_BYTES = 12
+
+
+class UploadPolicy(NamedTuple):
+    kind: str
+    max_bytes: int
+    directory: Path
+
+
+def _describe_size(size):
+    return f"{size / (1024 * 1024):.0f} MB" if size >= 1024 * 1024 else f"{size // 1024} KB"
+
+
+def sniff_extension(head, kind):
+    """File extension matching the magic bytes at the start of a file, or None when they do not fit `kind`."""
+    if kind == "pdf":
+        return "pdf" if head.startswith(b"%PDF-") else None
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class StreamedPart(io.BufferedRandom):
+    """Writable file for one multipart file part. Enforces the size limit and the signature while it is written."""
+
+    def __init__(self, path, policy):
+        super().__init__(io.FileIO(path, "w+"))
+        self.path = Path(path)
+        self.policy = policy
+        self.size = 0
+        self.extension = None
+        self.sha256 = hashlib.sha256()
+        self._head = b""
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.policy.max_bytes:
+            raise RequestEntityTooLarge(f"File is larger than the {_describe_size(self.policy.max_bytes)} limit.")
+        if self.extension is None and len(self._head) < SNIFF_BYTES:
+            self._head = (self._head + data)[:SNIFF_BYTES]
+            if len(self._head) == SNIFF_BYTES:
+                self.check_signature()
+        self.sha256.update(data)
+        return super().write(data)
+
+    def check_signature(self):
+        """Also called once the part is complete, for files shorter than the sniffed prefix."""
+        if self.extension is None:
+            self.extension = sniff_extension(self._head, self.policy.kind)
+            if self.extension is None:
+                raise UnsupportedMediaType(f"File content is not a valid {self.policy.kind.upper()}.")
+        return self.extension
+
+
+class UploadRequest(Request):
+    # set by '@streamed_upload' before the form is parsed; other requests keep Werkzeug's spooled files
+    upload_policy = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        policy = self.upload_policy
+        if policy is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        policy.directory.mkdir(parents=True, exist_ok=True)
+        part = StreamedPart(policy.directory / f".{uuid4().hex}.partial", policy)
+        self.__dict__.setdefault("_streamed_parts", []).append(part)
+        return part
+
+    def close(self):
+        super().close()
+        # parts that failed half way are not in 'files', and parts the view did not move are still there
+        for part in self.__dict__.get("_streamed_parts", ()):
+            part.close()
+            part.path.unlink(missing_ok=True)
+
+
+def claim_upload(file_storage):
+    """(path, size, extension, sha256 hex) of a streamed file; the caller moves the file to its final name."""
+    part = file_storage.stream
+    part.flush()
+    return part.path, part.size, part.check_signature(), part.sha256.hexdigest()
+
+
+def streamed_upload(kind, subdir):
+    """Stream the file parts of this view into 'static/uploads/<subdir>' and answer size or type errors as JSON."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(*args, **kwargs):
+            max_bytes = current_app.config[LIMIT_KEYS[kind]]
+            directory = Path(current_app.static_folder) / "uploads" / subdir
+            try:
+                if request.content_length is not None and request.content_length > max_bytes + FORM_OVERHEAD_BYTES:
+                    raise RequestEntityTooLarge(f"File is larger than the {_describe_size(max_bytes)} limit.")
+                request.upload_policy = UploadPolicy(kind, max_bytes, directory)
+                # parse now, so limit and signature errors are answered here rather than inside the view
+                for file_storage in request.files.values():
+                    if isinstance(file_storage.stream, StreamedPart) and file_storage.filename:
+                        file_storage.stream.check_signature()
+            except (RequestEntityTooLarge, UnsupportedMediaType) as exc:
+                return jsonify({"success": False, "message": exc.description}), exc.code
+            return view_func(*args, **kwargs)
+        return wrapped_view
+    return decorator
@@ -0,0 +1,11 @@
+# WSGI entry point for a pre-fork server, e.g.
+#   gunicorn -c src/sstq/gunicorn_conf.py sstq.wsgi:app
+# main.py keeps using app.run() for local development
+from sstq import create_app
+from sstq.migrations import ensure_schema
+
+app = create_app()
+
+# with preload_app this runs once in the gunicorn master, before any worker is forked
+with app.app_context():
+    ensure_schema()
@@ -1,3 +1,5 @@
+import pytest
+
 from sstq.extensions import db
 from sstq.models import User
 
@@ -42,3 +44,237 @@ def test_admin_can_create_user(admin_client, app_instance):
         saved_user = User.query.filter_by(username="created-user").first()
         assert saved_user is not None
         assert saved_user.role == "consumer"
+
+
+def test_archive_moves_old_logs_and_export_includes_them(admin_client, app_instance, tmp_path):
+    from datetime import datetime, timedelta
+
+    from sstq.changelog_archive import archive_change_logs, archive_summary
+    from sstq.models import ChangeLog
+
+    app_instance.config["CHANGELOG_ARCHIVE_DIR"] = str(tmp_path / "archive")
+    app_instance.config["CHANGELOG_SEGMENT_MAX_BYTES"] = 1
+
+    with app_instance.app_context():
+        admin = User.query.filter_by(username="admin").first()
+        db.session.add_all(
+            [
+                ChangeLog(
+                    user_id=admin.user_id,
+                    timestamp=datetime.utcnow() - timedelta(days=400),
+                    change_summary="Very old change.",
+                ),
+                ChangeLog(
+                    user_id=admin.user_id,
+                    timestamp=datetime.utcnow() - timedelta(days=200),
+                    change_summary="Old change.",
+                ),
+                ChangeLog(user_id=admin.user_id, change_summary="Recent change."),
+            ]
+        )
+        db.session.commit()
+
+        assert archive_change_logs(retention_days=300) == 1
+        assert archive_change_logs(retention_days=90) == 1
+        assert ChangeLog.query.count() == 1
+        # a tiny segment limit forces a rollover on every archive run
+        assert archive_summary()["segments"] == 2
+        assert archive_summary()["rows"] == 2
+
+    response = admin_client.get("/admin/logs/download")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert "Recent change." in body
+    assert "Old change." in body
+    assert "Very old change." in body
+
+    cutoff = (datetime.utcnow() - timedelta(days=300)).strftime("%Y-%m-%d")
+    response = admin_client.get(f"/admin/logs/download?source=archive&since={cutoff}")
+    body = response.get_data(as_text=True)
+
+    assert "Old change." in body
+    assert "Very old change." not in body
+    assert "Recent change." not in body
+
+
+def test_clear_logs_keeps_history_in_archive(admin_client, app_instance, tmp_path):
+    from datetime import datetime, timedelta
+
+    from sstq.changelog_archive import archive_summary
+    from sstq.models import ChangeLog
+
+    app_instance.config["CHANGELOG_ARCHIVE_DIR"] = str(tmp_path / "archive")
+    admin_client.post(
+        "/admin/users/create",
+        data={"username": "logged-user", "password": "1234", "role": "consumer"},
+    )
+    with app_instance.app_context():
+        # a clock skewed ahead must not let a row skip the archive
+        admin = User.query.filter_by(username="admin").first()
+        db.session.add(
+            ChangeLog(
+                user_id=admin.user_id,
+                timestamp=datetime.utcnow() + timedelta(hours=1),
+                change_summary="Skewed clock.",
+            )
+        )
+        db.session.commit()
+
+    response = admin_client.post("/admin/logs/clear", follow_redirects=True)
+
+    assert response.status_code == 200
+    with app_instance.app_context():
+        assert ChangeLog.query.count() == 0
+        assert archive_summary()["rows"] == 2
+
+
+def test_delete_user_runs_as_batched_job(admin_client, app_instance, tmp_path):
+    from sstq.changelog_archive import iter_archived_logs
+    from sstq.models import Badge, ChangeLog, Job, Mission, Player
+
+    app_instance.config["JOB_BATCH_SIZE"] = 2
+    app_instance.config["CHANGELOG_ARCHIVE_DIR"] = str(tmp_path / "archive")
+    with app_instance.app_context():
+        user = User(username="busy-player", role="consumer")
+        user.set_password("1234")
+        db.session.add(user)
+        db.session.flush()
+        player = Player(user_id=user.user_id, points=40)
+        db.session.add(player)
+        db.session.flush()
+        for index in range(5):
+            db.session.add(
+                Mission(
+                    player_id=player.player_id,
+                    tier="easy",
+                    question=f"Question {index}",
+                    player_answer="",
+                    answer="A",
+                    all_answers="A,B",
+                    explanation="Because.",
+                )
+            )
+        db.session.add(Badge(player_id=player.player_id, name="Quest Starter", tier="easy"))
+        db.session.add_all([ChangeLog(user_id=user.user_id, change_summary=f"Edit {index}.") for index in range(2)])
+        db.session.commit()
+        user_id = user.user_id
+
+    response = admin_client.post(f"/admin/users/{user_id}/delete", follow_redirects=True)
+
+    assert response.status_code == 200
+    with app_instance.app_context():
+        assert db.session.get(User, user_id) is None
+        assert Mission.query.count() == 0
+        assert Badge.query.count() == 0
+        job = Job.query.filter_by(job_type="delete_user").one()
+        assert job.status == "succeeded"
+        assert job.progress_total == 8
+        assert job.progress_current == 8
+        assert ChangeLog.query.filter_by(user_id=user_id).count() == 0
+        # the deleted user's history is archived under their name instead of being dropped
+        archived = [record for record in iter_archived_logs() if record["user_id"] == user_id]
+        assert sorted(record["change_summary"] for record in archived) == ["Edit 0.", "Edit 1."]
+        assert {record["username"] for record in archived} == {"busy-player"}
+
+    response = admin_client.get("/admin/jobs")
+    assert response.status_code == 200
+    assert b"delete_user" in response.data
+
+
+@pytest.fixture
+def register_job_handler():
+    from sstq import jobs
+
+    registered = []
+
+    def register(job_type):
+        registered.append(job_type)
+        return jobs.job_handler(job_type)
+
+    yield register
+    for job_type in registered:
+        jobs._handlers.pop(job_type, None)
+
+
+def test_failed_job_is_retried_then_marked_failed(admin_client, app_instance, register_job_handler):
+    from sstq.jobs import enqueue_job
+    from sstq.models import Job
+
+    calls = []
+
+    @register_job_handler("always_fails")
+    def _always_fails(job):
+        calls.append(job.job_id)
+        raise RuntimeError("boom")
+
+    with app_instance.app_context():
+        job_id = enqueue_job("always_fails", max_attempts=3)
+        job = db.session.get(Job, job_id)
+        # without a runner a request makes one attempt and leaves the job queued
+        assert len(calls) == 1
+        assert (job.status, job.attempts) == ("queued", 1)
+
+    for _ in range(2):
+        admin_client.post(f"/admin/jobs/{job_id}/retry")
+
+    with app_instance.app_context():
+        job = db.session.get(Job, job_id)
+        assert calls == [job_id] * 3
+        assert job.status == "failed"
+        assert job.attempts == 3
+        assert "boom" in job.error
+        assert Job.query.count() == 1
+
+
+def test_recover_requeues_only_jobs_with_a_stale_heartbeat(app_instance):
+    from datetime import datetime, timedelta, timezone
+
+    from sstq.jobs import JobRunner
+    from sstq.models import Job
+
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=2)
+    with app_instance.app_context():
+        # both started long ago, but only the first stopped reporting progress
+        silent = Job(job_type="silent", status="running", started_at=long_ago, updated_at=long_ago)
+        busy = Job(job_type="busy", status="running", started_at=long_ago, updated_at=datetime.now(timezone.utc))
+        db.session.add_all([silent, busy])
+        db.session.commit()
+        silent_id, busy_id = silent.job_id, busy.job_id
+
+    runner = JobRunner(app_instance, workers=1)
+    submitted = []
+    runner.submit = submitted.append
+    try:
+        runner.recover()
+    finally:
+        runner.shutdown()
+
+    assert submitted == [silent_id]
+    with app_instance.app_context():
+        assert db.session.get(Job, silent_id).status == "queued"
+        assert db.session.get(Job, busy_id).status == "running"
+
+
+def test_delete_user_with_pending_upload_under_production_pragmas(admin_client, app_instance):
+    from sqlalchemy import text
+
+    from sstq.models import Job, PendingUpload
+
+    with app_instance.app_context():
+        # the production profile enforces foreign keys
+        assert db.session.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        verifier = User(username="uploading-verifier", role="verifier")
+        verifier.set_password("1234")
+        db.session.add(verifier)
+        db.session.flush()
+        db.session.add(PendingUpload(url="/static/uploads/cache/abandoned.jpg", user_id=verifier.user_id))
+        db.session.commit()
+        user_id = verifier.user_id
+
+    admin_client.post(f"/admin/users/{user_id}/delete", follow_redirects=True)
+
+    with app_instance.app_context():
+        assert Job.query.filter_by(job_type="delete_user").one().status == "succeeded"
+        assert db.session.get(User, user_id) is None
+        assert db.session.get(PendingUpload, "/static/uploads/cache/abandoned.jpg").user_id is None
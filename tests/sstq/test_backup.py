@@ -0,0 +1,172 @@
+import gzip
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from sstq.backup import (
+    MANIFEST_NAME,
+    BackupError,
+    check_backup_chain,
+    export_changes,
+    export_database,
+    iter_backup_deletes,
+    iter_backup_records,
+    verify_backup,
+)
+from sstq.extensions import db
+from sstq.migrations import upgrade
+from sstq.models import Product, Stage
+
+
+def _database_file(app_instance):
+    return app_instance.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+
+
+def _seed_products(app_instance, count):
+    with app_instance.app_context():
+        for index in range(count):
+            db.session.add(
+                Product(
+                    barcode=f"BK-{index:03d}",
+                    name=f"Backup product {index}",
+                    category="Snacks",
+                    brand="Brand",
+                    description="Ünïcode description",
+                )
+            )
+        db.session.commit()
+
+
+def test_export_writes_checksummed_segments_per_table(app_instance, tmp_path):
+    _seed_products(app_instance, 5)
+    output_dir = tmp_path / "backup"
+
+    manifest = export_database(_database_file(app_instance), output_dir, workers=2, segment_rows=2)
+
+    products = manifest["tables"]["products"]
+    assert products["rows"] == 5
+    assert [segment["rows"] for segment in products["segments"]] == [2, 2, 1]
+    assert manifest["tables"]["users"]["rows"] == 1
+    with gzip.open(output_dir / products["segments"][0]["file"], "rt", encoding="utf-8") as handle:
+        first = json.loads(handle.readline())
+    assert first == {"table": "products", "row": {
+        "barcode": "BK-000",
+        "name": "Backup product 0",
+        "category": "Snacks",
+        "brand": "Brand",
+        "description": "Ünïcode description",
+        "image": None,
+        "content_hash": None,
+    }}
+
+    assert verify_backup(output_dir) == []
+    restored = [row["barcode"] for table, row in iter_backup_records(output_dir) if table == "products"]
+    assert restored == [f"BK-{index:03d}" for index in range(5)]
+
+
+def test_damaged_segment_is_detected(app_instance, tmp_path):
+    _seed_products(app_instance, 3)
+    output_dir = tmp_path / "backup"
+    manifest = export_database(_database_file(app_instance), output_dir, workers=1, compression="none")
+
+    segment = output_dir / manifest["tables"]["products"]["segments"][0]["file"]
+    segment.write_text(segment.read_text(encoding="utf-8").replace("BK-001", "BK-999"), encoding="utf-8")
+
+    assert verify_backup(output_dir)
+    with pytest.raises(BackupError):
+        list(iter_backup_records(output_dir / MANIFEST_NAME))
+
+
+def test_legacy_jsonl_backups_are_still_readable(tmp_path):
+    legacy = tmp_path / "old.jsonl"
+    legacy.write_text('{"table": "products", "row": {"barcode": "1"}}\n\n', encoding="utf-8")
+    assert list(iter_backup_records(legacy)) == [("products", {"barcode": "1"})]
+
+
+def test_zstd_segments_round_trip(app_instance, tmp_path):
+    pytest.importorskip("zstandard")
+    _seed_products(app_instance, 2)
+    output_dir = tmp_path / "backup"
+
+    manifest = export_database(_database_file(app_instance), output_dir, compression="zstd", workers=1)
+
+    assert manifest["tables"]["products"]["segments"][0]["file"].endswith(".jsonl.zst")
+    assert verify_backup(output_dir) == []
+    assert sum(1 for table, _ in iter_backup_records(output_dir) if table == "products") == 2
+
+
+def test_incremental_backup_holds_only_changes_since_previous(app_instance, tmp_path):
+    _seed_products(app_instance, 3)
+    database = _database_file(app_instance)
+    with app_instance.app_context():
+        upgrade()
+        db.session.add(Stage(product_barcode="BK-000", stage_type="Assembly", country="Peru", description="Packed."))
+        db.session.commit()
+    full = export_database(database, tmp_path / "full", workers=1)
+
+    with app_instance.app_context():
+        db.session.get(Product, "BK-001").name = "Renamed"
+        db.session.delete(db.session.get(Product, "BK-002"))
+        db.session.delete(db.session.scalars(db.select(Stage)).one())
+        db.session.add(Product(barcode="BK-NEW", name="New", category="Snacks", brand="B", description="D"))
+        db.session.commit()
+    first = export_changes(database, tmp_path / "inc1", tmp_path / "full")
+
+    assert first["kind"] == "incremental"
+    assert first["base_version"] == full["change_version"] > 0
+    assert set(first["tables"]) == {"products", "stages"}
+    assert first["tables"]["products"]["rows"] == 2
+    assert first["tables"]["products"]["deleted"] == 1
+    assert verify_backup(tmp_path / "inc1") == []
+    assert sorted(row["barcode"] for _, row in iter_backup_records(tmp_path / "inc1")) == ["BK-001", "BK-NEW"]
+    assert sorted(iter_backup_deletes(tmp_path / "inc1")) == [("products", "BK-002"), ("stages", "1")]
+
+    # nothing changed since, so the next incremental is empty but continues the chain
+    second = export_changes(database, tmp_path / "inc2", tmp_path / "inc1")
+    assert second["tables"] == {}
+    assert len(check_backup_chain([tmp_path / "full", tmp_path / "inc1", tmp_path / "inc2"])) == 3
+    with pytest.raises(BackupError):
+        check_backup_chain([tmp_path / "full", tmp_path / "inc2"])
+
+
+def test_upserts_and_ignored_inserts_are_tracked(app_instance):
+    _seed_products(app_instance, 1)
+    with app_instance.app_context():
+        upgrade()
+        table = Product.__table__
+        values = {"barcode": "BK-000", "name": "Upserted", "category": "C", "brand": "B", "description": "D"}
+        upsert = sqlite_insert(table).values(values)
+        db.session.execute(upsert.on_conflict_do_update(index_elements=["barcode"], set_={"name": "Upserted"}))
+        db.session.execute(sqlite_insert(table).values(values).prefix_with("OR IGNORE"))
+        db.session.commit()
+
+        changes = db.session.execute(text("SELECT table_name, row_key, deleted FROM row_changes")).all()
+    assert changes == [("products", "BK-000", 0)]
+
+
+def test_failed_restore_leaves_the_current_database_in_place(app_instance, tmp_path, monkeypatch):
+    from sstq.scripts import import_database_backup
+
+    _seed_products(app_instance, 3)
+    database = _database_file(app_instance)
+    good = export_database(database, tmp_path / "good", workers=1, compression="none")
+    bad = export_database(database, tmp_path / "bad", workers=1, compression="none")
+    segment = tmp_path / "bad" / bad["tables"]["products"]["segments"][0]["file"]
+    segment.write_text(segment.read_text(encoding="utf-8").replace("BK-001", "BK-999"), encoding="utf-8")
+
+    live = tmp_path / "live" / "trace_quest.db"
+    live.parent.mkdir()
+    live.write_bytes(b"current database")
+    monkeypatch.setattr(import_database_backup, "DB_PATH", live)
+
+    with pytest.raises(BackupError):
+        import_database_backup.restore_backup(tmp_path / "bad")
+    assert live.read_bytes() == b"current database"
+
+    import_database_backup.restore_backup(tmp_path / "good", restart=True)
+    assert not import_database_backup.restore_path().exists()
+    with sqlite3.connect(live) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == good["tables"]["products"]["rows"]
@@ -0,0 +1,113 @@
+import random
+import re
+from datetime import datetime
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.migrations import upgrade
+from sstq.models import Claim, Evidence, Product
+from sstq.scripts import create_evidence
+from sstq.upload_store import release, resolve_upload_path
+
+
+class _FixedDatetime(datetime):
+    # the review timestamp is printed to the minute; pin it so two runs render the same files
+    @classmethod
+    def utcnow(cls):
+        return datetime(2026, 1, 15, 12, 0)
+
+
+def _app(monkeypatch, tmp_path, name):
+    database_uri = f"sqlite:///{tmp_path / f'{name}.db'}"
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_uri}, register_blueprints=False)
+    app.static_folder = str(tmp_path / name / "static")
+    monkeypatch.setattr(create_evidence, "STATIC_EVIDENCE_DIR", tmp_path / name / "static" / "uploads" / "evidence")
+    monkeypatch.setattr(create_evidence, "datetime", _FixedDatetime)
+    with app.app_context():
+        db.create_all()
+        upgrade()
+        for index in range(3):
+            barcode = f"300000000000{index}"
+            db.session.add(Product(barcode=barcode, name=f"Product {index}", category="Food", brand="Brand", description="D"))
+            db.session.add_all(
+                [
+                    Claim(product_barcode=barcode, claim_type="Origin", claim_text=f"Grown in region {index}."),
+                    Claim(product_barcode=barcode, claim_type="Ethical", claim_text="Fair trade."),
+                ]
+            )
+        db.session.commit()
+    return app
+
+
+def _evidence_rows():
+    return [
+        (evidence.claim_id, evidence.evidence_type, evidence.issuer, evidence.date, evidence.summary, evidence.file_reference)
+        for evidence in Evidence.query.order_by(Evidence.evidence_id).all()
+    ]
+
+
+def test_pdf_xref_offsets_point_at_their_objects():
+    data = create_evidence._pdf_bytes(["Evidence (copy)", "Back\\slash", ""])
+
+    startxref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+    assert data[startxref:].startswith(b"xref\n0 6\n")
+    entries = data[startxref + len(b"xref\n0 6\n"):].split(b"trailer")[0]
+    offsets = [int(entry[:10]) for entry in re.findall(rb"\d{10} \d{5} [nf] \n", entries)]
+    assert len(offsets) == 6
+    for number, offset in enumerate(offsets[1:], start=1):
+        assert data[offset:].startswith(f"{number} 0 obj\n".encode())
+
+    length = int(re.search(rb"/Length (\d+)", data).group(1))
+    stream = data.split(b"stream\n", 1)[1]
+    assert stream[length:].startswith(b"\nendstream")
+
+
+def test_worker_count_does_not_change_rows_or_files(monkeypatch, tmp_path):
+    results = []
+    for workers in (1, 2):
+        app = _app(monkeypatch, tmp_path, f"workers{workers}")
+        random.seed(11)
+        with app.app_context():
+            products = Product.query.order_by(Product.barcode).all()
+            created, replaced = create_evidence.create_evidence(products, workers=workers, batch_size=4)
+            db.session.commit()
+            rows = _evidence_rows()
+            db.session.remove()
+        files = {path.name: path.read_bytes() for path in create_evidence.STATIC_EVIDENCE_DIR.iterdir()}
+        assert (created, replaced) == (12, [])
+        results.append((rows, files))
+
+    assert results[0] == results[1]
+    assert len(results[0][1]) == 12
+
+
+def test_replaced_files_are_released_only_when_no_evidence_uses_them(monkeypatch, tmp_path):
+    app = _app(monkeypatch, tmp_path, "replace")
+    random.seed(5)
+    with app.app_context():
+        products = Product.query.order_by(Product.barcode).all()
+        create_evidence.create_evidence(products, evidence_per_claim=1, workers=1)
+        db.session.commit()
+
+        first_claims = products[0].claims
+        shared, unshared = (
+            Evidence.query.filter_by(claim_id=claim.claim_id).one().file_reference for claim in first_claims
+        )
+        # another product's evidence points at the same stored file
+        other_claim = products[1].claims[0]
+        db.session.add(Evidence(claim_id=other_claim.claim_id, evidence_type="Copy", file_reference=shared))
+        db.session.commit()
+
+        created, replaced = create_evidence.create_evidence(
+            [db.session.get(Product, products[0].barcode)], evidence_per_claim=1, replace_existing=True, workers=1
+        )
+        db.session.commit()
+        assert created == 2
+        assert sorted(replaced) == sorted([shared, unshared])
+
+        freed = {url: release(url) for url in replaced}
+        assert freed[shared] == 0
+        assert resolve_upload_path(shared).exists()
+        assert freed[unshared] > 0
+        assert not resolve_upload_path(unshared).exists()
+        db.session.remove()
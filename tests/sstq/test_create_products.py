@@ -0,0 +1,146 @@
+import json
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.models import ImportCheckpoint, Product
+from sstq.scripts import create_products
+
+
+def _record(code, name):
+    return {"code": code, "product_name": name, "brands": "Brand", "categories": "Food"}
+
+
+def _write(path, records, mode="w"):
+    with path.open(mode, encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record) + "\n")
+
+
+def _importer(monkeypatch, tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'products.db'}"
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_uri}, register_blueprints=False)
+    monkeypatch.setattr(create_products, "create_app", lambda **kwargs: app)
+
+    def run(path, update_existing=False):
+        create_products.import_products([path], update_existing=update_existing, batch_size=2, workers=1)
+
+    return app, run
+
+
+def _names(app):
+    with app.app_context():
+        names = {product.barcode: product.name for product in Product.query.all()}
+        db.session.remove()
+        return names
+
+
+def test_unchanged_file_is_skipped_and_appended_lines_are_resumed(monkeypatch, tmp_path, capsys):
+    app, run = _importer(monkeypatch, tmp_path)
+    path = tmp_path / "SimplifiedOFFData.jsonl"
+    _write(path, [_record("1000000000001", "First"), _record("1000000000002", "Second")])
+    run(path)
+    first_size = path.stat().st_size
+
+    run(path)
+    assert "inserted=0, updated=0, unchanged=0, skipped=0, invalid=0, unchanged_files=1" in capsys.readouterr().out
+
+    _write(path, [_record("1000000000003", "Third")], mode="a")
+    with app.app_context():
+        shards, checkpoint = create_products.plan_file(path, 1024, use_checkpoint=True)
+        db.session.remove()
+    assert [(shard.start, shard.first_line) for shard in shards] == [(first_size, 3)]
+    assert checkpoint["lines"] == 3
+
+    run(path)
+    assert "inserted=1, updated=0, unchanged=0, skipped=0" in capsys.readouterr().out.splitlines()[-1]
+    assert _names(app) == {"1000000000001": "First", "1000000000002": "Second", "1000000000003": "Third"}
+    with app.app_context():
+        # the resumed record keeps its real line number
+        assert "(line 3)" in db.session.get(Product, "1000000000003").description
+        db.session.remove()
+
+
+def test_update_run_is_not_skipped_by_an_insert_only_checkpoint(monkeypatch, tmp_path, capsys):
+    app, run = _importer(monkeypatch, tmp_path)
+    old_path = tmp_path / "old.jsonl"
+    path = tmp_path / "new.jsonl"
+    _write(old_path, [_record("1000000000001", "Old name")])
+    _write(path, [_record("1000000000001", "New name"), _record("1000000000002", "Second")])
+    run(old_path)
+
+    # insert-only: the existing barcode is skipped, but the file is checkpointed
+    run(path)
+    assert _names(app)["1000000000001"] == "Old name"
+
+    run(path, update_existing=True)
+    assert _names(app) == {"1000000000001": "New name", "1000000000002": "Second"}
+    assert "updated=1, unchanged=1" in capsys.readouterr().out.splitlines()[-1]
+
+    with app.app_context():
+        assert db.session.get(ImportCheckpoint, str(path.resolve())).update_existing is True
+        db.session.remove()
+    # the update run's checkpoint covers both modes
+    run(path, update_existing=True)
+    run(path)
+    assert capsys.readouterr().out.count("unchanged_files=1") == 2
+
+
+def test_update_run_only_rewrites_changed_records(monkeypatch, tmp_path, capsys):
+    app, run = _importer(monkeypatch, tmp_path)
+    path = tmp_path / "products.jsonl"
+    _write(path, [_record("1000000000001", "First"), _record("1000000000002", "Second")])
+    run(path, update_existing=True)
+
+    _write(path, [_record("1000000000001", "First"), _record("1000000000002", "Renamed"), _record("1000000000003", "Third")])
+    run(path, update_existing=True)
+
+    summary = capsys.readouterr().out.splitlines()[-1]
+    assert "inserted=1, updated=1, unchanged=1" in summary
+    assert _names(app) == {"1000000000001": "First", "1000000000002": "Renamed", "1000000000003": "Third"}
+
+
+def test_parallel_parse_keeps_line_numbers_and_counts_invalid_lines(monkeypatch, tmp_path, capsys):
+    app, _ = _importer(monkeypatch, tmp_path)
+    path = tmp_path / "SimplifiedOFFData.jsonl"
+    lines = [json.dumps(_record(f"10000000000{index:02d}", f"Product {index}")) for index in range(1, 13)]
+    lines[3] = "{not json"
+    lines[8] = json.dumps({"product_name": "No barcode"})
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    with app.app_context():
+        shards, _ = create_products.plan_file(path, 64, use_checkpoint=False)
+        db.session.remove()
+    assert len(shards) > 2
+
+    # several small shards on two workers go through the process pool
+    create_products.import_products([path], update_existing=False, batch_size=2, workers=2, shard_bytes=64)
+
+    assert "inserted=10, updated=0, unchanged=0, skipped=0, invalid=2" in capsys.readouterr().out
+    expected = {f"10000000000{index:02d}": index for index in range(1, 13) if index not in (4, 9)}
+    with app.app_context():
+        descriptions = {product.barcode: product.description for product in Product.query.all()}
+        db.session.remove()
+    assert sorted(descriptions) == sorted(expected)
+    for barcode, line_no in expected.items():
+        assert f"(line {line_no})" in descriptions[barcode]
+
+
+def test_update_run_counts_a_repeated_barcode_once(monkeypatch, tmp_path, capsys):
+    app, run = _importer(monkeypatch, tmp_path)
+    path = tmp_path / "products.jsonl"
+    _write(path, [_record("1000000000001", "First")])
+    run(path, update_existing=True)
+
+    # both barcodes appear twice in one batch; only the last record of each is written
+    _write(
+        path,
+        [
+            _record("1000000000001", "Renamed"),
+            _record("1000000000002", "New"),
+            _record("1000000000001", "Renamed again"),
+            _record("1000000000002", "Newer"),
+        ],
+    )
+    create_products.import_products([path], update_existing=True, batch_size=10, workers=1)
+
+    assert "inserted=1, updated=1, unchanged=0, skipped=0" in capsys.readouterr().out.splitlines()[-1]
+    assert _names(app) == {"1000000000001": "Renamed again", "1000000000002": "Newer"}
@@ -79,3 +79,35 @@ def test_delete_product_removes_related_records_and_image(logged_in_client, app_
         assert Issue.query.count() == 0
 
     assert not image_path.exists()
+
+
+def test_delete_product_keeps_image_shared_with_another_product(logged_in_client, app_instance):
+    image_url = "/static/uploads/products/shared-photo.jpg"
+
+    with app_instance.app_context():
+        for barcode in ("0123456789001", "0123456789002"):
+            db.session.add(
+                Product(
+                    barcode=barcode,
+                    name=f"Shared {barcode}",
+                    category="Food",
+                    brand="Brand X",
+                    description="Uses the same imported photo",
+                    image=image_url,
+                )
+            )
+        db.session.commit()
+
+        image_path = Path(app_instance.static_folder) / "uploads" / "products" / "shared-photo.jpg"
+        image_path.parent.mkdir(parents=True, exist_ok=True)
+        image_path.write_text("fake image data", encoding="utf-8")
+
+    response = logged_in_client.post("/product/0123456789001/delete", follow_redirects=True)
+    assert response.status_code == 200
+
+    with app_instance.app_context():
+        assert db.session.get(Product, "0123456789001") is None
+    assert image_path.exists()
+
+    logged_in_client.post("/product/0123456789002/delete", follow_redirects=True)
+    assert not image_path.exists()
@@ -0,0 +1,106 @@
+from sstq.extensions import db
+from sstq.models import Claim, Issue, Product
+
+
+def _seed_product_with_issues(app_instance, barcode):
+    with app_instance.app_context():
+        db.session.add(
+            Product(
+                barcode=barcode,
+                name="Edit Me",
+                category="Food",
+                brand="Brand X",
+                description="Product with reported claims",
+            )
+        )
+        kept = Claim(product_barcode=barcode, claim_type="Origin", claim_text="Grown in Italy.")
+        removed = Claim(product_barcode=barcode, claim_type="Ethical", claim_text="Fair trade.")
+        db.session.add_all([kept, removed])
+        db.session.flush()
+        kept_issue = Issue(claim_id=kept.claim_id, issue_type="Accuracy", description="Which region?")
+        removed_issue = Issue(claim_id=removed.claim_id, issue_type="Accuracy", description="No certificate.")
+        db.session.add_all([kept_issue, removed_issue])
+        db.session.commit()
+        return kept.claim_id, kept_issue.issue_id, removed_issue.issue_id
+
+
+def _edit(client, barcode, new_barcode, claim_rows, claim_ids=None):
+    return client.post(
+        f"/product/edit/{barcode}",
+        data={
+            "barcode": new_barcode,
+            "name": "Edited",
+            "category": "Food",
+            "brand": "Brand X",
+            "description": "Product with reported claims",
+            "claim_rows": claim_rows,
+            "claim_ids": claim_ids or "",
+            "evidence_rows": "1|Certificate|Issuer|2024-01-01|Backs the claim.|",
+        },
+        follow_redirects=True,
+    )
+
+
+def test_product_edit_keeps_issue_reports(logged_in_client, app_instance):
+    barcode = "0123456789123"
+    claim_id, kept_issue_id, removed_issue_id = _seed_product_with_issues(app_instance, barcode)
+
+    page = logged_in_client.get(f"/product/edit/{barcode}")
+    assert f'name="claim_ids" id="claim_ids" value="{claim_id},{claim_id + 1}"'.encode() in page.data
+
+    # the form sends the edited claim's id back with its row
+    response = _edit(
+        logged_in_client, barcode, barcode, "Origin|Grown in Tuscany, Italy.|High|Farm records", str(claim_id)
+    )
+
+    assert response.status_code == 200
+    with app_instance.app_context():
+        kept_issue = db.session.get(Issue, kept_issue_id)
+        removed_issue = db.session.get(Issue, removed_issue_id)
+        assert kept_issue.claim_id == claim_id
+        assert db.session.get(Claim, claim_id).claim_text == "Grown in Tuscany, Italy."
+        assert removed_issue is not None and removed_issue.claim_id is None
+        assert Claim.query.count() == 1
+
+
+def test_replacing_a_claim_does_not_reuse_its_id(logged_in_client, app_instance):
+    barcode = "0123456789123"
+    claim_id, kept_issue_id, removed_issue_id = _seed_product_with_issues(app_instance, barcode)
+
+    # 'Ethical' is removed and an unrelated claim added; without an id it must not take over the old row
+    _edit(logged_in_client, barcode, barcode, "Origin|Grown in Italy.||\nQuality|Lab tested.||", f"{claim_id},")
+
+    with app_instance.app_context():
+        claims = {claim.claim_type: claim for claim in Claim.query.all()}
+        assert sorted(claims) == ["Origin", "Quality"]
+        assert claims["Origin"].claim_id == claim_id
+        assert claims["Quality"].claim_text == "Lab tested."
+        assert db.session.get(Issue, kept_issue_id).claim_id == claim_id
+        assert db.session.get(Issue, removed_issue_id).claim_id is None
+
+
+def test_barcode_change_moves_claims_with_their_issues(logged_in_client, app_instance):
+    barcode, new_barcode = "0123456789123", "0123456789124"
+    claim_id, kept_issue_id, _ = _seed_product_with_issues(app_instance, barcode)
+
+    _edit(logged_in_client, barcode, new_barcode, "Origin|Grown in Italy.||\nEthical|Fair trade.||")
+
+    with app_instance.app_context():
+        assert db.session.execute(db.text("PRAGMA foreign_keys")).scalar() == 1
+        assert db.session.get(Product, barcode) is None
+        assert db.session.get(Product, new_barcode).name == "Edited"
+        assert db.session.get(Claim, claim_id).product_barcode == new_barcode
+        assert db.session.get(Issue, kept_issue_id).claim_id == claim_id
+        assert Issue.query.filter(Issue.claim_id.is_(None)).count() == 0
+
+
+def test_admin_lists_issues_of_removed_claims(admin_client, app_instance):
+    with app_instance.app_context():
+        db.session.add(Issue(claim_id=None, issue_type="Accuracy", description="Claim was dropped."))
+        db.session.commit()
+
+    response = admin_client.get("/admin")
+
+    assert response.status_code == 200
+    assert b"Claim was dropped." in response.data
+    assert b"claim removed" in response.data
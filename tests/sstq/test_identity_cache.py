@@ -0,0 +1,55 @@
+from sstq.extensions import db
+from sstq.identity_cache import EXTENSION_KEY, CachedIdentity, IdentityCache, get_identity_cache, invalidate_identity
+from sstq.models import User
+
+
+def _set_role(app_instance, username, role):
+    with app_instance.app_context():
+        User.query.filter_by(username=username).update({"role": role})
+        db.session.commit()
+        return User.query.filter_by(username=username).first().user_id
+
+
+def test_identity_is_served_from_cache_until_invalidated(logged_in_client, app_instance):
+    assert logged_in_client.get("/admin").status_code == 200
+
+    # a role change made behind the app's back is not seen while the cached identity is fresh
+    user_id = _set_role(app_instance, "testuser", "consumer")
+    assert logged_in_client.get("/admin").status_code == 200
+
+    with app_instance.app_context():
+        invalidate_identity(user_id)
+    assert logged_in_client.get("/admin").status_code == 403
+
+
+def test_disabled_cache_reads_the_user_every_request(logged_in_client, app_instance):
+    app_instance.extensions[EXTENSION_KEY] = IdentityCache(ttl_seconds=0, max_size=1024)
+
+    assert logged_in_client.get("/admin").status_code == 200
+    _set_role(app_instance, "testuser", "consumer")
+    assert logged_in_client.get("/admin").status_code == 403
+
+
+def test_deleting_a_user_drops_the_cached_identity(admin_client, app_instance):
+    with app_instance.app_context():
+        user_id = User.query.filter_by(username="testuser").first().user_id
+        cache = get_identity_cache()
+        cache.put(CachedIdentity(user_id, "testuser", "verifier"))
+
+    admin_client.post(f"/admin/users/{user_id}/delete")
+
+    with app_instance.app_context():
+        assert db.session.get(User, user_id) is None
+        assert get_identity_cache().get(user_id) is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = IdentityCache(ttl_seconds=60, max_size=2)
+    for user_id in (1, 2):
+        cache.put(CachedIdentity(user_id, f"user{user_id}", "consumer"))
+    cache.get(1)
+    cache.put(CachedIdentity(3, "user3", "consumer"))
+
+    assert cache.get(2) is None
+    assert cache.get(1).username == "user1"
+    assert cache.get(3).is_consumer
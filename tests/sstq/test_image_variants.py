@@ -0,0 +1,107 @@
+import pytest
+
+from sstq.extensions import db
+from sstq.image_variants import delete_variants, generate_variants, image_srcset, variant_path
+from sstq.models import Product
+
+
+def _write_variants(image_path, widths):
+    for width in widths:
+        path = variant_path(image_path, width)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"webp")
+
+
+def test_image_srcset_lists_only_existing_variants(app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+    image_path = tmp_path / "uploads" / "products" / "photo.jpg"
+    image_path.parent.mkdir(parents=True)
+    image_path.write_bytes(b"jpeg")
+
+    with app_instance.app_context():
+        assert image_srcset("/static/uploads/products/photo.jpg") == ""
+
+        _write_variants(image_path, (320, 640))
+        assert image_srcset("/static/uploads/products/photo.jpg") == (
+            "/static/uploads/products/variants/photo-320w.webp 320w, "
+            "/static/uploads/products/variants/photo-640w.webp 640w"
+        )
+        assert image_srcset("https://example.com/photo.jpg") == ""
+        assert image_srcset("/static/uploads/../../secret.jpg") == ""
+        assert image_srcset(None) == ""
+
+
+def test_product_detail_uses_srcset_and_delete_removes_variants(logged_in_client, app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+    barcode = "0123456789555"
+    image_path = tmp_path / "uploads" / "products" / "detail.jpg"
+    image_path.parent.mkdir(parents=True)
+    image_path.write_bytes(b"jpeg")
+    _write_variants(image_path, (320,))
+
+    with app_instance.app_context():
+        db.session.add(
+            Product(
+                barcode=barcode,
+                name="Variant Product",
+                category="Food",
+                brand="Brand X",
+                description="Has a thumbnail",
+                image="/static/uploads/products/detail.jpg",
+            )
+        )
+        db.session.commit()
+
+    response = logged_in_client.get(f"/product/{barcode}")
+    assert b'srcset="/static/uploads/products/variants/detail-320w.webp 320w"' in response.data
+
+    logged_in_client.post(f"/product/{barcode}/delete", follow_redirects=True)
+    assert not image_path.exists()
+    assert not variant_path(image_path, 320).exists()
+
+
+def test_delete_variants_ignores_other_images(tmp_path):
+    image_path = tmp_path / "a.jpg"
+    other_path = tmp_path / "ab.jpg"
+    _write_variants(image_path, (320, 960))
+    _write_variants(other_path, (320,))
+
+    delete_variants(image_path)
+
+    assert not any(variant_path(image_path, width).exists() for width in (320, 960))
+    assert variant_path(other_path, 320).exists()
+
+
+def test_generate_variants_writes_smaller_webp_copies(tmp_path):
+    image_module = pytest.importorskip("PIL.Image")
+    image_path = tmp_path / "photo.jpg"
+    image_module.new("RGB", (800, 400), (200, 120, 40)).save(image_path, "JPEG")
+
+    written = generate_variants(image_path, (320, 640, 1280))
+
+    assert written == [variant_path(image_path, 320), variant_path(image_path, 640)]
+    with image_module.open(variant_path(image_path, 320)) as variant:
+        assert variant.format == "WEBP"
+        assert variant.size == (320, 160)
+    assert not variant_path(image_path, 1280).exists()
+    # existing variants are left alone unless forced
+    assert generate_variants(image_path, (320, 640)) == []
+    assert len(generate_variants(image_path, (320,), force=True)) == 1
+
+
+def test_image_srcset_ends_with_the_original_at_its_width(app_instance, tmp_path):
+    image_module = pytest.importorskip("PIL.Image")
+    app_instance.static_folder = str(tmp_path)
+    image_path = tmp_path / "uploads" / "products" / "wide.jpg"
+    image_path.parent.mkdir(parents=True)
+    image_module.new("RGB", (800, 400), (200, 120, 40)).save(image_path, "JPEG")
+    generate_variants(image_path, (320, 640, 1280))
+
+    with app_instance.app_context():
+        assert image_srcset("/static/uploads/products/wide.jpg") == (
+            "/static/uploads/products/variants/wide-320w.webp 320w, "
+            "/static/uploads/products/variants/wide-640w.webp 640w, "
+            "/static/uploads/products/wide.jpg 800w"
+        )
+        delete_variants(image_path)
+        assert image_srcset("/static/uploads/products/wide.jpg") == ""
@@ -0,0 +1,67 @@
+from sstq.metrics import MISSIONS_STARTED, MISSIONS_SUBMITTED, REQUEST_LATENCY, REQUESTS, SCANS, registry
+from sstq.models import Mission, Player
+
+from test_tracequest import _seed_tracequest_product
+
+
+def test_metrics_endpoint_reports_routes_and_domain_counters(logged_in_client, app_instance):
+    _seed_tracequest_product(app_instance)
+    scans_before = SCANS.value()
+    started_before = MISSIONS_STARTED.value("easy")
+    submitted_before = MISSIONS_SUBMITTED.value("easy")
+    product_requests_before = REQUEST_LATENCY.count("product", "product.product_detail")
+
+    logged_in_client.get("/search_product?barcode=SNACK-001")
+    logged_in_client.get("/product/SNACK-001")
+    logged_in_client.post("/trace_quest", data={"mission_category": "snacks", "difficulty": "easy"})
+    with app_instance.app_context():
+        player = Player.query.first()
+        rows = Mission.query.filter_by(player_id=player.player_id).all()
+        answers = {f"answer_{row.question_number}": row.answer for row in rows}
+        mission_id = rows[0].mission_id
+    logged_in_client.post(f"/misson/{mission_id}", data=answers)
+
+    assert SCANS.value() == scans_before + 1
+    assert MISSIONS_STARTED.value("easy") == started_before + 1
+    assert MISSIONS_SUBMITTED.value("easy") == submitted_before + 1
+    assert REQUEST_LATENCY.count("product", "product.product_detail") == product_requests_before + 1
+
+    response = logged_in_client.get("/metrics")
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert "# TYPE sstq_http_request_duration_seconds histogram" in body
+    assert 'sstq_http_request_duration_seconds_bucket{blueprint="product",endpoint="product.product_detail",le="+Inf"}' in body
+    assert 'sstq_http_requests_total{blueprint="search_product",endpoint="search_product.search_product",method="GET",status="302"}' in body
+    assert 'sstq_db_pool_connections{state="checked_out"}' in body
+    # the scrape itself is still in flight while the body is rendered
+    assert 'sstq_http_requests_in_flight{blueprint="metrics"} 1' in body
+
+
+def test_metrics_token_is_enforced(client, app_instance):
+    app_instance.config["METRICS_TOKEN"] = "scrape-secret"
+
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert registry.render().startswith("# HELP")
+
+
+def test_metrics_need_a_token_outside_debug_and_testing(client, app_instance):
+    app_instance.config["METRICS_TOKEN"] = ""
+    app_instance.testing = False
+
+    assert client.get("/metrics").status_code == 403
+
+    app_instance.debug = True
+    assert client.get("/metrics").status_code == 200
+
+
+def test_unknown_request_methods_share_one_label(client):
+    before = REQUESTS.value("app", "unmatched", "other", 405)
+
+    client.open("/", method="PURGE")
+    client.open("/", method="X-ANYTHING")
+
+    assert REQUESTS.value("app", "unmatched", "other", 405) == before + 2
+    assert "PURGE" not in registry.render()
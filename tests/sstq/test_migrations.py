@@ -0,0 +1,117 @@
+import sqlite3
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.migrations import LATEST_VERSION, current_version, ensure_schema, pending_migrations, upgrade
+
+EXPECTED_INDEXES = {
+    "ix_stages_product_barcode",
+    "ix_breakdowns_product_barcode",
+    "ix_claims_product_barcode",
+    "ix_evidence_claim_id",
+    "ix_missions_player_group_question",
+    "ix_missions_player_completed",
+    "ix_badges_player_id",
+    "ix_changelogs_user_timestamp",
+}
+
+
+def _index_names(database_path):
+    with sqlite3.connect(database_path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+
+
+def test_upgrade_adds_indexes_to_existing_database(tmp_path):
+    database_path = tmp_path / "legacy.db"
+    # a database created before the migration framework: tables only, no secondary indexes
+    with sqlite3.connect(database_path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE products (barcode VARCHAR(32) PRIMARY KEY, name VARCHAR(128) NOT NULL);
+            CREATE TABLE stages (stage_id INTEGER PRIMARY KEY, product_barcode VARCHAR(32) NOT NULL);
+            CREATE TABLE breakdowns (breakdown_id INTEGER PRIMARY KEY, product_barcode VARCHAR(32) NOT NULL);
+            CREATE TABLE claims (claim_id INTEGER PRIMARY KEY, product_barcode VARCHAR(32) NOT NULL);
+            CREATE TABLE evidence (evidence_id INTEGER PRIMARY KEY, claim_id INTEGER NOT NULL);
+            CREATE TABLE missions (
+                mission_id INTEGER PRIMARY KEY, player_id INTEGER NOT NULL, mission_group_id VARCHAR(36),
+                question_number INTEGER, completed_at DATETIME
+            );
+            CREATE TABLE badges (badge_id INTEGER PRIMARY KEY, player_id INTEGER NOT NULL);
+            CREATE TABLE changelogs (log_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, timestamp DATETIME NOT NULL);
+            """
+        )
+    assert not EXPECTED_INDEXES & _index_names(database_path)
+
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}"})
+    with app.app_context():
+        applied = upgrade()
+
+        assert applied[-1] == LATEST_VERSION
+        assert current_version() == LATEST_VERSION
+        assert pending_migrations() == []
+        # running again is a no-op
+        assert upgrade() == []
+        db.session.remove()
+        db.engine.dispose()
+
+    assert EXPECTED_INDEXES <= _index_names(database_path)
+    with sqlite3.connect(database_path) as conn:
+        assert "content_hash" in {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+        for table in ("stored_blobs", "pending_uploads"):
+            assert conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+
+
+def test_create_app_leaves_schema_to_ensure_schema(tmp_path):
+    database_path = tmp_path / "fresh.db"
+    app = create_app(
+        {"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}"},
+        register_blueprints=False,
+    )
+    assert "admin" not in app.blueprints
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'")}
+        assert "products" not in tables
+
+        assert ensure_schema()[-1] == LATEST_VERSION
+        assert ensure_schema() == []
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT COUNT(*) FROM products").scalar() == 0
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_upgrade_keeps_issues_and_nulls_their_removed_claims(tmp_path):
+    database_path = tmp_path / "issues.db"
+    with sqlite3.connect(database_path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE users (user_id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL);
+            CREATE TABLE claims (claim_id INTEGER PRIMARY KEY, product_barcode VARCHAR(32) NOT NULL);
+            CREATE TABLE issues (
+                issue_id INTEGER PRIMARY KEY, claim_id INTEGER NOT NULL REFERENCES claims (claim_id),
+                user_id INTEGER REFERENCES users (user_id), issue_type VARCHAR(64) NOT NULL,
+                description VARCHAR(512) NOT NULL, status VARCHAR(32) NOT NULL
+            );
+            INSERT INTO users VALUES (1, 'reporter');
+            INSERT INTO claims VALUES (10, '0123456789012');
+            INSERT INTO issues VALUES (1, 10, 1, 'Accuracy', 'kept', 'open');
+            INSERT INTO issues VALUES (2, 11, 2, 'Accuracy', 'claim gone', 'open');
+            """
+        )
+
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}"})
+    with app.app_context():
+        upgrade()
+        db.session.remove()
+        db.engine.dispose()
+
+    with sqlite3.connect(database_path) as conn:
+        notnull = {row[1]: row[3] for row in conn.execute("PRAGMA table_info(issues)")}
+        assert notnull["claim_id"] == 0
+        assert conn.execute("SELECT issue_id, claim_id, user_id FROM issues ORDER BY issue_id").fetchall() == [
+            (1, 10, 1),
+            (2, None, None),
+        ]
+        assert ("claims", "SET NULL") in {(row[2], row[6]) for row in conn.execute("PRAGMA foreign_key_list(issues)")}
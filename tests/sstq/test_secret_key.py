@@ -0,0 +1,23 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sstq.config import SECRET_KEY_FILENAME, load_instance_secret_key
+
+
+def test_secret_key_is_created_once_and_shared(tmp_path):
+    instance_path = tmp_path / "instance"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = set(pool.map(lambda _: load_instance_secret_key(str(instance_path)), range(16)))
+
+    assert len(keys) == 1
+    key_file = instance_path / SECRET_KEY_FILENAME
+    assert key_file.read_text().strip() == keys.pop()
+    assert os.stat(key_file).st_mode & 0o077 == 0
+    # no temporary files are left behind
+    assert [path.name for path in instance_path.iterdir()] == [SECRET_KEY_FILENAME]
+
+
+def test_existing_secret_key_is_reused(tmp_path):
+    (tmp_path / SECRET_KEY_FILENAME).write_text("kept-between-restarts\n")
+    assert load_instance_secret_key(str(tmp_path)) == "kept-between-restarts"
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sstq.extensions import db
+from sstq.models import Product
+from sstq.snapshots import (
+    SnapshotError,
+    list_snapshots,
+    prune_snapshots,
+    snapshot_now,
+    take_snapshot,
+    verify_snapshot,
+)
+
+
+def test_snapshot_is_verified_standalone_copy(app_instance, tmp_path):
+    app_instance.config["SNAPSHOT_DIR"] = str(tmp_path / "snapshots")
+    with app_instance.app_context():
+        db.session.add(Product(barcode="SNAP-1", name="Snap", category="Snacks", brand="B", description="D"))
+        db.session.commit()
+        result = snapshot_now(db.engine)
+
+    path = result["path"]
+    assert path.parent == tmp_path / "snapshots"
+    assert verify_snapshot(path) == []
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT name FROM products WHERE barcode = 'SNAP-1'").fetchone() == ("Snap",)
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    assert not list(path.parent.glob("*.partial"))
+
+
+def test_rotation_keeps_newest_and_recent_snapshots(app_instance, tmp_path):
+    source = app_instance.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+    directory = tmp_path / "snapshots"
+    now = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    for days_ago in (0, 1, 2, 40, 41, 42):
+        take_snapshot(source, directory, pages_per_step=-1, step_sleep=0, now=now - timedelta(days=days_ago))
+
+    removed = prune_snapshots(directory, keep=4, retention_days=30, now=now)
+
+    assert [path.name for path in removed] == ["snapshot-20260119-000000.db", "snapshot-20260118-000000.db"]
+    assert [path.name for path in list_snapshots(directory)] == [
+        "snapshot-20260301-000000.db",
+        "snapshot-20260228-000000.db",
+        "snapshot-20260227-000000.db",
+        "snapshot-20260120-000000.db",
+    ]
+
+
+def test_damaged_snapshot_fails_integrity_check(tmp_path):
+    damaged = tmp_path / "snapshot-20260101-000000.db"
+    with sqlite3.connect(damaged) as connection:
+        connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT)")
+        connection.execute("CREATE INDEX ix_t_value ON t (value)")
+        connection.executemany("INSERT INTO t (value) VALUES (?)", [(f"v{i}" * 50,) for i in range(500)])
+    data = bytearray(damaged.read_bytes())
+    # scribble over a page in the middle of the file
+    data[4096 * 3:4096 * 3 + 200] = b"\xff" * 200
+    damaged.write_bytes(bytes(data))
+
+    assert verify_snapshot(damaged) != []
+
+
+def _database(path, journal_mode):
+    with closing(sqlite3.connect(path)) as connection:
+        connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT)")
+        connection.executemany("INSERT INTO t (value) VALUES (?)", [("x" * 500,) for _ in range(400)])
+        connection.commit()
+
+
+def test_stepped_snapshot_gives_up_on_a_database_that_keeps_changing(tmp_path):
+    source = tmp_path / "busy.db"
+    _database(source, "DELETE")
+    writer = sqlite3.connect(source)
+
+    def write_between_steps(copied, total):
+        writer.execute("INSERT INTO t (value) VALUES ('changed')")
+        writer.commit()
+
+    with pytest.raises(SnapshotError, match="restarted 4 times"):
+        take_snapshot(
+            source, tmp_path / "snapshots", pages_per_step=1, step_sleep=0, progress=write_between_steps, max_restarts=3
+        )
+    writer.close()
+
+    assert list((tmp_path / "snapshots").iterdir()) == []
+
+
+def test_wal_snapshot_is_one_step_while_another_connection_writes(tmp_path):
+    source = tmp_path / "wal.db"
+    _database(source, "WAL")
+    stop = threading.Event()
+    written = []
+
+    def keep_writing():
+        with closing(sqlite3.connect(source)) as writer:
+            while not stop.is_set():
+                writer.execute("INSERT INTO t (value) VALUES ('during snapshot')")
+                writer.commit()
+                written.append(1)
+
+    thread = threading.Thread(target=keep_writing)
+    thread.start()
+    try:
+        while not written:
+            pass
+        path = take_snapshot(source, tmp_path / "snapshots", pages_per_step=1, step_sleep=0.01, max_restarts=0)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert verify_snapshot(path) == []
+    with closing(sqlite3.connect(path)) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM t").fetchone()[0] >= 400
@@ -0,0 +1,83 @@
+import logging
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.models import User
+from sstq.sql_instrumentation import START_TIME_ATTRIBUTE, statement_shape
+
+
+def test_statement_shape_collapses_literals_and_in_lists():
+    assert statement_shape("SELECT * FROM users WHERE user_id IN (?, ?, ?)") == statement_shape(
+        "SELECT *  FROM users\nWHERE user_id IN (?)"
+    )
+    assert statement_shape("SELECT * FROM products WHERE barcode = '123' LIMIT 5") == (
+        "SELECT * FROM products WHERE barcode = ? LIMIT ?"
+    )
+
+
+def test_admin_user_counts_are_flagged_as_n_plus_one(tmp_path, caplog):
+    app = create_app({
+        "TESTING": True,
+        "SECRET_KEY": "test-secret-key",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'instrumented.db'}",
+        "SQL_INSTRUMENTATION": True,
+        "SQL_N_PLUS_ONE_THRESHOLD": 5,
+    })
+    with app.app_context():
+        db.create_all()
+        admin = User(username="admin", role="admin")
+        admin.set_password("1234")
+        db.session.add(admin)
+        for index in range(6):
+            user = User(username=f"verifier{index}", role="verifier")
+            user.set_password("1234")
+            db.session.add(user)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "1234", "action": "login"})
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = client.get("/admin")
+
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("sql;dur=")
+    assert "queries" in response.headers["Server-Timing"]
+    warnings = [record.getMessage() for record in caplog.records if "Likely N+1" in record.getMessage()]
+    assert any("endpoint=admin.admin" in message and "SELECT count(*)" in message for message in warnings)
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_instrumentation_is_off_by_default(client):
+    response = client.get("/login")
+    assert "Server-Timing" not in response.headers
+
+
+def test_failed_statements_are_timed_and_cleaned_up(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SECRET_KEY": "test-secret-key",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'instrumented.db'}",
+        "SQL_INSTRUMENTATION": True,
+    })
+    with app.test_request_context("/"):
+        app.preprocess_request()
+        with db.engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+            result = connection.execute(text("SELECT 1"))
+            assert result.scalar() == 1
+            assert not hasattr(result.context, START_TIME_ATTRIBUTE)
+
+        stats = g.sql_stats
+        assert stats.query_count == 2
+        assert stats.shapes["SELECT * FROM missing_table"] == 1
+        db.engine.dispose()
@@ -0,0 +1,47 @@
+from sstq import create_app
+from sstq.extensions import db
+from sstq.sqlite_tuning import EXTENSION_KEY, pragma_report
+
+
+def test_production_profile_applies_to_every_connection(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'tuned.db'}",
+        "SQLITE_TUNING_PROFILE": "production",
+        "SQLITE_PRAGMA_OVERRIDES": {"busy_timeout": 1234},
+    })
+
+    # create_app() only records the profile; reading it back is left to the startup report
+    assert app.extensions[EXTENSION_KEY]["requested"]["busy_timeout"] == 1234
+    with app.app_context():
+        report = pragma_report(app, db.engine)
+    assert report["profile"] == "production"
+    assert report["pragmas"]["journal_mode"] == "wal"
+    assert report["pragmas"]["synchronous"] == 1
+    assert report["pragmas"]["foreign_keys"] == 1
+    assert report["pragmas"]["busy_timeout"] == 1234
+
+    with app.app_context():
+        # a connection opened later (e.g. by a job thread) gets the same settings
+        with db.engine.connect() as first, db.engine.connect() as second:
+            for connection in (first, second):
+                assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+                assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+        db.engine.dispose()
+
+
+def test_default_profile_leaves_sqlite_defaults(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'plain.db'}",
+        "SQLITE_TUNING_PROFILE": "default",
+    })
+
+    # nothing connected yet, so SQLite has not even created the file
+    assert not (tmp_path / "plain.db").exists()
+    with app.app_context():
+        report = pragma_report(app, db.engine)
+        db.engine.dispose()
+    assert report["profile"] == "default"
+    assert report["pragmas"]["journal_mode"] == "delete"
+    assert report["pragmas"]["foreign_keys"] == 0
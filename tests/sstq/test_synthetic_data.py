@@ -0,0 +1,55 @@
+import argparse
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.models import Breakdown, Claim, Evidence, Mission, Player, Product, Stage, User
+from sstq.scripts import generate_synthetic_data
+from sstq.scripts.create_products import MAPPED_COLUMNS, content_hash
+
+
+def _args(**overrides):
+    values = dict(
+        products=4, stages=2, breakdowns=3, claims=2, evidence=1, players=2, missions=1,
+        password="synthetic", prefix="TST", seed=7, fast=False,
+    )
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def _run(monkeypatch, tmp_path, args):
+    database_uri = f"sqlite:///{tmp_path / 'synthetic.db'}"
+    monkeypatch.setattr(
+        generate_synthetic_data,
+        "create_app",
+        lambda **kwargs: create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_uri}, **kwargs),
+    )
+    generate_synthetic_data.generate(args)
+    return create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_uri}, register_blueprints=False)
+
+
+def test_generator_fills_every_table_on_the_current_schema(monkeypatch, tmp_path):
+    app = _run(monkeypatch, tmp_path, _args())
+
+    with app.app_context():
+        assert Product.query.count() == 4
+        assert Stage.query.count() == 8
+        assert Breakdown.query.count() == 12
+        assert Claim.query.count() == 8
+        assert Evidence.query.count() == 8
+        assert User.query.count() == Player.query.count() == 2
+        assert Mission.query.count() == 12
+        for product in Product.query.all():
+            mapped = {column: getattr(product, column) for column in MAPPED_COLUMNS}
+            assert product.content_hash == content_hash(mapped)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_generator_accepts_zero_breakdowns(monkeypatch, tmp_path):
+    app = _run(monkeypatch, tmp_path, _args(breakdowns=0))
+
+    with app.app_context():
+        assert Breakdown.query.count() == 0
+        assert Product.query.count() == 4
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+import pytest
+
+from sstq import create_app
+from sstq.extensions import db
+from sstq.models import Breakdown, Claim, Evidence, Product, Stage
+from sstq.scripts import create_traceability_data
+
+SEEDED_BARCODES = [f"200000000000{index}" for index in range(7)]
+
+
+def _generate(monkeypatch, tmp_path, name, *options):
+    database_uri = f"sqlite:///{tmp_path / f'{name}.db'}"
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_uri}, register_blueprints=False)
+    with app.app_context():
+        db.create_all()
+        for barcode in SEEDED_BARCODES:
+            db.session.add(
+                Product(barcode=barcode, name=f"Product {barcode[-1]}", category="Food", brand="Brand", description="D")
+            )
+        # already has a timeline, so both modes leave its stages alone
+        db.session.add(Stage(product_barcode=SEEDED_BARCODES[0], stage_type="Retail", country="Peru", description="Kept."))
+        db.session.commit()
+
+    monkeypatch.setattr(create_traceability_data, "create_app", lambda **kwargs: app)
+    monkeypatch.setattr(
+        "sys.argv",
+        ["create_traceability_data.py", "--seed", "3", "--breakdown-per-product", "4", *options],
+    )
+    create_traceability_data.main()
+    return app
+
+
+def _summary(app):
+    with app.app_context():
+        summary = {
+            "counts": {model.__tablename__: model.query.count() for model in (Stage, Breakdown, Claim, Evidence)},
+            "stage_types": defaultdict(list),
+            "breakdown_totals": defaultdict(float),
+            "evidence_per_claim": sorted(
+                {claim.claim_id: len(claim.evidence) for claim in Claim.query.all()}.values()
+            ),
+        }
+        for stage in Stage.query.order_by(Stage.product_barcode, Stage.start_date).all():
+            summary["stage_types"][stage.product_barcode].append(stage.stage_type)
+            if stage.start_date and stage.end_date:
+                assert stage.start_date <= stage.end_date
+        for breakdown in Breakdown.query.all():
+            summary["breakdown_totals"][breakdown.product_barcode] += breakdown.percentage
+        db.session.remove()
+        db.engine.dispose()
+    return summary
+
+
+def test_vectorized_mode_matches_the_row_by_row_mode(monkeypatch, tmp_path):
+    pytest.importorskip("numpy")
+    rows = _summary(_generate(monkeypatch, tmp_path, "rows"))
+    vectorized = _summary(_generate(monkeypatch, tmp_path, "vectorized", "--vectorized", "--batch-size", "3"))
+
+    assert rows["counts"] == vectorized["counts"] == {"stages": 31, "breakdowns": 28, "claims": 21, "evidence": 42}
+    assert rows["stage_types"] == vectorized["stage_types"]
+    assert rows["evidence_per_claim"] == vectorized["evidence_per_claim"]
+    for summary in (rows, vectorized):
+        assert sorted(summary["breakdown_totals"]) == SEEDED_BARCODES
+        assert all(total == pytest.approx(100, abs=0.01) for total in summary["breakdown_totals"].values())
@@ -0,0 +1,78 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sstq.extensions import db
+from sstq.models import PendingUpload, Product
+from sstq.upload_cache import sweep_upload_cache
+
+
+def _cache_file(root, relative, size, age_hours):
+    path = root / "uploads" / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    modified = time.time() - age_hours * 3600
+    os.utime(path, (modified, modified))
+    return path
+
+
+def test_sweep_removes_only_abandoned_cache_files(app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+    abandoned = _cache_file(tmp_path, "cache/old.jpg", 100, age_hours=30)
+    abandoned_pdf = _cache_file(tmp_path, "cache/evidence/old.pdf", 50, age_hours=30)
+    still_open = _cache_file(tmp_path, "cache/open.jpg", 70, age_hours=30)
+    recent = _cache_file(tmp_path, "cache/new.jpg", 10, age_hours=1)
+    stored = _cache_file(tmp_path, "products/kept.jpg", 10, age_hours=30)
+
+    with app_instance.app_context():
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.session.add_all(
+            [
+                PendingUpload(url="/static/uploads/cache/open.jpg", created_at=now, last_seen_at=now),
+                PendingUpload(
+                    url="/static/uploads/cache/old.jpg",
+                    created_at=now - timedelta(hours=30),
+                    last_seen_at=now - timedelta(hours=30),
+                ),
+            ]
+        )
+        db.session.commit()
+
+        preview = sweep_upload_cache(24, batch_size=1, dry_run=True)
+        assert abandoned.exists()
+        result = sweep_upload_cache(24, batch_size=1)
+
+        assert preview == result
+        assert (result.expired, result.removed, result.kept, result.bytes_reclaimed) == (3, 2, 1, 150)
+        assert not abandoned.exists() and not abandoned_pdf.exists()
+        assert still_open.exists() and recent.exists() and stored.exists()
+        assert [row.url for row in PendingUpload.query.all()] == ["/static/uploads/cache/open.jpg"]
+
+
+def test_temp_uploads_are_tracked_until_saved_with_the_product(logged_in_client, app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+
+    response = logged_in_client.post(
+        "/upload_product_image_temp",
+        data={"barcode": "0123456789012", "image": (io.BytesIO(b"\xff\xd8\xff temp"), "photo.jpg", "image/jpeg")},
+        content_type="multipart/form-data",
+    )
+    image_url = response.get_json()["image_url"]
+    with app_instance.app_context():
+        assert db.session.get(PendingUpload, image_url) is not None
+
+    logged_in_client.post(
+        "/add_product",
+        data={
+            "barcode": "0123456789012",
+            "name": "Cached Product",
+            "category": "Food",
+            "brand": "Brand",
+            "image": image_url,
+        },
+        follow_redirects=True,
+    )
+    with app_instance.app_context():
+        assert db.session.get(Product, "0123456789012").image.startswith("/static/uploads/products/")
+        assert PendingUpload.query.count() == 0
@@ -0,0 +1,142 @@
+import io
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from sstq.extensions import db
+from sstq.routes import product as product_routes
+from sstq.migrations import upgrade
+from sstq.models import Product, StoredBlob
+from sstq.upload_store import blob_url, release, resolve_upload_path, store_file
+
+
+def _product(barcode, image):
+    return Product(barcode=barcode, name="Stored", category="Food", brand="Brand", description="D", image=image)
+
+
+def test_store_keeps_one_copy_and_counts_references(app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path / "static")
+    first = tmp_path / "first.jpg"
+    second = tmp_path / "second.jpg"
+    first.write_bytes(b"same photo")
+    second.write_bytes(b"same photo")
+
+    with app_instance.app_context():
+        upgrade()
+        url, created = store_file(first, folder="products", extension="jpg", move=False)
+        again, created_again = store_file(second, folder="products", extension="jpg")
+        db.session.add_all([_product("0000000000001", url), _product("0000000000002", url)])
+        db.session.commit()
+
+        assert (created, created_again) == (True, False)
+        assert again == url == blob_url("products", StoredBlob.query.one().sha256, "jpg")
+        assert first.exists() and not second.exists()
+        blob_path = resolve_upload_path(url)
+        assert blob_path.read_bytes() == b"same photo"
+        assert db.session.get(StoredBlob, url).ref_count == 2
+
+        db.session.delete(db.session.get(Product, "0000000000001"))
+        db.session.commit()
+        assert release(url) == 0
+        assert blob_path.exists()
+
+        db.session.get(Product, "0000000000002").image = None
+        db.session.commit()
+        assert release(url) == len(b"same photo")
+        assert not blob_path.exists()
+        assert db.session.get(StoredBlob, url) is None
+
+
+def test_uploading_the_same_image_twice_reuses_the_stored_file(logged_in_client, app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+    with app_instance.app_context():
+        upgrade()
+
+    urls = []
+    for _ in range(2):
+        response = logged_in_client.post(
+            "/upload_product_image",
+            data={"barcode": "0123", "image": (io.BytesIO(b"\xff\xd8\xff fake jpeg"), "photo.jpg", "image/jpeg")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 200
+        urls.append(response.get_json()["image_url"])
+
+    assert urls[0] == urls[1]
+    assert [path.name for path in (tmp_path / "uploads" / "products").iterdir() if path.is_file()] == [
+        urls[0].rsplit("/", 1)[1]
+    ]
+    with app_instance.app_context():
+        assert db.session.get(StoredBlob, urls[0]).ref_count == 0
+
+
+def test_store_during_a_release_keeps_the_file(app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path / "static")
+    first = tmp_path / "first.jpg"
+    second = tmp_path / "second.jpg"
+    first.write_bytes(b"same photo")
+    second.write_bytes(b"same photo")
+    committed = threading.Event()
+
+    def release_in_other_session(url):
+        with app_instance.app_context():
+            release(url)
+            db.session.remove()
+
+    def pause_after_release_commit(session):
+        if threading.current_thread() is other:
+            committed.set()
+            time.sleep(0.2)
+
+    with app_instance.app_context():
+        upgrade()
+        url, _ = store_file(first, folder="products", extension="jpg")
+        db.session.commit()
+
+        other = threading.Thread(target=release_in_other_session, args=(url,))
+        event.listen(Session, "after_commit", pause_after_release_commit)
+        try:
+            other.start()
+            assert committed.wait(5)
+            # the release has deleted the row; its file must be gone by now or kept for this store
+            store_file(second, folder="products", extension="jpg")
+            db.session.add(_product("0000000000001", url))
+            db.session.commit()
+            other.join()
+        finally:
+            event.remove(Session, "after_commit", pause_after_release_commit)
+
+        assert resolve_upload_path(url).read_bytes() == b"same photo"
+        assert db.session.get(StoredBlob, url).ref_count == 1
+
+
+def test_failed_save_releases_the_promoted_temp_upload(logged_in_client, app_instance, tmp_path, monkeypatch):
+    app_instance.static_folder = str(tmp_path)
+    temp_image = tmp_path / "uploads" / "cache" / "0123456789012-temp.jpg"
+    temp_image.parent.mkdir(parents=True)
+    temp_image.write_bytes(b"\xff\xd8\xff promoted")
+    with app_instance.app_context():
+        upgrade()
+
+    def fail(summary):
+        raise RuntimeError("change log unavailable")
+
+    monkeypatch.setattr(product_routes, "_log_change", fail)
+    response = logged_in_client.post(
+        "/add_product",
+        data={
+            "barcode": "0123456789012",
+            "name": "Not Saved",
+            "category": "Food",
+            "brand": "Brand",
+            "image": "/static/uploads/cache/0123456789012-temp.jpg",
+        },
+    )
+
+    assert response.status_code == 302
+    assert [path.name for path in (tmp_path / "uploads" / "products").iterdir() if path.is_file()] == []
+    with app_instance.app_context():
+        assert db.session.get(Product, "0123456789012") is None
+        assert StoredBlob.query.count() == 0
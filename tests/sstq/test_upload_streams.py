@@ -0,0 +1,66 @@
+import io
+
+
+def _post_file(client, url, field, content, filename, mimetype, **kwargs):
+    return client.post(
+        url,
+        data={"barcode": "0123456789012", field: (io.BytesIO(content), filename, mimetype)},
+        content_type="multipart/form-data",
+        **kwargs,
+    )
+
+
+def _files(folder):
+    return sorted(path.name for path in folder.iterdir() if path.is_file()) if folder.is_dir() else []
+
+
+def test_evidence_upload_is_streamed_into_the_cache(logged_in_client, app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+    content = b"%PDF-1.4\n" + b"0" * 200_000
+
+    response = _post_file(logged_in_client, "/upload_evidence_file_temp", "file", content, "e.pdf", "application/pdf")
+
+    assert response.status_code == 200
+    file_url = response.get_json()["file_url"]
+    name = file_url.rsplit("/", 1)[1]
+    assert file_url.startswith("/static/uploads/cache/evidence/0123456789012-") and name.endswith(".pdf")
+    assert _files(tmp_path / "uploads" / "cache" / "evidence") == [name]
+    assert (tmp_path / "uploads" / "cache" / "evidence" / name).read_bytes() == content
+
+
+def test_uploads_with_the_wrong_content_are_rejected(logged_in_client, app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+
+    pdf = _post_file(
+        logged_in_client, "/upload_evidence_file_temp", "file", b"<html>not a pdf</html>", "e.pdf", "application/pdf"
+    )
+    image = _post_file(logged_in_client, "/upload_product_image_temp", "image", b"GIF89a", "p.jpg", "image/jpeg")
+
+    assert (pdf.status_code, image.status_code) == (415, 415)
+    assert pdf.get_json()["success"] is False
+    assert _files(tmp_path / "uploads" / "cache" / "evidence") == []
+    assert _files(tmp_path / "uploads" / "cache") == []
+
+
+def test_oversized_uploads_are_rejected(logged_in_client, app_instance, tmp_path):
+    app_instance.static_folder = str(tmp_path)
+    app_instance.config["UPLOAD_MAX_IMAGE_BYTES"] = 1024
+    image = b"\xff\xd8\xff" + b"0" * 10_000
+
+    # the announced body fits the form overhead, so the limit is hit while the part is written
+    streamed = _post_file(logged_in_client, "/upload_product_image", "image", image, "p.jpg", "image/jpeg")
+    # a Content-Length far above the limit is refused before the body is read
+    announced = _post_file(
+        logged_in_client,
+        "/upload_product_image_temp",
+        "image",
+        b"\xff\xd8\xff small",
+        "p.jpg",
+        "image/jpeg",
+        environ_overrides={"CONTENT_LENGTH": "5000000"},
+    )
+
+    assert (streamed.status_code, announced.status_code) == (413, 413)
+    assert "1 KB" in streamed.get_json()["message"]
+    assert _files(tmp_path / "uploads" / "products") == []
+    assert _files(tmp_path / "uploads" / "cache") == []